@@ -0,0 +1,120 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures a Broadcast wallboard with a growing number of viewers: the time
+# to render a frame, which should not depend on the viewers, and the time
+# to send it to all of them. The board shows a scrolling chart and a
+# counter changing on every frame. The viewers run in a separate process
+# and only read the output.
+
+import asyncio
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from wytch import builder, server, view
+
+MAXFPS = 20
+SECONDS = 3
+VIEWERS = [1, 10, 100, 500, 1000]
+
+CLIENTS = """
+import asyncio
+import sys
+
+@asyncio.coroutine
+def viewer(path):
+    r, w = yield from asyncio.open_unix_connection(path)
+    while (yield from r.read(65536)):
+        pass
+
+loop = asyncio.get_event_loop()
+loop.run_until_complete(asyncio.gather(*[viewer(sys.argv[1])
+                                         for _ in range(int(sys.argv[2]))]))
+"""
+
+def timed(obj, name, totals):
+    """ Replace the method name of obj by one adding its run time to totals """
+    fn = getattr(obj, name)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            totals[name] += time.perf_counter() - start
+    setattr(obj, name, wrapper)
+
+@asyncio.coroutine
+def tick(counter, chart):
+    n = 0
+    while True:
+        counter.text = "%08d" % n
+        counter.dirty = True
+        chart.append(math.sin(n / 10))
+        chart.dirty = True
+        n += 1
+        yield from asyncio.sleep(1 / MAXFPS)
+
+def measure(loop, path, n):
+    board = server.Broadcast(80, 24, maxfps = MAXFPS)
+    counter = view.Label("0")
+    chart = view.Chart(capacity = 600, width = 60, height = 12)
+    with builder.Builder(board.root) as b:
+        b.align().box("Wallboard").vertical() \
+            (view.Label("Frame:"))(counter)(chart)
+    totals = {"_render_frame": 0, "_broadcast": 0}
+    timed(board.app, "_render_frame", totals)
+    timed(board, "_broadcast", totals)
+    loop.run_until_complete(board.start_unix(path, backlog = n))
+    ticker = asyncio.ensure_future(tick(counter, chart))
+    clients = subprocess.Popen([sys.executable, "-c", CLIENTS, path, str(n)])
+    while len(board.viewers) < n and clients.poll() is None:
+        loop.run_until_complete(asyncio.sleep(0.05))
+    loop.run_until_complete(asyncio.sleep(0.5))
+    frames = board.frames
+    for k in totals:
+        totals[k] = 0
+    cpu = time.process_time()
+    start = time.perf_counter()
+    loop.run_until_complete(asyncio.sleep(SECONDS))
+    elapsed = time.perf_counter() - start
+    cpu = (time.process_time() - cpu) / elapsed
+    frames = board.frames - frames
+    ticker.cancel()
+    loop.run_until_complete(board.close())
+    clients.wait()
+    return (frames / elapsed, totals["_render_frame"] / frames,
+            totals["_broadcast"] / frames, cpu)
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    with tempfile.TemporaryDirectory() as d:
+        print("maxfps %d" % MAXFPS)
+        print("%10s %8s %12s %12s %16s %8s" % ("viewers", "fps", "render [ms]",
+                                              "send [ms]", "per viewer [us]", "cpu"))
+        for i, n in enumerate(VIEWERS):
+            fps, render, send, cpu = measure(loop, os.path.join(d, "board%d.sock" % i), n)
+            print("%10d %8.1f %12.2f %12.2f %16.1f %7.0f%%" %
+                  (n, fps, render * 1000, send * 1000, send / n * 1e6, cpu * 100))
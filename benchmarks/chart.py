@@ -0,0 +1,47 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures the sample append rate of a Chart and its render time with
+# growing sample counts, which should stay flat once the ring buffer is full.
+
+import math
+import timeit
+from wytch import view, canvas
+
+def rendertime(capacity, samples, n = 20):
+    root = view.ContainerView()
+    ch = view.Chart(capacity = capacity, width = 80, height = 20)
+    root.add_child(ch)
+    root.canvas = canvas.MemoryCanvas(80, 20)
+    ch.extend(math.sin(i / 100) for i in range(samples))
+    return timeit.timeit(ch.render, number = n) / n
+
+if __name__ == "__main__":
+    ch = view.Chart(capacity = 10 ** 5)
+    n = 10 ** 5
+    t = timeit.timeit(lambda: ch.samples.append(1.0), number = n)
+    print("append: %.0f samples/s" % (n / t))
+    print("%10s %10s %12s" % ("capacity", "samples", "render [ms]"))
+    for capacity, samples in [(10 ** 3, 10 ** 3), (10 ** 4, 10 ** 4),
+                              (10 ** 4, 10 ** 5), (10 ** 4, 10 ** 6)]:
+        print("%10d %10d %12.2f" % (capacity, samples,
+                                    rendertime(capacity, samples) * 1000))
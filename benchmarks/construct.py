@@ -0,0 +1,59 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures how many common widgets can be constructed per second, compared
+# to resolving the class handlers by scanning the MRO for every instance.
+
+import inspect
+import timeit
+from wytch import view
+
+def legacy_inherit_handlers(self):
+    for parent in [p for p in inspect.getmro(self.__class__) \
+                    if hasattr(p, "_class_handlers")]:
+        for ev, hdls in parent._class_handlers.items():
+            for h in hdls:
+                for metname in self.__dir__():
+                    clfn = getattr(self.__class__, metname, None)
+                    if clfn and clfn == h.fn:
+                        self.bind(ev, getattr(self, metname), **h.mkws)
+
+WIDGETS = [
+    ("Label", lambda: view.Label("Label")),
+    ("TextInput", lambda: view.TextInput()),
+    ("Button", lambda: view.Button("Ok")),
+    ("Checkbox", lambda: view.Checkbox("Check")),
+    ("Vertical", lambda: view.Vertical()),
+]
+
+def rate(fn, n = 2000):
+    return n / timeit.timeit(fn, number = n)
+
+if __name__ == "__main__":
+    current = view.View._inherit_handlers
+    print("%10s %16s %16s %8s" % ("widget", "legacy [1/s]", "now [1/s]", "speedup"))
+    for name, fn in WIDGETS:
+        view.View._inherit_handlers = legacy_inherit_handlers
+        legacy = rate(fn)
+        view.View._inherit_handlers = current
+        now = rate(fn)
+        print("%10s %16.0f %16.0f %7.1fx" % (name, legacy, now, now / legacy))
@@ -0,0 +1,77 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures EventSource.fire for a widget with many key bindings against the
+# per-event matching EventSource.fire used to do.
+
+import string
+import timeit
+from wytch import event
+
+class LegacyEventSource(event.EventSource):
+
+    def fire(self, event):
+        if self._handlers.get(event.name, []):
+            ret = False
+            for h in self._handlers[event.name]:
+                kws = h.mkws.copy()
+                matcher = event.matches
+                flip = False
+                canreject = False
+                if "matcher" in kws:
+                    kws.pop("matcher")
+                    matcher = lambda **kwargs: h.mkws["matcher"](event, **kwargs)
+                if "invert" in kws:
+                    flip = kws["invert"]
+                    kws.pop("invert")
+                if "canreject" in kws:
+                    canreject = kws["canreject"]
+                    kws.pop("canreject")
+                if flip ^ matcher(**kws):
+                    hrt = h.fn(event)
+                    if canreject:
+                        ret = hrt or ret
+                    else:
+                        ret = True
+            return ret
+        return False
+
+def populate(es, nkeys):
+    noop = lambda ev: None
+    for c in string.ascii_letters[:nkeys]:
+        es.bind("key", noop, key = c)
+    es.bind("key", noop, keys = ["<up>", "<down>", "\t"], canreject = True)
+    es.bind("key", noop, matcher = lambda ke: len(ke.val) == 1 and ke.val in string.printable)
+    return es
+
+if __name__ == "__main__":
+    evs = [event.KeyEvent(s) for s in ["a", "Z", "\x1b[A", "1", "\x1b[3~"]]
+    print("%8s %12s %12s %8s" % ("bindings", "legacy [us]", "now [us]", "speedup"))
+    for nkeys in [1, 10, 50]:
+        times = []
+        for cls in [LegacyEventSource, event.EventSource]:
+            es = populate(cls(), nkeys)
+            n = 20000
+            t = timeit.timeit(lambda: [es.fire(ev) for ev in evs], number = n)
+            times.append(t / n / len(evs) * 1e6)
+        print("%8d %12.2f %12.2f %7.1fx" % (nkeys + 2, times[0], times[1],
+                                           times[0] / times[1]))
@@ -0,0 +1,59 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Encodes a full-screen image (160x48 cells, 160x96 pixels) with Image,
+# compared to creating a Color and calling to_256() for every pixel, and
+# re-encodes it after patching a single pixel row.
+
+import random
+import timeit
+from wytch import canvas, colors, view
+
+W, H = 160, 48
+
+def per_pixel(data):
+    for i in range(0, len(data), 3):
+        colors.Color((data[i], data[i + 1], data[i + 2])).to_256()
+
+if __name__ == "__main__":
+    rnd = random.Random(0)
+    data = bytes(rnd.randrange(256) for _ in range(W * 2 * H * 3))
+    colors.table_256()
+    image = view.Image(data, width = W, height = 2 * H)
+    image.canvas = canvas.MemoryCanvas(W, H)
+
+    def full():
+        image._changed = None
+        image._encode()
+
+    def patch():
+        image.patch(10, data[:W * 3])
+        image._encode()
+
+    print("to_256 per pixel %8.1f ms" %
+          (timeit.timeit(lambda: per_pixel(data), number = 1) * 1000))
+    print("full encode      %8.1f ms" %
+          (timeit.timeit(full, number = 10) * 100))
+    print("one row patched  %8.1f ms" %
+          (timeit.timeit(patch, number = 10) * 100))
+    print("render           %8.1f ms" %
+          (timeit.timeit(image.render, number = 10) * 100))
@@ -0,0 +1,81 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Creates and destroys short lived rows subscribed to a long lived event
+# source and checks that the number of allocated memory blocks stays flat.
+# Usage:
+#   leak.py [cycles]
+
+import gc
+import sys
+import time
+from wytch import event, view
+
+class Row(view.Horizontal):
+
+    def __init__(self, bus, i, weak):
+        super(Row, self).__init__()
+        self.label = view.Label("Row %d" % i)
+        self.add_child(self.label)
+        self.add_child(view.Button("Remove", onpress = self.onremove))
+        bus.bind("tick", self.ontick, weak = weak)
+
+    def ontick(self, ev):
+        self.label.text = ev.name
+
+    def onremove(self, ev):
+        self.parent.remove_child(self)
+
+
+def run(cycles, weak, checkpoints = 10):
+    bus = event.EventSource()
+    root = view.ContainerView()
+    root.add_child(view.Label("Keep"))
+    gc.collect()
+    base = sys.getallocatedblocks()
+    samples = []
+    t = time.perf_counter()
+    for i in range(cycles):
+        row = Row(bus, i, weak)
+        root.add_child(row)
+        row.focused = True
+        bus.fire(event.Event("tick"))
+        row.children[1].fire(event.Event("press"))
+        del row
+        if (i + 1) % max(cycles // checkpoints, 1) == 0:
+            gc.collect()
+            samples.append((i + 1, sys.getallocatedblocks() - base))
+    t = time.perf_counter() - t
+    return samples, t
+
+if __name__ == "__main__":
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    samples, _ = run(min(cycles, 2000), weak = False, checkpoints = 2)
+    print("strong bind, %d cycles: %+d blocks" % samples[-1])
+    samples, t = run(cycles, weak = True)
+    print("%10s %10s" % ("cycles", "blocks"))
+    for n, m in samples:
+        print("%10d %+10d" % (n, m))
+    print("%d cycles in %.1f s" % (cycles, t))
+    if samples[-1][1] - samples[0][1] > 1000:
+        print("memory is growing")
+        sys.exit(1)
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures with tracemalloc, in fresh interpreters, how many bytes the
+# objects wytch creates in bulk take: widgets, buffered cells, colors,
+# canvases and events. Pass paths of other wytch checkouts to compare
+# against.
+
+import os
+import subprocess
+import sys
+
+N = 10000
+
+CASES = [
+    ("Label", "view.Label('Label')"),
+    ("Button", "view.Button('Ok')"),
+    ("Checkbox", "view.Checkbox('Check')"),
+    ("Vertical", "view.Vertical()"),
+    ("cell", "canvas.BufferCanvas.Entry('x', colors.WHITE, colors.BLACK, 0)"),
+    ("Color", "colors.Color((1, 2, 3))"),
+    ("SubCanvas", "canvas.SubCanvas(mem, 1, 1, 10, 10)"),
+    ("MouseEvent", "event.MouseEvent(b'\\x1b[M !!')"),
+]
+
+MEASURE = """
+import tracemalloc
+from wytch import canvas, colors, event, view
+mem = canvas.MemoryCanvas(20, 20)
+make = lambda: %s
+make()
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+objs = [make() for _ in range(%d)]
+print((tracemalloc.get_traced_memory()[0] - before) / len(objs))
+"""
+
+def measure(path, code):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([path] +
+            ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    # -c puts the working directory first on sys.path
+    out = subprocess.check_output([sys.executable, "-c", MEASURE % (code, N)],
+                                  env = env, cwd = path)
+    return float(out.split()[-1])
+
+if __name__ == "__main__":
+    paths = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    paths += sys.argv[1:]
+    print("%-14s" % "bytes/object" + "".join("%12s" % os.path.basename(p)[:11]
+                                           for p in paths))
+    for name, code in CASES:
+        print("%-14s" % name + "".join("%12.0f" % measure(p, code)
+                                       for p in paths))
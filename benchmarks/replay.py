@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Replays a synthetic 10 minute session (typing into a form at ~5 keys per
+# second) headlessly and reports how long the replay took.
+
+import io
+import random
+import sys
+import time
+from wytch import builder, recording, view, Wytch
+
+def synthesize(duration = 600, rate = 5, seed = 0):
+    rnd = random.Random(seed)
+    f = io.BytesIO()
+    clock = recording.VirtualClock()
+    rec = recording.InputRecorder(f, 80, 24, clock = clock)
+    keys = [b"a", b"b", b"c", b" ", b"\x7f", b"\x1b[D", b"\x1b[C", b"\t",
+            b"\x1b[A", b"\x1b[B"]
+    t = 0
+    while t < duration:
+        t += rnd.expovariate(rate)
+        clock.advance(t)
+        rec.input(rnd.choice(keys))
+    f.seek(0)
+    return recording.Recording.load(f)
+
+def replay(rec):
+    w = Wytch(replay = rec)
+    with w:
+        with builder.Builder(w.root) as b:
+            v = b.align().box("Form").vertical()
+            for i in range(8):
+                v.add(view.Label("Field %d" % i)).add(view.TextInput())
+            v.add(view.Button("Submit"))
+    return w.player
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 600
+    rec = synthesize(duration = duration)
+    start = time.perf_counter()
+    player = replay(rec)
+    took = time.perf_counter() - start
+    print("session: %.0f s, %d records, %d events" %
+          (rec.duration, len(rec.records), player.events))
+    print("frames: %d, mean latency: %.2f ms (virtual)" %
+          (player.frames, 1000 * sum(player.latencies) / len(player.latencies)))
+    print("replayed in %.2f s (%.0fx realtime)" % (took, rec.duration / took))
@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Records a dashboard (a scrolling chart and a counter) at 20 fps in
+# virtual time and compares flushing with and without a screencast tee.
+# Reports the file size against the raw ANSI written to the terminal, the
+# memory of the recorder over time and the cost of seeking in the file.
+
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from wytch import builder, canvas, recording, screencast, view, Wytch
+
+FPS = 20
+
+def run(seconds, path = None):
+    """ Returns flush seconds, ANSI bytes and traced memory after each minute """
+    clock = recording.VirtualClock()
+    terminal = canvas.StreamCanvas(80, 24)
+    w = Wytch(terminal = terminal, clock = clock, screencast = path)
+    counter = view.Label("0")
+    chart = view.Chart(capacity = 600, width = 60, height = 12)
+    # Frames are rendered here instead of by the event loop
+    w.__enter__()
+    with builder.Builder(w.root) as b:
+        b.align().box("Dashboard").vertical() \
+            (view.Label("Requests:"))(counter)(chart)
+    flushed = 0
+    ansi = 0
+    memory = []
+    for n in range(int(seconds * FPS)):
+        clock.advance(n / FPS)
+        counter.text = "%08d" % (n * 7)
+        counter.dirty = True
+        chart.append(math.sin(n / 10) + random.random() / 4)
+        chart.dirty = True
+        w._render_frame()
+        start = time.perf_counter()
+        w.rootcanvas.flush()
+        flushed += time.perf_counter() - start
+        ansi += len(terminal.take())
+        if n % (60 * FPS) == 0:
+            memory.append(tracemalloc.get_traced_memory()[0])
+    w._cleanup()
+    return flushed, ansi, memory
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 600
+    frames = int(seconds * FPS)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "session.wsc")
+        # Warm up
+        run(5, os.path.join(d, "warmup.wsc"))
+        random.seed(0)
+        plain, ansi, _ = run(seconds)
+        random.seed(0)
+        teed, _, _ = run(seconds, path)
+        size = os.path.getsize(path)
+        random.seed(0)
+        tracemalloc.start()
+        _, _, memory = run(seconds, os.path.join(d, "traced.wsc"))
+        tracemalloc.stop()
+        print("%d frames, %.0f s at %d fps" % (frames, seconds, FPS))
+        print("flush            %8.1f us/frame" % (plain / frames * 1e6))
+        print("flush + record   %8.1f us/frame" % (teed / frames * 1e6))
+        print("raw ANSI         %8.1f kB" % (ansi / 1024))
+        print("screencast       %8.1f kB (%.1f bytes/frame)" % (size / 1024, size / frames))
+        print("traced memory    %s kB each minute" %
+              " ".join("%.0f" % (m / 1024) for m in memory))
+        p = screencast.Player(path)
+        rnd = random.Random(0)
+        start = time.perf_counter()
+        seeks = 200
+        for _ in range(seeks):
+            p.seek(rnd.uniform(0, p.duration))
+        took = time.perf_counter() - start
+        print("random seek      %8.2f ms (%d keyframes)" %
+              (took / seeks * 1000, len(p.keyframes)))
+        start = time.perf_counter()
+        played = sum(1 for _ in p.frames())
+        took = time.perf_counter() - start
+        print("playback         %8.0f frames/s" % (played / took))
+        p.close()
@@ -0,0 +1,103 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures how many concurrent sessions one wytch server process keeps at
+# its maxfps. Every session shows a box with a counter changing on every
+# frame. The clients run in a separate process and only read the output.
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from wytch import builder, server, view
+
+MAXFPS = 20
+SECONDS = 3
+SESSIONS = [1, 10, 50, 100, 200, 400]
+
+CLIENTS = """
+import asyncio
+import sys
+
+@asyncio.coroutine
+def client(path):
+    r, w = yield from asyncio.open_unix_connection(path)
+    w.write(b"\\x1b[8;24;80t")
+    while (yield from r.read(65536)):
+        pass
+
+loop = asyncio.get_event_loop()
+loop.run_until_complete(asyncio.gather(*[client(sys.argv[1])
+                                         for _ in range(int(sys.argv[2]))]))
+"""
+
+def setup(session):
+    session.counter = view.Label("0")
+    with builder.Builder(session.root) as b:
+        b.align().box("Session").vertical() \
+            (view.Label("Frames rendered:")) \
+            (session.counter) \
+            (view.TextInput())
+
+@asyncio.coroutine
+def tick(srv):
+    n = 0
+    while True:
+        for s in srv.sessions:
+            s.counter.text = "%08d" % n
+            s.counter.dirty = True
+        n += 1
+        yield from asyncio.sleep(1 / MAXFPS)
+
+def measure(loop, path, n):
+    srv = server.Server(setup, maxfps = MAXFPS)
+    loop.run_until_complete(srv.start_unix(path, backlog = n))
+    ticker = asyncio.ensure_future(tick(srv))
+    clients = subprocess.Popen([sys.executable, "-c", CLIENTS, path, str(n)])
+    while len(srv.sessions) < n and clients.poll() is None:
+        loop.run_until_complete(asyncio.sleep(0.05))
+    loop.run_until_complete(asyncio.sleep(0.5))
+    sessions = list(srv.sessions)
+    frames = [s.frames for s in sessions]
+    cpu = time.process_time()
+    start = time.perf_counter()
+    loop.run_until_complete(asyncio.sleep(SECONDS))
+    elapsed = time.perf_counter() - start
+    cpu = (time.process_time() - cpu) / elapsed
+    fps = [(s.frames - f) / elapsed for s, f in zip(sessions, frames)]
+    ticker.cancel()
+    loop.run_until_complete(srv.close())
+    clients.wait()
+    return sum(fps) / len(fps), min(fps), cpu
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    with tempfile.TemporaryDirectory() as d:
+        print("maxfps %d" % MAXFPS)
+        print("%10s %12s %12s %8s" % ("sessions", "mean fps", "min fps", "cpu"))
+        for i, n in enumerate(SESSIONS):
+            path = os.path.join(d, "wytch%d.sock" % i)
+            mean, low, cpu = measure(loop, path, n)
+            print("%10d %12.1f %12.1f %7.0f%%" % (n, mean, low, cpu * 100))
@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures, in fresh interpreters, importing parts of wytch and going from
+# the import to the first frame flushed (headlessly, to a MemoryCanvas).
+# The interpreter startup itself is not counted. Pass paths of other wytch
+# checkouts to compare against.
+
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+
+STAGES = [
+    ("import wytch", "import wytch"),
+    ("import colors", "import wytch.colors"),
+    ("import view", "import wytch.view"),
+    ("first frame", """
+from wytch import Wytch, view, recording
+with Wytch(replay = recording.Recording(40, 10, [])) as w:
+    w.root.add_child(view.Label("hello"))
+assert w.terminal.lines()[0].strip()
+"""),
+]
+
+TIMED = """
+import time
+_start = time.perf_counter()
+%s
+print(time.perf_counter() - _start)
+"""
+
+def measure(path, code, runs = 20):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([path] +
+            ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    times = []
+    for _ in range(runs):
+        # -c puts the working directory first on sys.path
+        out = subprocess.check_output([sys.executable, "-c", TIMED % code],
+                                      env = env, cwd = path)
+        times.append(float(out.split()[-1]))
+    return statistics.median(times)
+
+if __name__ == "__main__":
+    paths = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    paths += sys.argv[1:]
+    for p in paths:
+        compileall.compile_dir(os.path.join(p, "wytch"), quiet = 1)
+    print("%-14s" % "median [ms]" + "".join("%12s" % os.path.basename(p)[:11]
+                                          for p in paths))
+    for name, code in STAGES:
+        print("%-14s" % name + "".join("%12.1f" % (measure(p, code) * 1000)
+                                       for p in paths))
@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Draws thousands of random segments per frame with Canvas.line and with
+# a braille Surface (vectorized when numpy is installed).
+
+import random
+import timeit
+from wytch import canvas
+
+W, H = 160, 48
+
+def segments(n, sx, sy):
+    rnd = random.Random(0)
+    return [(rnd.randrange(W * sx), rnd.randrange(H * sy),
+             rnd.randrange(W * sx), rnd.randrange(H * sy)) for _ in range(n)]
+
+def canvas_lines(segs):
+    c = canvas.MemoryCanvas(W, H)
+    for x0, y0, x1, y1 in segs:
+        c.line(x0, y0, x1, y1)
+
+def surface(segs, numpy):
+    s = canvas.Surface(W, H, numpy = numpy)
+    s.segments(segs)
+    s.draw(canvas.MemoryCanvas(W, H))
+
+if __name__ == "__main__":
+    canvas.Surface(1, 1) # Import numpy, if available, before measuring
+    print("%8s %16s %16s %16s" % ("segments", "Canvas.line [ms]",
+                                  "Surface [ms]", "numpy [ms]"))
+    for n in (100, 1000, 5000):
+        cells = segments(n, 1, 1)
+        dots = segments(n, 2, 4)
+        t = [timeit.timeit(fn, number = 3) / 3 * 1000 for fn in
+             (lambda: canvas_lines(cells), lambda: surface(dots, False),
+              lambda: surface(dots, None))]
+        print("%8d %16.1f %16.1f %16.1f" % ((n,) + tuple(t)))
@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Sorts and filters a 1M row Table, measuring how long a render takes while
+# an index gets built in a worker and how cheap the maintained indexes make
+# inserts, resorts and range filters afterwards.
+
+import random
+import time
+from wytch import view, canvas
+
+def ms(t):
+    return "%8.2f ms" % ((time.perf_counter() - t) * 1000)
+
+if __name__ == "__main__":
+    rnd = random.Random(0)
+    rows = [(i, rnd.random(), rnd.randrange(100)) for i in range(10 ** 6)]
+    root = view.ContainerView()
+    table = view.Table(["id", "value", "group"], rows, width = 80, height = 40)
+    root.add_child(table)
+    root.canvas = canvas.MemoryCanvas(80, 40)
+
+    start = time.perf_counter()
+    fut = table.sort(1)
+    print("sort(1) returned       ", ms(start))
+    renders = []
+    while not fut.done():
+        t = time.perf_counter()
+        table.render()
+        renders.append(time.perf_counter() - t)
+    print("index built            ", ms(start))
+    print("renders while building  %8d, max %.2f ms" %
+          (len(renders), max(renders or [0]) * 1000))
+    t = time.perf_counter()
+    table.render()
+    print("render                 ", ms(t))
+
+    fut = table.sort(2)
+    fut and fut.result()
+    t = time.perf_counter()
+    table.sort(1, reverse = True)
+    print("resort on built index  ", ms(t))
+    t = time.perf_counter()
+    for _ in range(1000):
+        table.insert((-1, rnd.random(), rnd.randrange(100)))
+    print("1000 inserts           ", ms(t))
+    t = time.perf_counter()
+    table.sort(1)
+    table.filter(1, 0.25, 0.5)
+    print("filter on sort column  ", ms(t), "%d rows" % len(table))
@@ -0,0 +1,52 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Measures the call overhead of @typed on a method like
+# ConsoleCanvas._set_fg_color: the wrapper checking every call generically,
+# the wrapper specialized to the signature and the unchecked function.
+
+import timeit
+
+from wytch import colors, misc
+
+class Canvas:
+
+    def __init__(self):
+        self._fg_color = None
+
+    def set_fg_color(self, color):
+        self._fg_color = color
+
+def rate(fn, n = 200000):
+    return n / timeit.timeit(lambda: fn(colors.RED), number = n)
+
+if __name__ == "__main__":
+    c = Canvas()
+    generic = misc._typed_generic(Canvas.set_fg_color, (None, colors.Color), {})
+    specialized = misc._typed_specialized(Canvas.set_fg_color, (None, colors.Color), {})
+    print("%12s %16s %8s" % ("wrapper", "calls [1/s]", "speedup"))
+    base = None
+    for name, fn in [("generic", generic), ("specialized", specialized),
+                     ("unchecked", Canvas.set_fg_color)]:
+        r = rate(fn.__get__(c))
+        base = base or r
+        print("%12s %16.0f %7.1fx" % (name, r, r / base))
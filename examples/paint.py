@@ -50,14 +50,15 @@ class DrawingBoard(view.Widget):
 
     def __init__(self):
         super(DrawingBoard, self).__init__()
-        self.grid = None
         self.oldme = None
         self.colors = {}
-        self._buffer = None
+        self._surface = None
+        self._pending = {} # Color -> segments to draw in the next frame
 
     @event.handler("key", key = "c")
     def _onclear(self, kc):
-        self._buffer.clear()
+        self._pending.clear()
+        self._surface.clear()
         self.update()
 
     @event.handler("mouse")
@@ -70,10 +71,11 @@ class DrawingBoard(view.Widget):
         else:
             key = me.button
         color = self.colors.get(key, colors.DARKGREEN)
-        if not self.oldme:
-            self._buffer.set(me.x, me.y, " ", bg = color)
-        else:
-            self._buffer.line(self.oldme.x, self.oldme.y, me.x, me.y, bg = color)
+        old = self.oldme or me
+        # Both half-block pixels of every cell on the way
+        segs = self._pending.setdefault(color, [])
+        for dy in (0, 1):
+            segs.append((old.x, 2 * old.y + dy, me.x, 2 * me.y + dy))
 
         if me.released:
             self.oldme = None
@@ -82,12 +84,17 @@ class DrawingBoard(view.Widget):
         self.update()
 
     def recalc(self):
-        if not self._buffer or self._buffer.width != self.canvas.width \
-                or self._buffer.height != self.canvas.height:
-            self._buffer = canvas.BufferCanvas(self.canvas)
+        if not self._surface or self._surface.width != self.canvas.width \
+                or self._surface.height != self.canvas.height:
+            self._surface = canvas.Surface(self.canvas.width,
+                                           self.canvas.height,
+                                           mode = canvas.HALFBLOCK)
 
     def render(self):
-        self._buffer.flush()
+        for color, segs in self._pending.items():
+            self._surface.segments(segs, color = color)
+        self._pending.clear()
+        self._surface.draw(self.canvas)
 
     @property
     def size(self):
@@ -0,0 +1,38 @@
+#! /usr/bin/env python3
+#
+# Copyright (c) 2016 Josef Gajdusek
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Serves the login form to everyone connecting to the given TCP port, try
+#   socat -,raw,echo=0 tcp:localhost:8022
+
+import sys
+from wytch import builder, colors, server, view
+
+def setup(session):
+    tusr = view.TextInput()
+    tpwd = view.TextInput(password = True)
+    with builder.Builder(session.root) as b:
+        b.align().box("Login").grid(3, 3) \
+            (view.Label("Username", fg = colors.BLUE)).spacer(width = 2)(tusr) \
+            (view.Label("Password", fg = colors.BLUE))()(tpwd) \
+            (view.Button("Ok", onpress = lambda _: session.exit()), colspan = 3)
+
+server.Server(setup).serve_forever(port = int(sys.argv[1]) if len(sys.argv) > 1 else 8022)
@@ -0,0 +1,107 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import wytch.canvas as canvas
+import wytch.colors as colors
+
+import unittest
+
+class BufferCanvasTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.term = canvas.MemoryCanvas(6, 3)
+        self.buf = canvas.BufferCanvas(self.term)
+        self.buf.clear(blank = True)
+
+    def test_square_clipped(self):
+        sub = canvas.SubCanvas(self.buf, 1, 1, 4, 2)
+        sub.square(-1, 1, 10, 5, colors.RED, c = "#")
+        self.buf.flush()
+        self.assertEqual(self.term.lines(), ["      ", "      ", " #### "])
+        self.assertEqual(self.term.get(1, 2)[2], colors.RED)
+
+    def test_flush_unchanged(self):
+        """ Test that cells redrawn with the same contents are not written again """
+        sub = canvas.SubCanvas(self.buf, 0, 0, 6, 3)
+        sub.clear()
+        sub.text(0, 0, "ab")
+        self.buf.flush()
+        writes = self.term.writes
+        for _ in range(2):
+            sub.clear()
+            sub.text(0, 0, "ac")
+            self.buf.flush()
+        self.assertEqual(self.term.writes - writes, 1)
+        self.assertEqual(self.term.lines()[0], "ac    ")
+
+
+class StreamCanvasTestCase(unittest.TestCase):
+
+    def test_take(self):
+        term = canvas.StreamCanvas(10, 2)
+        self.assertIn(b"\x1b[?1049h", term.take())
+        term.set(0, 0, "a")
+        term.set(1, 0, "b")
+        self.assertEqual(term.take(), b"\x1b[1;1Hab")
+        term.resize(20, 4)
+        term.update_size()
+        self.assertEqual((term.width, term.height), (20, 4))
+        term.destroy()
+        self.assertTrue(term.take().endswith(b"\x1b[?1049l"))
+
+
+class SurfaceTestCase(unittest.TestCase):
+
+    def draw(self, s):
+        c = canvas.MemoryCanvas(s.width, s.height)
+        s.draw(c)
+        return c.lines()
+
+    def test_braille(self):
+        for numpy in (None, False):
+            s = canvas.Surface(2, 1, numpy = numpy)
+            s.polyline([(0, 0), (0, 3), (3, 3)], color = colors.RED)
+            self.assertEqual(self.draw(s), ["⣇⣀"])
+            self.assertEqual(s.get(0, 2), colors.RED)
+            self.assertIsNone(s.get(1, 2))
+            s.clear()
+            s.points([(3, 0), (-1, 0), (100, 100)])
+            self.assertEqual(self.draw(s), ["⠀⠈"])
+
+    def test_halfblock(self):
+        s = canvas.Surface(3, 2, mode = canvas.HALFBLOCK, numpy = False)
+        s.fill_polygon([(0, 0), (2, 0), (2, 2), (0, 2)], color = colors.RED)
+        s.points([(0, 3)], color = colors.BLUE)
+        c = canvas.MemoryCanvas(3, 2)
+        s.draw(c)
+        # Rows are filled up to but excluding the bottom edge
+        self.assertEqual(c.lines(), ["▀▀▀", "▄  "])
+        self.assertEqual(c.get(0, 0)[1:3], (colors.RED, colors.RED))
+        self.assertEqual(c.get(0, 1)[1:3], (colors.BLUE, colors.BLACK))
+
+    def test_circle(self):
+        s = canvas.Surface(6, 3, numpy = False)
+        s.circle(5.5, 5.5, 4, fill = True)
+        self.assertIsNotNone(s.get(5, 5))
+        self.assertIsNotNone(s.get(9, 5))
+        self.assertIsNone(s.get(10, 5))
+        self.assertIsNone(s.get(0, 0))
@@ -22,7 +22,11 @@
 
 import wytch.event as event
 
+import asyncio
+import gc
+import threading
 import unittest
+import weakref
 from unittest.mock import Mock, patch
 
 class EventSourceTestCase(unittest.TestCase):
@@ -162,6 +166,218 @@ class EventSourceTestCase(unittest.TestCase):
         self.assertTrue(self.es.fire(event))
         self.assertTrue(self.flag)
 
+
+class HandlerTableTestCase(unittest.TestCase):
+
+    class Base(event.EventSource):
+
+        @event.handler("a")
+        def ona(self, ev):
+            self.got.append("base")
+
+    class Derived(Base):
+
+        def __init__(self):
+            self.got = []
+            super(HandlerTableTestCase.Derived, self).__init__()
+
+        @event.handler("b", value = 1)
+        def onb(self, ev):
+            self.got.append("b")
+
+    def test_table(self):
+        d = HandlerTableTestCase.Derived()
+        table = HandlerTableTestCase.Derived._handler_table()
+        self.assertEqual(sorted(n for n, _ in table), ["ona", "onb"])
+        self.assertIs(HandlerTableTestCase.Derived().__class__._handler_table(), table)
+        d.fire(event.Event("a"))
+        self.assertEqual(d.got, ["base"])
+
+
+class WeakBindTestCase(unittest.TestCase):
+
+    class Listener:
+
+        def __init__(self):
+            self.got = []
+
+        def onev(self, ev):
+            self.got.append(ev.name)
+
+    def test_method(self):
+        es = event.EventSource()
+        l = WeakBindTestCase.Listener()
+        es.bind("a", l.onev, weak = True)
+        self.assertTrue(es.fire(event.Event("a")))
+        self.assertEqual(l.got, ["a"])
+        del l
+        gc.collect()
+        self.assertEqual(es._handlers["a"], [])
+        self.assertFalse(es.fire(event.Event("a")))
+
+    def test_source_collected(self):
+        """ Test that the cleanup does not need the source to be alive """
+        l = WeakBindTestCase.Listener()
+        es = event.EventSource()
+        h = es.bind("a", l.onev, weak = True)
+        es.fire(event.Event("a"))
+        source = weakref.ref(es)
+        del es
+        gc.collect()
+        self.assertIsNone(source())
+        # This is what runs when the listener goes away now, exceptions raised
+        # from a weakref callback would get swallowed
+        event.EventSource._collected(source, h, None)
+        self.assertEqual(l.got, ["a"])
+        h.fn(event.Event("b"))
+        self.assertEqual(l.got, ["a", "b"])
+
+    def test_dynamic_classes(self):
+        """ Test classes created by the same code get their own handlers """
+        def make():
+            class Dyn(event.EventSource):
+                @event.handler("a")
+                def ona(self, ev):
+                    self.got.append(ev)
+            return Dyn
+        for _ in range(2):
+            es = make()()
+            es.got = []
+            es.fire(event.Event("a"))
+            self.assertEqual(len(es.got), 1)
+
+
+class KeyDispatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.es = event.EventSource()
+        self.calls = []
+
+    def bind(self, name, **kwargs):
+        return self.es.bind("key", lambda ev: self.calls.append(name), **kwargs)
+
+    def fire(self, s):
+        self.calls = []
+        ret = self.es.fire(event.KeyEvent(s))
+        return ret, self.calls
+
+    def test_order(self):
+        """ Test that keyed and unkeyed handlers run in the order of binding """
+        self.bind("any")
+        self.bind("a", key = "a")
+        self.bind("notb", key = "b", invert = True)
+        self.bind("ab", keys = ["a", "b", "a"])
+        self.bind("any2")
+        self.assertEqual(self.fire("a"), (True, ["any", "a", "notb", "ab", "any2"]))
+        self.assertEqual(self.fire("b"), (True, ["any", "ab", "any2"]))
+        self.assertEqual(self.fire("c"), (True, ["any", "notb", "any2"]))
+
+    def test_rebind(self):
+        h = self.bind("a", key = "a")
+        self.assertEqual(self.fire("a"), (True, ["a"]))
+        self.es.unbind(h)
+        self.assertEqual(self.fire("a"), (False, []))
+        self.bind("a2", keys = ("a",))
+        self.assertEqual(self.fire("a"), (True, ["a2"]))
+
+    def test_string_keys(self):
+        """ Test that keys given as a str keep their substring semantics """
+        self.bind("sub", keys = "xyz")
+        self.assertEqual(self.fire("y"), (True, ["sub"]))
+        self.assertEqual(self.fire("a"), (False, []))
+
+
+class KeyEventTestCase(unittest.TestCase):
+
+    def test_table_matches_parser(self):
+        """ Test that every precomputed entry agrees with the slow path """
+        for s, key in event.KeyEvent._build_table().items():
+            self.assertEqual(key, event.KeyEvent._parse(s))
+
+    def test_lazy_table(self):
+        event.KeyEvent._TABLE = None
+        self.assertEqual(event.KeyEvent("a").val, "a")
+        self.assertIn("\x1b[A", event.KeyEvent._TABLE)
+
+    def test_modifiers(self):
+        ke = event.KeyEvent("\x1b[1;6C")
+        self.assertEqual(ke.val, "^<RIGHT>")
+        self.assertTrue(ke.shift and ke.ctrl and not ke.alt)
+        self.assertEqual(event.KeyEvent("\x1b[6;3~").val, "!<pagedown>")
+        self.assertEqual(event.KeyEvent("\x17").val, "^w")
+        self.assertEqual(event.KeyEvent("\x1bq").val, "!q")
+
+    def test_fallback(self):
+        """ Test sequences missing from the table """
+        self.assertEqual(event.KeyEvent("ř").val, "ř")
+        self.assertNotIn("ř", event.KeyEvent._TABLE)
+        with self.assertRaises(ValueError):
+            event.KeyEvent("\x1b[1;5X")
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            event.KeyEvent("a").foo = 1
+
+class OffloadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.es = event.EventSource()
+        self.got = []
+        self.gate = asyncio.Future(loop = self.loop)
+
+        @asyncio.coroutine
+        def slow(ev):
+            yield from self.gate
+            self.got.append(ev.name)
+        self.es.bind("a", slow)
+        self.es.bind("b", slow)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    def run_all(self):
+        self.loop.call_soon(self.gate.set_result, None)
+        for _ in range(20):
+            self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(self.es._running, 0)
+
+    def fire(self, *names):
+        for n in names:
+            self.assertTrue(self.es.fire(event.Event(n)))
+
+    def test_queue(self):
+        self.es.limit_handlers(queued = 2)
+        self.fire("a", "b", "a", "b")
+        self.run_all()
+        self.assertEqual(self.got, ["a", "b", "a"])
+
+    def test_drop(self):
+        self.es.limit_handlers(running = 2, overflow = event.DROP)
+        self.fire("a", "b", "a")
+        self.run_all()
+        self.assertEqual(self.got, ["a", "b"])
+
+    def test_latest(self):
+        self.es.limit_handlers(overflow = event.LATEST)
+        self.fire("a", "a", "b", "a", "b")
+        self.run_all()
+        self.assertEqual(self.got, ["a", "b"])
+
+    def test_thread(self):
+        done = threading.Event()
+        def blocking(ev):
+            self.got.append(threading.current_thread())
+            done.set()
+        self.es.bind("t", blocking, thread = True)
+        self.fire("t")
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(done.wait(5))
+        self.assertIsNot(self.got[0], threading.current_thread())
+
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(TestEventSource())
@@ -0,0 +1,134 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import wytch.misc as misc
+
+import random
+import unittest
+from unittest.mock import patch
+
+class TypedTestCase(unittest.TestCase):
+
+    class Target:
+
+        @misc.typed(None, int, step = float)
+        def move(self, x, y = "2", *rest, step = 1, **kws):
+            return (x, y, rest, step, kws)
+
+    def test_coerce(self):
+        t = TypedTestCase.Target()
+        self.assertEqual(t.move("1"), (1, "2", (), 1, {}))
+        self.assertEqual(t.move(x = "1", y = 3, step = "0.5", z = "z"),
+                         (1, 3, (), 0.5, {"z": "z"}))
+        self.assertEqual(t.move(1.5, 2, 3, 4), (1, 2, (3, 4), 1, {}))
+        self.assertEqual(TypedTestCase.Target.move.__name__, "move")
+
+    def test_defaults(self):
+        """ Test that defaults are not converted when the argument is left out """
+        fn = misc.typed(int, limit = float)(lambda x = None, *, limit = None: (x, limit))
+        self.assertEqual(fn(), (None, None))
+        self.assertEqual(fn("3", limit = "2"), (3, 2.0))
+        with self.assertRaises(TypeError):
+            fn(None)
+
+    def test_varkw(self):
+        fn = misc.typed(value = int)(lambda **kws: kws)
+        self.assertEqual(fn(value = "3", other = "4"), {"value": 3, "other": "4"})
+
+    def test_unchecked(self):
+        t = TypedTestCase.Target()
+        self.assertEqual(misc.unchecked(t.move)("1"), ("1", "2", (), 1, {}))
+        self.assertEqual(misc.unchecked(TypedTestCase.Target.move)(t, "1")[0], "1")
+        self.assertIs(misc.unchecked(len), len)
+
+    def test_optimized(self):
+        fn = lambda x: x
+        with patch.object(misc, "OPTIMIZED", True):
+            self.assertIs(misc.typed(int)(fn), fn)
+
+    def test_generic(self):
+        """ Test callables without a code object fall back to checking every call """
+        self.assertEqual(misc.typed(str)(len)(123), 3)
+
+
+class GapBufferTestCase(unittest.TestCase):
+
+    def test_against_list(self):
+        rnd = random.Random(42)
+        gb = misc.GapBuffer([1, 2, 3], gap = 2)
+        ref = [1, 2, 3]
+        for _ in range(3000):
+            op = rnd.random()
+            if op < 0.5 or not ref:
+                i = rnd.randint(0, len(ref))
+                gb.insert(i, op)
+                ref.insert(i, op)
+            elif op < 0.8:
+                i = rnd.randrange(len(ref))
+                del gb[i]
+                del ref[i]
+            else:
+                i = rnd.randrange(len(ref))
+                gb[i] = ref[i] = -1
+            self.assertEqual(len(gb), len(ref))
+        self.assertEqual(list(gb), ref)
+        self.assertEqual(gb[3:9], ref[3:9])
+        self.assertEqual(gb[-1], ref[-1])
+
+    def test_gap_cleared(self):
+        """ Test that the gap does not keep references to removed items """
+        gb = misc.GapBuffer(range(100))
+        gb.insert(10, "x")
+        gb.insert(90, "y")
+        del gb[50]
+        self.assertEqual(set(gb._buf[gb._start:gb._end]), {None})
+
+    def test_index_error(self):
+        gb = misc.GapBuffer([1])
+        with self.assertRaises(IndexError):
+            gb[1]
+        with self.assertRaises(IndexError):
+            del gb[-2]
+
+
+class RingBufferTestCase(unittest.TestCase):
+
+    def test_wrap(self):
+        rb = misc.RingBuffer(5)
+        rb.extend(range(3))
+        self.assertEqual(list(rb.values()), [0, 1, 2])
+        rb.extend([10, 11, 12, 13])
+        self.assertEqual(list(rb.values()), [2, 10, 11, 12, 13])
+        rb.append(14)
+        self.assertEqual(len(rb), 5)
+        self.assertEqual(list(rb.values()), [10, 11, 12, 13, 14])
+        self.assertEqual(list(rb.values(2)), [13, 14])
+        rb.extend(range(100))
+        self.assertEqual(list(rb.values()), [95, 96, 97, 98, 99])
+
+    def test_minmax(self):
+        rb = misc.RingBuffer(8)
+        rb.extend([5, 1, 7, 3, 2, 9, 4, 0, 6])
+        self.assertEqual(rb.minmax(3), ([1, 2, 0], [7, 9, 6]))
+        self.assertEqual(rb.minmax(100), (list(rb.values()),) * 2)
+        rb.clear()
+        self.assertEqual(rb.minmax(3), ([], []))
@@ -0,0 +1,107 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import asyncio
+import io
+import threading
+import unittest
+
+from wytch import builder, canvas, event, recording, view, Wytch
+
+class RecordingTestCase(unittest.TestCase):
+
+    def record(self, chunks):
+        f = io.BytesIO()
+        clock = recording.VirtualClock()
+        rec = recording.InputRecorder(f, 30, 5, clock = clock)
+        for t, data in chunks:
+            clock.advance(t)
+            if isinstance(data, tuple):
+                rec.resize(*data)
+            else:
+                rec.input(data)
+        f.seek(0)
+        return recording.Recording.load(f)
+
+    def replay(self, rec):
+        w = Wytch(replay = rec)
+        with w:
+            self.input = view.TextInput()
+            with builder.Builder(w.root) as b:
+                b.vertical().add(self.input)
+        return w
+
+    def test_roundtrip(self):
+        rec = self.record([(0.5, b"ab"), (0.51, b"c\x1b[D"), (2, (40, 6))])
+        self.assertEqual((rec.width, rec.height), (30, 5))
+        self.assertEqual([k for _, k, _ in rec.records],
+                         [recording.INPUT, recording.INPUT, recording.RESIZE])
+        self.assertEqual(rec.records[1], (0.51, recording.INPUT, b"c\x1b[D"))
+        self.assertEqual(rec.duration, 2)
+
+    def test_replay(self):
+        rec = self.record([(0.5, b"hel"), (0.52, b"lo"), (60, b"\x1b[D\x1b[Dx"),
+                           (61, (40, 6))])
+        w = self.replay(rec)
+        self.assertEqual(self.input.value, "helxlo")
+        self.assertEqual(w.terminal.width, 40)
+        self.assertTrue(w.terminal.lines()[0].startswith("helxlo"))
+        self.assertEqual(w.player.events, 8)
+        # Frames are paced by maxfps in virtual time
+        ft = w.player.frametimes
+        self.assertTrue(all(b - a >= 1 / w.maxfps - 1e-9 for a, b in zip(ft, ft[1:])))
+        self.assertIn(0.5, ft)
+        w2 = self.replay(rec)
+        self.assertEqual(w.player.frametimes, w2.player.frametimes)
+        self.assertEqual(w.player.latencies, w2.player.latencies)
+        self.assertEqual(w.terminal.lines(), w2.terminal.lines())
+
+    def test_ctrlc_ends_replay(self):
+        rec = self.record([(1, b"a"), (2, b"\x03"), (3, b"b")])
+        w = self.replay(rec)
+        self.assertEqual(self.input.value, "a")
+
+    def test_offloaded_handlers(self):
+        """ Test that replays wait for coroutine and threaded handlers """
+        rec = self.record([(1, b"ab"), (2, b"a")])
+        w = Wytch(replay = rec)
+        got = []
+
+        @asyncio.coroutine
+        def lookup(kc):
+            yield from w.clock.sleep(10)
+            got.append((kc.val, w.clock.time()))
+            self.label.text = "found %s" % kc.val
+            self.label.update()
+
+        def save(kc):
+            got.append((kc.val, threading.current_thread() is threading.main_thread()))
+
+        with w:
+            self.label = view.Label("waiting")
+            with builder.Builder(w.root) as b:
+                b.add(self.label)
+            w.root.bind("key", lookup, key = "a")
+            w.root.bind("key", save, key = "b", thread = True)
+        self.assertEqual(got, [("a", 11), ("b", False), ("a", 21)])
+        self.assertFalse(event._offloaded)
+        self.assertIn("found a", "".join(w.terminal.lines()))
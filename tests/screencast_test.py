@@ -0,0 +1,139 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import io
+import random
+import unittest
+
+from wytch import builder, canvas, colors, recording, screencast, view, Wytch
+
+class ScreencastTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.f = io.BytesIO()
+        self.clock = recording.VirtualClock()
+        self.terminal = canvas.MemoryCanvas(20, 6)
+        self.buffer = canvas.BufferCanvas(self.terminal)
+        self.recorder = screencast.Recorder(self.f, interval = 1, clock = self.clock)
+        self.buffer.tee = self.recorder
+        self.buffer.update_size()
+        self.shown = []
+        self.rnd = random.Random(0)
+
+    def snapshot(self, screen):
+        return [[screen.get(x, y) for x in range(screen.width)]
+                for y in range(screen.height)]
+
+    def frame(self, t, cells):
+        self.clock.advance(t)
+        for x, y, c, fg, bg in cells:
+            self.buffer.set(x, y, c, fg = fg, bg = bg)
+        self.buffer.flush()
+        self.shown.append((t, self.snapshot(self.terminal)))
+
+    def random_frames(self, n, dt = 0.1, palette = colors.c256[:16]):
+        for i in range(n):
+            self.frame(i * dt, [(self.rnd.randrange(self.buffer.width),
+                                 self.rnd.randrange(self.buffer.height),
+                                 self.rnd.choice("ab─█"),
+                                 self.rnd.choice(palette),
+                                 self.rnd.choice(palette))
+                                for _ in range(self.rnd.randrange(8))])
+
+    def player(self):
+        return screencast.Player(io.BytesIO(self.f.getvalue()))
+
+    def check(self, player, t, lines):
+        self.assertEqual(self.snapshot(player.seek(t)), lines)
+
+    def test_frames(self):
+        self.random_frames(40)
+        self.recorder.close()
+        p = self.player()
+        self.assertEqual([t for t, _ in p.keyframes], [0, 1.0, 2.0, 3.0])
+        # Frames without changes are not recorded
+        got = [(t, self.snapshot(p.screen)) for t in p.frames()]
+        times = set(t for t, _ in got)
+        self.assertEqual(got, [s for s in self.shown if s[0] in times])
+        self.assertEqual(got[-1], self.shown[-1])
+
+    def test_seek(self):
+        self.random_frames(40)
+        self.recorder.close()
+        p = self.player()
+        order = list(range(40))
+        self.rnd.shuffle(order)
+        for i in order + sorted(order):
+            t, lines = self.shown[i]
+            self.check(p, t + 0.01, lines)
+        with self.assertRaises(ValueError):
+            p.seek(-1)
+
+    def test_unclosed(self):
+        """ Test that files not closed are scanned and truncated records ignored """
+        self.random_frames(25)
+        data = self.f.getvalue()
+        p = screencast.Player(io.BytesIO(data[:-3]))
+        self.assertEqual([t for t, _ in p.keyframes], [0, 1.0, 2.0])
+        t, lines = self.shown[-2]
+        self.check(p, 10, lines)
+        with self.assertRaises(ValueError):
+            screencast.Player(io.BytesIO(b"WYTCHIN1"))
+
+    def test_styles(self):
+        """ Test wide style ids, strings that are not one character and resizes """
+        palette = [colors.Color((i, 0, 0)) for i in range(200)]
+        self.random_frames(5, palette = palette)
+        self.frame(0.6, [(0, 0, "\u00e9", colors.RED, colors.BLUE),
+                         (1, 0, "e\u0301", colors.RED, colors.BLUE)])
+        self.terminal.resize(30, 3)
+        self.terminal.update_size()
+        self.buffer.update_size()
+        self.frame(0.7, [(29, 2, "x", colors.GREEN, colors.BLACK)])
+        self.recorder.close()
+        p = self.player()
+        for t, lines in self.shown:
+            self.check(p, t, lines)
+        self.assertEqual(p.seek(0.7).width, 30)
+        self.assertEqual(p.seek(0.6).lines()[0][:3], "\u00e9e\u0301")
+
+    def test_maxstyles(self):
+        self.frame(0, [(0, 0, "a", colors.RED, colors.BLACK)])
+        self.frame(0.1, [(1, 0, "b", colors.RED, colors.BLUE)])
+        self.assertEqual(len(self.recorder._keytimes), 1)
+        self.recorder._byid.update((i, i) for i in range(screencast.MAXSTYLES))
+        self.frame(0.2, [(2, 0, "c", colors.RED, colors.GREEN)])
+        self.frame(0.3, [(3, 0, "d", colors.RED, colors.GREEN)])
+        self.assertEqual(list(self.recorder._keytimes), [0, 0.3])
+
+    def test_wytch(self):
+        f = io.BytesIO()
+        rec = recording.Recording(30, 5, [(0.5, recording.INPUT, b"hello"),
+                                          (12, recording.INPUT, b"!")])
+        w = Wytch(replay = rec, screencast = f)
+        with w:
+            with builder.Builder(w.root) as b:
+                b.vertical().add(view.TextInput())
+        p = screencast.Player(io.BytesIO(f.getvalue()))
+        self.assertEqual(len(p.keyframes), 2)
+        self.assertTrue(p.seek(1).lines()[0].startswith("hello "))
+        self.assertEqual(p.seek(p.duration).lines(), w.terminal.lines())
@@ -0,0 +1,226 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import asyncio
+import os
+import re
+import tempfile
+import unittest
+
+from wytch import server, view
+
+class ServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.errors = []
+        self.loop.set_exception_handler(lambda loop, ctx: self.errors.append(ctx))
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "wytch.sock")
+        self.server = server.Server(self.setup_session, maxfps = 100)
+        self.fail_setup = False
+        self.loop.run_until_complete(self.server.start_unix(self.path))
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.dir.cleanup()
+
+    def setup_session(self, session):
+        if self.fail_setup:
+            raise RuntimeError("setup")
+        session.input = view.TextInput()
+        session.root.add_child(session.input)
+
+    def connect(self):
+        return self.loop.run_until_complete(asyncio.open_unix_connection(self.path))
+
+    def read(self, reader, until = None, timeout = 2):
+        """ Read the output of a session until it contains until (or for a while) """
+        @asyncio.coroutine
+        def read():
+            data = b""
+            while until is None or until not in data:
+                try:
+                    chunk = yield from asyncio.wait_for(reader.read(65536),
+                                                        0.1 if until is None else timeout)
+                except asyncio.TimeoutError:
+                    if until is None:
+                        return data
+                    raise
+                if not chunk:
+                    return data
+                data += chunk
+            return data
+        return self.loop.run_until_complete(read())
+
+    def test_isolated(self):
+        ra, wa = self.connect()
+        rb, wb = self.connect()
+        self.assertIn(server.REPORT_SIZE, self.read(ra, until = server.REPORT_SIZE))
+        self.read(rb)
+        wa.write(b"abc")
+        self.read(ra, until = b"abc")
+        self.assertNotIn(b"abc", self.read(rb))
+        self.assertEqual(sorted(s.input.value for s in self.server.sessions),
+                         ["", "abc"])
+
+    def test_resize(self):
+        r, w = self.connect()
+        w.write(b"\x1b[8;10;30t")
+        self.read(r)
+        session, = self.server.sessions
+        self.assertEqual((session.consolecanvas.width, session.consolecanvas.height),
+                         (30, 10))
+
+    def test_exit(self):
+        ra, wa = self.connect()
+        rb, wb = self.connect()
+        self.read(ra)
+        wa.write(b"\x03")
+        # Restores the terminal and disconnects
+        self.assertTrue(self.read(ra, until = b"\x1b[?1049l"))
+        self.assertEqual(self.read(ra), b"")
+        self.assertEqual(len(self.server.sessions), 1)
+        wb.write(b"x")
+        self.read(rb, until = b"x")
+        self.assertEqual(self.errors, [])
+
+    def test_setup_error(self):
+        self.fail_setup = True
+        r, w = self.connect()
+        self.read(r, until = b"\x1b[?1049l")
+        self.assertEqual(self.server.sessions, set())
+        self.assertIsInstance(self.errors[0]["exception"], RuntimeError)
+        self.fail_setup = False
+        r, w = self.connect()
+        w.write(b"y")
+        self.read(r, until = b"y")
+
+
+def decode(data, width, height):
+    """ Apply the cursor moves and characters of terminal output to a blank screen """
+    lines = [[" "] * width for _ in range(height)]
+    x = y = 0
+    for esc, row, col, c in re.findall(r"(\x1b\[(?:(\d+);(\d+)H|[?\d;]*[A-Za-z]))|(.)",
+                                       data.decode("utf-8"), re.S):
+        if row:
+            y, x = max(int(row) - 1, 0), max(int(col) - 1, 0)
+        elif c:
+            lines[y][x] = c
+            x += 1
+            if x == width:
+                x = 0
+                y = (y + 1) % height
+    return ["".join(l) for l in lines]
+
+
+class BroadcastTestCase(unittest.TestCase):
+
+    class Counted(view.Label):
+
+        def render(self):
+            self.renders += 1
+            super(BroadcastTestCase.Counted, self).render()
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "board.sock")
+        self.writers = []
+        self.board = server.Broadcast(12, 2, maxfps = 100)
+        self.label = BroadcastTestCase.Counted("count 0")
+        self.label.renders = 0
+        self.board.root.add_child(self.label)
+        self.loop.run_until_complete(self.board.start_unix(self.path))
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.board.close())
+        self.loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.dir.cleanup()
+
+    def connect(self):
+        r, w = self.loop.run_until_complete(asyncio.open_unix_connection(self.path))
+        # Dropping the writer would close the connection
+        self.writers.append(w)
+        self.sleep()
+        return r
+
+    def sleep(self, t = 0.05):
+        self.loop.run_until_complete(asyncio.sleep(t))
+
+    def count(self, n):
+        self.label.text = "count %d" % n
+        self.label.dirty = True
+        self.sleep()
+
+    def read(self, reader):
+        return self.loop.run_until_complete(asyncio.wait_for(reader.read(1 << 20), 1))
+
+    def test_shared(self):
+        readers = [self.connect() for _ in range(3)]
+        renders = self.label.renders
+        for i in range(1, 4):
+            self.count(i)
+        # Rendered once per frame, not per viewer
+        self.assertEqual(self.label.renders - renders, 3)
+        data = [self.read(r) for r in readers]
+        self.assertEqual(data[1:], data[:1] * 2)
+        self.assertEqual(decode(data[0], 12, 2)[0], "count 3     ")
+
+    def test_late_viewer(self):
+        for i in range(1, 4):
+            self.count(i)
+        self.assertEqual(decode(self.read(self.connect()), 12, 2)[0], "count 3     ")
+
+    def test_lagging(self):
+        """ Test that a viewer not keeping up skips to the latest frame """
+        r = self.connect()
+        self.read(r)
+        viewer, = self.board.viewers
+        viewer.pause_writing()
+        for i in range(1, 4):
+            self.count(i)
+        viewer.resume_writing()
+        self.sleep()
+        data = self.read(r)
+        self.assertEqual(decode(data, 12, 2)[0], "      3     ")
+        self.assertEqual(viewer.frame, self.board.screen.frame - 1)
+
+    def test_disconnect(self):
+        r = self.connect()
+        self.connect()
+        self.assertEqual(len(self.board.viewers), 2)
+        # Mouse reports and other keys do not disconnect
+        self.writers[0].write(b"\x1b[M q!x")
+        self.sleep()
+        self.assertEqual(len(self.board.viewers), 2)
+        self.writers[0].write(b"q")
+        self.sleep()
+        data = self.loop.run_until_complete(r.read())
+        self.assertNotIn(b"\x1b[?1002h", data)
+        self.assertTrue(data.endswith(self.board._end))
+        self.assertEqual(len(self.board.viewers), 1)
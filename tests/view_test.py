@@ -0,0 +1,836 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import wytch.builder as builder
+import wytch.canvas as canvas
+import wytch.colors as colors
+import wytch.event as event
+import wytch.recording as recording
+import wytch.view as view
+
+import asyncio
+import gc
+import random
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+
+def mouse(x, y, button = event.MouseEvent.LEFT):
+    return event.MouseEvent(bytes([0x1b, ord("["), ord("M"), button,
+                                   x + 33, y + 33]))
+
+def layout(root, width, height):
+    """ Do what Wytch does to render a frame into a MemoryCanvas """
+    term = canvas.MemoryCanvas(width, height)
+    buf = canvas.BufferCanvas(term)
+    buf.update_size()
+    root.precalc()
+    root.dirty = True
+    root.canvas = canvas.SubCanvas(buf, 0, 0, width, height)
+    root.render()
+    buf.flush()
+    return term
+
+
+class MouseRoutingTestCase(unittest.TestCase):
+
+    class Recorder(view.Widget):
+
+        def __init__(self, name, got):
+            super(MouseRoutingTestCase.Recorder, self).__init__()
+            self.name = name
+            self.got = got
+            self.vstretch = False
+
+        @event.handler("mouse")
+        def _record(self, me):
+            self.got.append((self.name, me.x, me.y))
+
+        def render(self):
+            self.canvas.text(0, 0, self.name)
+
+        @property
+        def size(self):
+            return (len(self.name), 1)
+
+    def setUp(self):
+        self.got = []
+        self.root = view.ContainerView()
+        self.widgets = [MouseRoutingTestCase.Recorder(n, self.got)
+                            for n in ["a", "bb", "ccc"]]
+        with builder.Builder(self.root) as b:
+            v = b.vertical()
+            for w in self.widgets:
+                v.add(w)
+        layout(self.root, 10, 5)
+
+    def test_target(self):
+        self.root.fire(mouse(7, 1))
+        self.assertEqual(self.got, [("bb", 7, 0)])
+        self.assertTrue(self.widgets[1].focused)
+
+    def test_nested_coordinates(self):
+        vert = self.root.children[0]
+        vert.bind("mouse", lambda me: self.got.append(("v", me.x, me.y)))
+        self.root.fire(mouse(2, 2))
+        self.assertEqual(self.got, [("v", 2, 2), ("ccc", 2, 0)])
+
+    def test_empty_cell(self):
+        self.root.fire(mouse(3, 4))
+        self.assertEqual(self.got, [])
+
+    def test_zindex(self):
+        """ Test that the top zindex captures events outside of its views """
+        popup = view.ContainerView()
+        popup.zindex = 1
+        top = MouseRoutingTestCase.Recorder("top", self.got)
+        with builder.Builder(popup) as b:
+            b.align(valign = view.VER_BOT).add(top)
+        self.root.add_child(popup)
+        layout(self.root, 10, 5)
+        self.root.fire(mouse(0, 0))
+        self.assertEqual(self.got, [])
+        self.root.fire(mouse(4, 4))
+        self.assertEqual(self.got, [("top", 1, 0)])
+
+    def test_unrendered(self):
+        """ Test the fallback when the canvas does not track owners """
+        self.root.canvas = canvas.SubCanvas(canvas.MemoryCanvas(10, 5), 0, 0, 10, 5)
+        self.root.fire(mouse(1, 2))
+        self.assertEqual(self.got, [("ccc", 1, 0)])
+
+
+class FocusTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = view.ContainerView()
+        self.inputs = []
+        with builder.Builder(self.root) as b:
+            v = b.vertical()
+            for i in range(3):
+                h = v.horizontal()
+                h.add(view.Label("Field %d" % i))
+                for j in range(2):
+                    t = view.TextInput()
+                    self.inputs.append(t)
+                    h.add(t)
+        self.root.focused = True
+
+    def key(self, s):
+        self.root.focus_path[-1].bubble(event.KeyEvent(s))
+
+    def test_initial(self):
+        path = self.root.focus_path
+        self.assertIs(path[0], self.root)
+        self.assertIs(path[-1], self.inputs[0])
+        self.assertEqual([v for v in path if v.focused], list(path))
+        self.assertEqual(sum(t.focused for t in self.inputs), 1)
+
+    def test_traversal(self):
+        self.inputs[3].display = False
+        for i in [1, 2, 4, 5]:
+            self.key("\t")
+            self.assertIs(self.root.focus_path[-1], self.inputs[i])
+        self.key("\x1b[A")
+        self.assertIs(self.root.focus_path[-1], self.inputs[4])
+        self.key("\x1b[Z")
+        self.assertIs(self.root.focus_path[-1], self.inputs[2])
+        self.assertEqual([t for t in self.inputs if t.focused], [self.inputs[2]])
+
+    def test_bubble_once(self):
+        got = []
+        self.inputs[0].bind("key", lambda kc: got.append(kc.val) and False,
+                            canreject = True)
+        self.key("x")
+        self.key("\t")
+        self.assertEqual(got, ["x", "\t"])
+        self.assertIs(self.root.focus_path[-1], self.inputs[1])
+
+    def test_focusable_change(self):
+        row = self.inputs[0].parent
+        for t in self.inputs[2:]:
+            t.focusable = False
+        self.assertFalse(self.inputs[2].parent.focusable)
+        self.inputs[1].focused = True
+        self.key("\t")
+        self.assertIs(self.root.focus_path[-1], self.inputs[1])
+        self.assertTrue(row.focusable)
+
+    def test_remove_focused(self):
+        row = self.inputs[0].parent
+        row.remove_child(self.inputs[0])
+        self.assertFalse(self.inputs[0].focused)
+        self.assertIs(self.root.focus_path[-1], self.inputs[1])
+
+
+class ListViewTestCase(unittest.TestCase):
+
+    class Source(view.ListSource):
+
+        def __init__(self, n):
+            self.n = n
+            self.requested = set()
+
+        def __len__(self):
+            return self.n
+
+        def row(self, i):
+            self.requested.add(i)
+            return "row %d" % i
+
+        def height(self, i):
+            return 2 if i % 10 == 0 else 1
+
+    def setUp(self):
+        self.source = ListViewTestCase.Source(10 ** 6)
+        self.root = view.ContainerView()
+        self.lv = view.ListView(self.source, height = 5)
+        self.other = view.TextInput()
+        with builder.Builder(self.root) as b:
+            b.vertical().add(self.other).add(self.lv)
+        self.render()
+        self.lv.focused = True
+
+    def render(self):
+        self.term = layout(self.root, 12, 6)
+
+    def key(self, s):
+        self.root.focus_path[-1].bubble(event.KeyEvent(s))
+
+    def test_window(self):
+        """ Test that only the visible rows get requested """
+        self.assertEqual(self.source.requested, {0, 1, 2, 3})
+        self.assertEqual(self.term.lines()[1:6],
+                         ["row 0       ", "            ", "row 1       ",
+                          "row 2       ", "row 3       "])
+
+    def test_scroll(self):
+        for _ in range(5):
+            self.key("\x1b[B")
+        self.assertEqual(self.lv.value, 5)
+        self.assertEqual(self.lv.top, 1)
+        self.key("\x1b[F")
+        self.assertEqual(self.lv.value, 10 ** 6 - 1)
+        self.source.requested.clear()
+        self.render()
+        self.assertEqual(self.source.requested, set(range(10 ** 6 - 5, 10 ** 6)))
+        self.key("\x1b[5~")
+        self.assertEqual(self.lv.value, 10 ** 6 - 5)
+        self.assertEqual(len(self.lv._pool), 5)
+
+    def test_variable_height(self):
+        self.lv.select(10)
+        self.assertEqual(self.lv._window()[-1], (10, 3, 2))
+        self.lv.select(11)
+        self.assertEqual(self.lv.top, 8)
+
+    def test_focus_leaves_at_top(self):
+        self.key("\x1b[B")
+        self.key("\x1b[A")
+        self.assertTrue(self.lv.focused)
+        self.key("\x1b[A")
+        self.assertTrue(self.other.focused)
+        self.assertEqual(self.lv.value, 0)
+
+    def test_shrunk_source(self):
+        """ Test that the selection gets clamped on refresh, not while drawing """
+        values = []
+        self.lv.bind("value", lambda ev: values.append(ev.new))
+        self.key("\x1b[F")
+        self.source.n = 3
+        self.root.render()
+        self.assertEqual(values, [10 ** 6 - 1])
+        self.lv.refresh()
+        self.assertEqual((self.lv.value, values[-1]), (2, 2))
+        self.root.render()
+        self.root.canvas.root.flush()
+        self.assertEqual(self.term.lines()[1:5], ["row 0       ", "            ",
+                                                  "row 1       ", "row 2       "])
+        self.lv.source = ["only"]
+        self.assertEqual((self.lv.value, self.lv.top), (0, 0))
+
+    def test_press(self):
+        got = []
+        self.lv.bind("press", lambda ev: got.append(self.lv.value))
+        self.key("\x1b[B")
+        self.key("\r")
+        self.root.fire(mouse(1, 4))
+        self.root.fire(mouse(1, 4))
+        self.assertEqual(got, [1, 2])
+
+
+class ConsoleTestCase(unittest.TestCase):
+
+    def test_history(self):
+        hist = view.Console.History(maxlines = 1000)
+        for i in range(10000):
+            hist.append("line %d" % i)
+        self.assertEqual(len(hist), 1000)
+        lines = list(hist.newest())
+        self.assertEqual(lines[0], "line 9999")
+        self.assertEqual(lines[-1], "line 9000")
+        self.assertLessEqual(len(hist._blocks), 3)
+
+    def test_maxbytes(self):
+        hist = view.Console.History(maxlines = None, maxbytes = 4096)
+        for i in range(10 ** 5):
+            hist.append("%08x" % (i * 2654435761 % 2 ** 32))
+        self.assertLessEqual(hist._bytes, 4096)
+        self.assertGreater(len(hist), 512)
+        self.assertEqual(next(hist.newest()), "%08x" % (99999 * 2654435761 % 2 ** 32))
+
+    def test_wrap(self):
+        root = view.ContainerView()
+        con = view.Console(minheight = 3)
+        root.add_child(con)
+        con.push("old")
+        term = layout(root, 4, 3)
+        self.assertEqual(term.lines(), ["    ", "    ", "old "])
+        con.push("abcdefgh\nij")
+        root.render()
+        root.canvas.root.flush()
+        self.assertEqual(term.lines(), ["abcd", "efgh", "ij  "])
+        term = layout(root, 5, 3)
+        self.assertEqual(term.lines(), ["abcde", "fgh  ", "ij   "])
+
+
+class PagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.f = tempfile.NamedTemporaryFile(suffix = ".log")
+        # Make lines of different lengths cross the chunk boundaries
+        self.lines = ["line %d %s" % (i, "x" * (i % 37)) for i in range(20000)]
+        self.f.write("\n".join(self.lines).encode("utf-8") + b"\n")
+        self.f.flush()
+        self.pagers = []
+
+    def tearDown(self):
+        for p in self.pagers:
+            p.close()
+        self.f.close()
+
+    def pager(self, **kwargs):
+        p = view.Pager(self.f.name, height = 4, **kwargs)
+        self.pagers.append(p)
+        self.root = view.ContainerView()
+        self.root.add_child(p)
+        return p
+
+    def render(self, width = 12):
+        return layout(self.root, width, 4).lines()
+
+    def test_index(self):
+        p = self.pager()
+        p._indexer.join()
+        self.assertTrue(p.indexed)
+        for n in [0, 1, 1234, 19999]:
+            off = p.offset_of(n)
+            self.assertEqual(p.line_of(off), n)
+            self.assertEqual(p._mm[off:off + len(self.lines[n]) + 1],
+                             self.lines[n].encode("utf-8") + b"\n")
+        self.assertIsNone(p.offset_of(20000))
+
+    def test_navigation(self):
+        p = self.pager()
+        p._indexer.join()
+        self.assertEqual(self.render()[0], "line 0      ")
+        p.goto_line(15000)
+        self.assertEqual(self.render(30)[0], self.lines[15000].ljust(30))
+        p.goto_percent(50)
+        self.assertTrue(9000 < p.line_of(p.top) < 11000)
+        p.focused = True
+        p.fire(event.KeyEvent("\x1b[F"))
+        self.assertEqual(self.render(30)[-1], self.lines[-1][:30].ljust(30))
+        self.assertFalse(p.fire(event.KeyEvent("\x1b[B")))
+        self.assertTrue(p.fire(event.KeyEvent("\x1b[A")))
+        self.assertEqual(p.line_of(p.top), 19995)
+
+    def test_pending(self):
+        gate = threading.Event()
+        class GatedPager(view.Pager):
+            def _index(self):
+                gate.wait(5)
+                super(GatedPager, self)._index()
+        p = GatedPager(self.f.name, height = 4)
+        self.pagers.append(p)
+        self.root = view.ContainerView()
+        self.root.add_child(p)
+        self.assertFalse(p.goto_line(19000))
+        self.render()
+        self.assertEqual(p.top, 0)
+        gate.set()
+        p._indexer.join()
+        self.render()
+        self.assertEqual(p.line_of(p.top), 19000)
+        self.assertIsNone(p._pending)
+
+    def test_release(self):
+        p = self.pager(follow = True, poll = 0.01)
+        t = p._indexer
+        self.root.remove_child(p)
+        self.assertFalse(t.is_alive())
+        self.assertTrue(p._f.closed)
+        self.assertIsNone(p._mm)
+        p = view.Pager(self.f.name, follow = True, poll = 0.01)
+        f, t = p._f, p._indexer
+        del p
+        gc.collect()
+        t.join(5)
+        self.assertFalse(t.is_alive())
+        self.assertTrue(f.closed)
+
+    def test_follow(self):
+        p = self.pager(follow = True, poll = 0.01)
+        self.render()
+        self.f.write(b"appended\n")
+        self.f.flush()
+        for _ in range(500):
+            if p.indexed and p._indexed == len(self.lines[-1]) + 10 + \
+                    sum(len(l) + 1 for l in self.lines[:-1]):
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.render()[-1], "appended    ")
+        self.assertEqual(p.offset_of(20001), None)
+        self.assertIsNotNone(p.offset_of(20000))
+
+    def test_goto_end(self):
+        """ Test going to the line just past the end """
+        p = self.pager()
+        p._indexer.join()
+        self.assertFalse(p.goto_line(20000))
+        self.assertIsNone(p._pending)
+        p = self.pager(follow = True, poll = 0.01)
+        while not p.indexed:
+            time.sleep(0.01)
+        self.assertFalse(p.goto_line(20000))
+        self.assertEqual(p._pending, 20000)
+        self.f.write(b"appended\n")
+        self.f.flush()
+        for _ in range(500):
+            if p._pending is None:
+                break
+            time.sleep(0.01)
+        self.assertEqual(p.line_of(p.top), 20000)
+        self.assertEqual(self.render()[0], "appended    ")
+
+
+class TextAreaTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = view.ContainerView()
+        self.ta = view.TextArea("first\nsecond", height = 3)
+        self.root.add_child(self.ta)
+        self.ta.focused = True
+        self.events = []
+        self.ta.bind("value", self.events.append)
+
+    def keys(self, *ks):
+        for k in ks:
+            self.ta.fire(event.KeyEvent(k))
+
+    def test_edit(self):
+        self.keys("\x1b[B", "\x1b[F", "!", "\r", "x", "\x1b[A", "\x1b[A",
+                  "\x1b[H", "\x7f", "\x1b[3~", "F")
+        self.assertEqual(self.ta.value, "First\nsecond!\nx")
+        self.keys("\x1b[B", "\x1b[H", "\x7f")
+        self.assertEqual(self.ta.value, "Firstsecond!\nx")
+        self.assertEqual((self.ta.row, self.ta.col), (0, 5))
+
+    def test_lazy_event(self):
+        self.keys("a", "b", "c")
+        # Nobody asked for the value yet
+        self.assertIsNone(self.ta._value)
+        self.assertEqual(len(self.events), 3)
+        self.assertEqual(self.events[-1].new, "abcfirst\nsecond")
+        lines = layout(self.root, 8, 3).lines()
+        self.assertEqual(lines[0], "abcfirst")
+        self.root.render()
+        self.assertEqual(len(self.events), 3)
+
+    def test_hidden_edits(self):
+        """ Test that edits are reported without the view being rendered """
+        values = []
+        self.ta.bind("value", lambda e: values.append(e.new))
+        self.ta.display = False
+        self.ta.insert("x\ny")
+        self.ta.value = "new"
+        self.assertEqual(values, ["x\nyfirst\nsecond", "new"])
+
+    def test_viewport(self):
+        self.ta.value = "\n".join("line %d" % i for i in range(10 ** 5))
+        self.ta._move(50000, 0)
+        self.keys("x")
+        lines = layout(self.root, 6, 3).lines()
+        self.assertEqual(lines, ["line 4", "line 4", "xline "])
+        self.assertEqual((self.ta.top, self.ta.left), (49998, 0))
+
+
+class ChartTestCase(unittest.TestCase):
+
+    def test_chart(self):
+        root = view.ContainerView()
+        ch = view.Chart(capacity = 100, width = 2, height = 1)
+        root.add_child(ch)
+        self.assertEqual(layout(root, 2, 1).lines(), ["⠀⠀"])
+        # Rising line, one sample per dot column, right aligned
+        ch.extend([0, 1, 2])
+        self.assertEqual(layout(root, 2, 1).lines(), ["⢀⡞"])
+
+    def test_downsampled(self):
+        root = view.ContainerView()
+        ch = view.Chart(capacity = 10 ** 5, width = 1, height = 1)
+        root.add_child(ch)
+        ch.extend([0, 3] * 1000)
+        # Both columns span the whole range
+        self.assertEqual(layout(root, 1, 1).lines(), ["⣿"])
+
+    def test_sparkline(self):
+        root = view.ContainerView()
+        sl = view.Sparkline(width = 6, height = 2)
+        root.add_child(sl)
+        sl.extend([0, 1, 2, 3])
+        self.assertEqual(layout(root, 6, 2).lines(),
+                         ["    ▃█", "  ▁▆██"])
+
+
+class TableTestCase(unittest.TestCase):
+
+    ROWS = [("carol", 35), ("alice", 30), ("bob", 25), ("dave", 30)]
+
+    def setUp(self):
+        self.table = view.Table(["name", "age"], self.ROWS, widths = [6, 3])
+
+    def names(self):
+        return [row[0] for _, row in self.table.shown_rows()]
+
+    def test_render(self):
+        root = view.ContainerView()
+        root.add_child(self.table)
+        self.table.sort(0)
+        self.table.left = 0
+        lines = layout(root, 12, 4).lines()
+        self.assertEqual(lines, ["name   age  ", "alice  30   ",
+                                 "bob    25   ", "carol  35   "])
+        # Scrolled to the second column
+        self.table.left = 1
+        self.assertEqual(layout(root, 12, 2).lines(), ["age         ", "30          "])
+
+    def test_sort(self):
+        self.assertEqual(self.names(), ["carol", "alice", "bob", "dave"])
+        self.table.sort(1)
+        self.assertEqual(self.names(), ["bob", "alice", "dave", "carol"])
+        self.table.sort(0, reverse = True)
+        self.assertEqual(self.names(), ["dave", "carol", "bob", "alice"])
+        # Maintained indexes
+        self.table.insert(("eve", 20))
+        self.table.update_row(2, ("zed", 40))
+        self.assertEqual(self.names(), ["zed", "eve", "dave", "carol", "alice"])
+        self.table.sort(1)
+        self.assertEqual(self.names(), ["eve", "alice", "dave", "carol", "zed"])
+
+    def test_filter(self):
+        self.table.sort(0)
+        self.table.filter(1, 30, 35)
+        self.assertEqual(self.names(), ["alice", "carol", "dave"])
+        self.table.insert(("adam", 33))
+        self.table.insert(("old", 90))
+        self.assertEqual(self.names(), ["adam", "alice", "carol", "dave"])
+        self.table.sort(1)
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(self.names()[-1], "carol")
+        self.table.filter()
+        self.assertEqual(self.names()[-1], "old")
+
+    def test_threaded(self):
+        rnd = random.Random(3)
+        rows = [(rnd.random(),) for _ in range(20000)]
+        table = view.Table(["x"], rows)
+        fut = table.sort(0)
+        self.assertIsNotNone(fut)
+        for _ in range(100):
+            table.insert((rnd.random(),))
+        table.update_row(0, (2.0,))
+        fut.result()
+        keys = [row[0] for _, row in table.shown_rows()]
+        self.assertEqual(len(keys), 20100)
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(keys[-1], 2.0)
+
+    def test_stale(self):
+        """ Test that a slow build does not override a newer sort """
+        table = view.Table(["a", "b"], [(i, -i) for i in range(20000)])
+        fut = table.sort(0)
+        table.sort(None, thread = False)
+        fut.result()
+        self.assertEqual(table.shown_rows(0, 2), [(0, (0, 0)), (1, (1, -1))])
+        # But the index got kept
+        self.assertIsNone(table.sort(0))
+
+
+class TreeViewTestCase(unittest.TestCase):
+
+    TREE = {
+        "svc": ["host1", "host2"],
+        "host1": ["proc1", "proc2"],
+        "host2": [],
+        "proc1": ["thread1"],
+    }
+
+    def setUp(self):
+        self.asked = []
+
+        def children(item):
+            self.asked.append(item)
+            return self.TREE.get(item, [])
+        self.tree = view.TreeView(["svc", "other"], children)
+
+    def items(self):
+        return [n.item for n in self.tree.rows]
+
+    def test_expand(self):
+        self.assertEqual(self.items(), ["svc", "other"])
+        self.assertEqual(self.asked, [])
+        self.tree.expand(0)
+        self.assertEqual(self.items(), ["svc", "host1", "host2", "other"])
+        self.assertEqual(self.asked, ["svc"])
+        self.tree.expand(1)
+        self.assertEqual(self.asked, ["svc", "host1"])
+        self.assertEqual(self.items(),
+                         ["svc", "host1", "proc1", "proc2", "host2", "other"])
+        self.assertEqual([n.depth for n in self.tree.rows], [0, 1, 2, 2, 1, 0])
+
+    def test_collapse(self):
+        self.tree.expand(0)
+        self.tree.expand(1)
+        self.tree.select(4)
+        self.tree.collapse(0)
+        self.assertEqual(self.items(), ["svc", "other"])
+        self.assertEqual(self.tree.value, 0)
+        self.tree.select(1)
+        # Expanded descendants come back, the selection stays on its node
+        self.tree.expand(0)
+        self.assertEqual(self.items(),
+                         ["svc", "host1", "proc1", "proc2", "host2", "other"])
+        self.assertEqual(self.tree.selected.item, "other")
+        self.assertEqual(self.asked, ["svc", "host1"])
+
+    def test_keys(self):
+        root = view.ContainerView()
+        root.add_child(self.tree)
+        self.tree.focused = True
+        for k in ["\x1b[C", "\x1b[C", "\x1b[C", "\x1b[B", "\x1b[C"]:
+            self.tree.fire(event.KeyEvent(k))
+        self.assertEqual(self.tree.selected.item, "proc1")
+        self.assertEqual(layout(root, 12, 4).lines(),
+                         ["- svc       ", "  - host1   ", "    - proc1 ",
+                          "      + thre"])
+        self.tree.fire(event.KeyEvent("\x1b[D"))
+        self.tree.fire(event.KeyEvent("\x1b[D"))
+        self.assertEqual(self.tree.selected.item, "host1")
+
+    def test_async(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            gate = asyncio.Future(loop = loop)
+
+            @asyncio.coroutine
+            def children(item):
+                yield from gate
+                return ["a", "b"]
+            tree = view.TreeView(["x", "y"], children)
+            tree.expand(0)
+            self.assertEqual(tree.rows[0].marker, "…")
+            self.assertEqual(len(tree.rows), 2)
+            self.assertEqual(len(event._offloaded), 1)
+            gate.set_result(None)
+            loop.run_until_complete(asyncio.wait(list(event._offloaded)))
+            loop.run_until_complete(asyncio.sleep(0))
+            self.assertEqual([n.item for n in tree.rows], ["x", "a", "b", "y"])
+            self.assertEqual(len(event._offloaded), 0)
+        finally:
+            loop.close()
+            asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+class FrameBudgetTestCase(unittest.TestCase):
+
+    class Slow(view.View):
+
+        def __init__(self, name, log, clock, cost = 0.03):
+            super(FrameBudgetTestCase.Slow, self).__init__()
+            self.name = name
+            self.log = log
+            self.clock = clock
+            self.cost = cost
+            self.focusable = False
+
+        def render(self):
+            self.log.append(self.name)
+            self.clock.advance(self.clock.time() + self.cost)
+
+    def setUp(self):
+        self.clock = recording.VirtualClock()
+        self.log = []
+        self.root = view.ContainerView()
+        self.views = [FrameBudgetTestCase.Slow(n, self.log, self.clock)
+                      for n in "abc"]
+        for v in self.views:
+            self.root.add_child(v)
+        layout(self.root, 10, 2)
+
+    def frame(self, budget = None):
+        self.log.clear()
+        frame = view.Frame(self.clock, budget)
+        self.root._frame = frame
+        self.root.render()
+        self.root._frame = None
+        return frame
+
+    def test_maxfps(self):
+        self.views[1].maxfps = 10
+        self.frame()
+        self.assertEqual(self.log, ["a", "b", "c"])
+        frame = self.frame()
+        self.assertEqual(self.log, ["a", "c"])
+        self.assertEqual(frame.deferred, [self.views[1]])
+        self.clock.advance(self.clock.time() + 0.2)
+        self.frame()
+        self.assertEqual(self.log, ["a", "b", "c"])
+
+    def test_budget(self):
+        # Everything is drawn the first time
+        self.frame(0.05)
+        self.assertEqual(self.log, ["a", "b", "c"])
+        self.views[2].priority = 1
+        frame = self.frame(0.05)
+        self.assertEqual(self.log, ["c"])
+        self.assertEqual(frame.deferred, self.views[:2])
+        # Interactive views are never deferred and go first
+        self.views[1].focusable = True
+        self.frame(0.05)
+        self.assertEqual(self.log, ["b"])
+        self.frame(0.07)
+        self.assertEqual(self.log, ["b", "c"])
+        self.frame()
+        self.assertEqual(self.log, ["a", "b", "c"])
+
+    def test_cleared(self):
+        self.frame(0.05)
+        self.root.dirty = True
+        self.root.recalc()
+        self.frame(0.01)
+        self.assertEqual(self.log, ["a", "b", "c"])
+
+
+class ImageTestCase(unittest.TestCase):
+
+    RED = bytes([255, 0, 0])
+    BLUE = bytes([0, 0, 255])
+
+    class CountingImage(view.Image):
+
+        def _quantize(self, rows, cols):
+            self.quantized.append(rows)
+            return super(ImageTestCase.CountingImage, self)._quantize(rows, cols)
+
+    def setUp(self):
+        self.root = view.ContainerView()
+        self.image = ImageTestCase.CountingImage(self.RED * 8 + self.BLUE * 8,
+                                                 width = 4, height = 4)
+        self.image.quantized = []
+        self.root.add_child(self.image)
+
+    def test_render(self):
+        self.assertEqual(self.image.size, (4, 2))
+        term = layout(self.root, 4, 2)
+        self.assertEqual(term.lines(), ["▀▀▀▀"] * 2)
+        self.assertEqual(term.get(0, 0)[1:3], (colors.RED, colors.RED))
+        self.assertEqual(term.get(3, 1)[1:3], (colors.BLUE, colors.BLUE))
+
+    def test_patch(self):
+        layout(self.root, 4, 2)
+        self.image.patch(3, self.RED * 4)
+        term = layout(self.root, 4, 2)
+        self.assertEqual(self.image.quantized, [[0, 1, 2, 3], [2, 3]])
+        self.assertEqual(term.get(0, 0)[1:3], (colors.RED, colors.RED))
+        self.assertEqual(term.get(0, 1)[1:3], (colors.BLUE, colors.RED))
+
+    def test_scaled(self):
+        term = layout(self.root, 2, 1)
+        self.assertEqual(term.get(0, 0)[1:3], (colors.RED, colors.BLUE))
+        self.assertEqual(self.image.quantized, [[0, 2]])
+
+
+class SlotsTestCase(unittest.TestCase):
+
+    class Custom(view.Label):
+
+        def __init__(self):
+            super(SlotsTestCase.Custom, self).__init__("custom")
+            self.extra = 1
+
+    def test_slotted(self):
+        for o in [view.Label(), view.Vertical(), view.TreeView([], lambda i: []),
+                  canvas.MemoryCanvas(2, 2), colors.Color((1, 2, 3)),
+                  event.MouseEvent()]:
+            self.assertFalse(hasattr(o, "__dict__"), o)
+
+    def test_subclass(self):
+        """ Test that subclasses without __slots__ still take any attribute """
+        c = SlotsTestCase.Custom()
+        c.other = 2
+        self.assertEqual((c.extra, c.other, c.text), (1, 2, "custom"))
+        self.assertIs(weakref.ref(c)(), c)
+
+    def test_per_instance(self):
+        lbl = view.Label()
+        lbl.maxfps = 5
+        lbl.limit_handlers(running = 2)
+        self.assertEqual((lbl.maxfps, view.Label().maxfps), (5, None))
+
+    def test_class_defaults(self):
+        """ Test that subclasses can override maxfps and priority as class attributes """
+        class Slow(view.Label):
+            maxfps = 5
+
+        class Urgent(view.Label):
+            __slots__ = ()
+            priority = 3
+
+        self.assertEqual((Slow().maxfps, Slow().priority), (5, 0))
+        self.assertEqual((Urgent().maxfps, Urgent().priority), (None, 3))
+        slow = Slow()
+        slow.maxfps = 2
+        self.assertEqual((slow.maxfps, Slow().maxfps), (2, 5))
+
+    def test_radio_group(self):
+        group = view.Radio.Group()
+        radios = [view.Radio(str(i), group = group) for i in range(3)]
+        self.assertEqual(list(group), radios)
+        radios[1].value = True
+        self.assertIs(group.selected, radios[1])
+        radios[1].group = None
+        self.assertEqual(len(group), 2)
+        self.assertIsNone(group.selected)
@@ -0,0 +1,99 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import subprocess
+import sys
+import threading
+import unittest
+from unittest.mock import Mock
+
+import wytch
+from wytch import builder, colors, recording, view, Wytch
+
+class PackageTestCase(unittest.TestCase):
+
+    def test_lazy(self):
+        """ Test that importing wytch loads submodules only when accessed """
+        code = "import sys, wytch; print('wytch.view' in sys.modules); " \
+               "wytch.view; from wytch import Wytch; print('wytch.view' in sys.modules)"
+        out = subprocess.check_output([sys.executable, "-c", code])
+        self.assertEqual(out.split(), [b"False", b"True"])
+        self.assertIn("screencast", dir(wytch))
+        with self.assertRaises(AttributeError):
+            wytch.missing
+
+    def test_c256(self):
+        self.assertIsInstance(colors.c256, list)
+        self.assertEqual(len(colors.c256), 256)
+
+
+class BudgetTestCase(unittest.TestCase):
+
+    def render(self, **kwargs):
+        w = Wytch(replay = recording.Recording(20, 3, []), **kwargs)
+        with w:
+            lbl = view.Label("old")
+            with builder.Builder(w.root) as b:
+                b.vertical().add(view.Label("top")).add(lbl)
+        # Pretend the label is too slow to fit any frame budget
+        lbl._rendercost = 10
+        lbl.text = "new"
+        lbl.update()
+        w._render_frame()
+        w.rootcanvas.flush()
+        return w.terminal.lines()[1]
+
+    def test_unlimited_by_default(self):
+        self.assertTrue(self.render().startswith("new"))
+
+    def test_opt_in(self):
+        self.assertTrue(self.render(budget = 0.05).startswith("old"))
+
+
+class PostTestCase(unittest.TestCase):
+
+    def test_post_from_thread(self):
+        rec = recording.Recording(20, 3, [(1, recording.INPUT, b"a")])
+        w = Wytch(replay = rec)
+        calls = []
+        with w:
+            lbl = view.Label("")
+            with builder.Builder(w.root) as b:
+                b.add(lbl)
+            # Pretend the event loop is running in another thread
+            w._loop_thread = -1
+            w.event_loop = Mock()
+
+            def produce():
+                for i in range(1000):
+                    w.post(setattr, lbl, "text", str(i), key = "text")
+                    w.invalidate(lbl)
+                w.post(calls.append, "last")
+            t = threading.Thread(target = produce)
+            t.start()
+            t.join()
+            self.assertEqual(w.event_loop.call_soon_threadsafe.call_count, 1)
+            self.assertEqual(lbl.text, "")
+        self.assertEqual(calls, ["last"])
+        self.assertEqual(lbl.text, "999")
+        self.assertTrue(w.terminal.lines()[0].startswith("999"))
+        self.assertFalse(w._posted)
@@ -20,182 +20,40 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-import asyncio
-import concurrent
-import tty
+import importlib
 import sys
-import time
-import signal
-from functools import wraps
-from wytch import view, canvas, event, builder
-
-class WytchExitError(RuntimeError):
-
-    def __init__(self, wraps = None):
-        super(WytchExitError, self).__init__()
-        self.wraps = wraps
-
-class Wytch:
-
-    def __init__(self, debug = False, debug_redraw = False, ctrlc = True, maxfps = 20):
-        self.debug = debug
-        self.debug_redraw = debug_redraw
-        self.ctrlc = ctrlc
-        self.maxfps = maxfps
-        self.event_loop = asyncio.get_event_loop()
-        self._sigwinch = False
-        self._intransport = None
-        self._redraw_sem = asyncio.BoundedSemaphore(value = 1)
-
-    def __enter__(self):
-        self.consolecanvas = canvas.ConsoleCanvas()
-        self.rootcanvas = canvas.BufferCanvas(self.consolecanvas,
-                                         debug = self.debug_redraw)
-        self.realroot = view.ContainerView()
-        self.realroot.onupdate = self.request_redraw
-        self.root = self.realroot
-        self._sigwinch = True
-        if self.debug:
-            console = view.Console(minheight = 10)
-            self.root = view.ContainerView()
-            with builder.Builder(self.realroot) as b:
-                b.vertical() \
-                    .box("Console").add(console).end() \
-                    .add(self.root)
-
-            def _print(*args, sep = " ", end = "\n", file = sys.stdout, flush = False):
-                s = ""
-                for x in args[:-1]:
-                    s += str(x) + sep
-                if args:
-                    s += str(args[-1]) + "\n"
-                else:
-                    s += "\n"
-                for li in s.split("\n")[:-1]:
-                    console.push(li)
-            self.origprint = print
-            __builtins__["print"] = _print
-
-        return self
-
-    def _cleanup(self):
-        if self.debug:
-            __builtins__["print"] = self.origprint
-        self.consolecanvas.destroy()
-        print() # Newline
-
-    def exit(self):
-        raise WytchExitError
-
-    def request_redraw(self):
-        if self._redraw_sem.locked():
-            self._redraw_sem.release()
-
-    @asyncio.coroutine
-    def _input_loop(self):
-        reader = asyncio.StreamReader()
-        self._intransport, _ = yield from self.event_loop.connect_read_pipe(
-                                            lambda: asyncio.StreamReaderProtocol(reader),
-                                            sys.stdin)
-        while True:
-            b = yield from reader.readexactly(1)
-            mouse = False
-            if self.ctrlc and b == b"\x03":
-                # Wrap KeyboardInterrupt as asyncio is unable to handle it gracefully
-                raise WytchExitError(wraps = KeyboardInterrupt())
-            elif b == b"\x1b":
-                # TODO: Do some testing on a bunch of different terminals
-                b += yield from reader.readexactly(1)
-                if chr(b[-1]) in {"[", "O"}:
-                    b += yield from reader.readexactly(1)
-                    if chr(b[-1]) == "M":
-                        b += yield from reader.readexactly(3)
-                        mouse = True
-                    else:
-                        while b[-1] in range(ord("0"), ord("9") + 1):
-                            b += yield from reader.readexactly(1)
-                        if chr(b[-1]) == ";":
-                            b += yield from reader.readexactly(1)
-                            while b[-1] in range(ord("0"), ord("9") + 1):
-                                b += yield from reader.readexactly(1)
-                else: # TODO: Figure out if this eves happens
-                    pass
-            else:
-                # Decode unicode
-                c = 0
-                k = b[0]
-                while k & 0x80:
-                    k <<= 1
-                    c += 1
-                b += yield from reader.readexactly(c)
-            if mouse:
-                me = event.MouseEvent(b)
-                self.root.fire(me)
-            else:
-                kc = event.KeyEvent(b.decode("utf-8"))
-                self.root.focused_leaf.bubble(kc)
-
-    @asyncio.coroutine
-    def _render_loop(self):
-        first = False
-        nxt = 0
-        with concurrent.futures.ThreadPoolExecutor(max_workers = 1) as e:
-            while True:
-                if first:
-                    first = False
-                else:
-                    yield from asyncio.sleep(nxt - time.time())
-                    yield from self._redraw_sem.acquire()
-                nxt = time.time() + 1 / self.maxfps
-                self.realroot.precalc()
-                if self._sigwinch:
-                    self.consolecanvas.update_size()
-                    self.rootcanvas.update_size()
-                    self.realroot.dirty = True
-                    self.realroot.canvas = \
-                            canvas.SubCanvas(self.rootcanvas, 0, 0,
-                                             max(self.rootcanvas.width,
-                                                 self.realroot.size[0]),
-                                             max(self.rootcanvas.height,
-                                                 self.realroot.size[1]))
-                    self._sigwinch = False
-                else:
-                    self.realroot.recalc()
-                self.realroot.render()
-                yield from self.event_loop.run_in_executor(e, self.rootcanvas.flush)
-
-    def _sigwinch_handler(self, sig, stack):
-        self._sigwinch = True
-        self.request_redraw()
-
-    @asyncio.coroutine
-    def _main(self):
-        if self.root.focusable:
-            self.root.focused = True
-        try:
-            cors = [self._input_loop(), self._render_loop()]
-            done, pending = yield from \
-                                asyncio.wait(cors, return_when = asyncio.FIRST_EXCEPTION)
-            while pending:
-                pending.pop().cancel()
-            done.pop().result()
-        except Exception as e:
-            self._cleanup()
-            if self._intransport:
-                self._intransport.close()
-            self.event_loop.stop()
-            raise e
-
-    def start_event_loop(self):
-        signal.signal(signal.SIGWINCH, self._sigwinch_handler)
-        try:
-            self.event_loop.run_until_complete(self._main())
-        except WytchExitError as e:
-            if e.wraps:
-                raise e.wraps
-
-    def __exit__(self, extype, exval, trace):
-        if extype is not None:
-            self._cleanup()
-            return False
-        self.start_event_loop()
+import types
+
+# Submodules and names get imported on first access, so that importing one
+# part of wytch does not load all of it (and asyncio)
+_SUBMODULES = ("app", "builder", "canvas", "colors", "event", "input",
+               "misc", "recording", "screencast", "server", "view")
+_NAMES = {
+    "Wytch": "app",
+    "WytchExitError": "app",
+}
+
+__all__ = ["Wytch", "WytchExitError"]
+
+class _LazyModule(types.ModuleType):
+
+    """ Class of this package, importing the names in _SUBMODULES and _NAMES when needed """
+
+    def __getattr__(self, name):
+        if name in _SUBMODULES:
+            return importlib.import_module("wytch." + name)
+        if name in _NAMES:
+            return getattr(importlib.import_module("wytch." + _NAMES[name]), name)
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    def __dir__(self):
+        return sorted(set(globals()) | set(_SUBMODULES) | set(_NAMES))
+
+try:
+    # Module __getattr__ (PEP 562) needs Python 3.7, changing the class of a
+    # module works from 3.5 on
+    sys.modules[__name__].__class__ = _LazyModule
+except TypeError:
+    for _name in _SUBMODULES:
+        importlib.import_module("wytch." + _name)
+    from wytch.app import Wytch, WytchExitError
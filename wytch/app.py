@@ -0,0 +1,316 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2015 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import asyncio
+import collections
+import concurrent
+import tty
+import sys
+import signal
+import threading
+from functools import wraps
+from wytch import view, canvas, event
+from wytch.input import InputParser
+
+class WytchExitError(RuntimeError):
+
+    def __init__(self, wraps = None):
+        super(WytchExitError, self).__init__()
+        self.wraps = wraps
+
+class Wytch:
+
+    def __init__(self, debug = False, debug_redraw = False, ctrlc = True, maxfps = 20,
+                 record = None, replay = None, terminal = None, clock = None,
+                 budget = 0, screencast = None):
+        """
+        record - file (or path) to save the raw terminal input into
+        screencast - file (or path) to save what gets shown into, see wytch.screencast
+        replay - recording (or path) to run headlessly instead of reading the terminal
+        terminal - Canvas to use instead of the console
+        clock - recording.Clock pacing the render loop
+        budget - render time per frame after which low priority views get
+                 deferred to the next one, e.g. 1 / maxfps (default 0, unlimited)
+        """
+        self.debug = debug
+        self.debug_redraw = debug_redraw
+        self.ctrlc = ctrlc
+        self.maxfps = maxfps
+        self.record = record
+        self.replay = replay
+        self.terminal = terminal
+        self.clock = clock
+        self.budget = budget
+        self.screencast = screencast
+        self.player = None
+        self.event_loop = asyncio.get_event_loop()
+        self._sigwinch = False
+        self._intransport = None
+        self._parser = InputParser()
+        self._recorder = None
+        self._screencast = None
+        self._loop_thread = None
+        # Guards the two below, which are shared with other threads
+        self._lock = threading.Lock()
+        self._wakeup = False
+        self._posted = collections.OrderedDict()
+        self._redraw = asyncio.Event()
+        self._redraw.set() # Render the first frame right away
+
+    def __enter__(self):
+        from wytch import recording
+        if self.replay:
+            if not isinstance(self.replay, recording.Recording):
+                self.replay = recording.Recording.load(self.replay)
+            if not self.terminal:
+                self.terminal = canvas.MemoryCanvas(self.replay.width,
+                                                    self.replay.height)
+            if not self.clock:
+                self.clock = recording.VirtualClock()
+        if not self.clock:
+            self.clock = recording.Clock()
+        if self.terminal:
+            self.consolecanvas = self.terminal
+        else:
+            self.consolecanvas = canvas.ConsoleCanvas()
+        if self.record:
+            self._recorder = recording.InputRecorder(self.record,
+                                                     self.consolecanvas.width,
+                                                     self.consolecanvas.height,
+                                                     clock = self.clock)
+        self.rootcanvas = canvas.BufferCanvas(self.consolecanvas,
+                                         debug = self.debug_redraw)
+        if self.screencast:
+            from wytch import screencast
+            self._screencast = screencast.Recorder(self.screencast,
+                                                   clock = self.clock)
+            self.rootcanvas.tee = self._screencast
+        self.realroot = view.ContainerView()
+        self.realroot.onupdate = self.request_redraw
+        self.root = self.realroot
+        self._sigwinch = True
+        if self.debug:
+            from wytch import builder
+            console = view.Console(minheight = 10)
+            self.root = view.ContainerView()
+            with builder.Builder(self.realroot) as b:
+                b.vertical() \
+                    .box("Console").add(console).end() \
+                    .add(self.root)
+
+            def _print(*args, sep = " ", end = "\n", file = sys.stdout, flush = False):
+                s = ""
+                for x in args[:-1]:
+                    s += str(x) + sep
+                if args:
+                    s += str(args[-1]) + "\n"
+                else:
+                    s += "\n"
+                for li in s.split("\n")[:-1]:
+                    console.push(li)
+            self.origprint = print
+            __builtins__["print"] = _print
+
+        return self
+
+    def _cleanup(self):
+        if self.debug:
+            __builtins__["print"] = self.origprint
+        if self._recorder:
+            self._recorder.close()
+        if self._screencast:
+            self._screencast.close()
+        self.consolecanvas.destroy()
+        if not self.terminal:
+            print() # Newline
+
+    def exit(self):
+        raise WytchExitError
+
+    def request_redraw(self):
+        """
+        Schedule a redraw, can be called from any thread. Requests from other
+        threads cost a single wakeup of the event loop per frame.
+        """
+        if self._loop_thread is not None and \
+                threading.get_ident() != self._loop_thread:
+            with self._lock:
+                if self._wakeup:
+                    return
+                self._wakeup = True
+            self.event_loop.call_soon_threadsafe(self._release_redraw)
+            return
+        self._release_redraw()
+
+    def _release_redraw(self):
+        self._redraw.set()
+
+    def post(self, fn, *args, key = None):
+        """
+        Call fn(*args) on the event loop thread right before the next frame
+        gets rendered. Can be called from any thread. Only the last call
+        posted with a given key (other than None) is kept until then.
+        """
+        with self._lock:
+            if key is None:
+                key = object()
+            self._posted[key] = (fn, args)
+        self.realroot.update()
+
+    def invalidate(self, v):
+        """ Mark a view dirty before the next frame, from any thread """
+        self.post(setattr, v, "dirty", True, key = ("invalidate", id(v)))
+
+    def _run_posted(self):
+        with self._lock:
+            self._wakeup = False
+            if not self._posted:
+                return
+            posted = self._posted
+            self._posted = collections.OrderedDict()
+        for fn, args in posted.values():
+            fn(*args)
+
+    def _dispatch_input(self, b, mouse):
+        if self.ctrlc and b == b"\x03":
+            # Wrap KeyboardInterrupt as asyncio is unable to handle it gracefully
+            raise WytchExitError(wraps = KeyboardInterrupt())
+        if mouse:
+            me = event.MouseEvent(b)
+            self.root.fire(me)
+        else:
+            kc = event.KeyEvent(b.decode("utf-8"))
+            self.root.focus_path[-1].bubble(kc)
+
+    @asyncio.coroutine
+    def _input_loop(self):
+        reader = asyncio.StreamReader()
+        self._intransport, _ = yield from self.event_loop.connect_read_pipe(
+                                            lambda: asyncio.StreamReaderProtocol(reader),
+                                            sys.stdin)
+        while True:
+            data = yield from reader.read(4096)
+            if not data: # stdin got closed
+                raise WytchExitError()
+            self.feed(data)
+
+    def feed(self, data):
+        """ Handle a chunk of raw terminal input """
+        if self._recorder:
+            self._recorder.input(data)
+        for b, mouse in self._parser.feed(data):
+            self._dispatch_input(b, mouse)
+
+    def _render_frame(self):
+        self._run_posted()
+        self.realroot.precalc()
+        if self._sigwinch:
+            self.consolecanvas.update_size()
+            self.rootcanvas.update_size()
+            self.realroot.dirty = True
+            self.realroot.canvas = \
+                    canvas.SubCanvas(self.rootcanvas, 0, 0,
+                                     max(self.rootcanvas.width,
+                                         self.realroot.size[0]),
+                                     max(self.rootcanvas.height,
+                                         self.realroot.size[1]))
+            self._sigwinch = False
+        else:
+            self.realroot.recalc()
+        frame = view.Frame(self.clock, self.budget)
+        self.realroot._frame = frame
+        try:
+            self.realroot.render()
+        finally:
+            self.realroot._frame = None
+        if frame.deferred:
+            self.request_redraw()
+
+    @asyncio.coroutine
+    def _render_loop(self):
+        first = False
+        nxt = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers = 1) as e:
+            while True:
+                if first:
+                    first = False
+                else:
+                    yield from self.clock.sleep(nxt - self.clock.time())
+                    yield from self._redraw.wait()
+                    self._redraw.clear()
+                nxt = self.clock.time() + 1 / self.maxfps
+                self._render_frame()
+                yield from self._flush(e)
+
+    @asyncio.coroutine
+    def _flush(self, executor):
+        """ Write the rendered frame to the terminal """
+        yield from self.event_loop.run_in_executor(executor, self.rootcanvas.flush)
+
+    def _sigwinch_handler(self, sig, stack):
+        self._sigwinch = True
+        if self._recorder:
+            self._recorder.resize(*canvas._terminal_size())
+        self.request_redraw()
+
+    @asyncio.coroutine
+    def _main(self):
+        self._loop_thread = threading.get_ident()
+        if self.root.focusable:
+            self.root.focused = True
+        try:
+            cors = [self._input_loop(), self._render_loop()]
+            done, pending = yield from \
+                                asyncio.wait(cors, return_when = asyncio.FIRST_EXCEPTION)
+            while pending:
+                pending.pop().cancel()
+            done.pop().result()
+        except Exception as e:
+            self._cleanup()
+            if self._intransport:
+                self._intransport.close()
+            self.event_loop.stop()
+            raise e
+
+    def start_event_loop(self):
+        if self.replay:
+            from wytch import recording
+            self.player = recording.Player(self, self.replay)
+            try:
+                self.player.run()
+            except WytchExitError:
+                pass
+            finally:
+                self._cleanup()
+            return
+        signal.signal(signal.SIGWINCH, self._sigwinch_handler)
+        try:
+            self.event_loop.run_until_complete(self._main())
+        except WytchExitError as e:
+            if e.wraps:
+                raise e.wraps
+
+    def __exit__(self, extype, exval, trace):
+        if extype is not None:
+            self._cleanup()
+            return False
+        self.start_event_loop()
@@ -20,14 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-import shutil
+import array
 import sys
 import termios
 import tty
-import random
-from math import copysign
+import weakref
+from math import copysign, ceil, cos, floor, pi, sin
 from functools import reduce
-from wytch import colors
+from wytch import colors, misc
 from wytch.misc import typed
 
 BOLD = 1 << 0
@@ -51,24 +51,53 @@ SGR_CODES = {
 CLEAR_FG = colors.WHITE
 CLEAR_BG = colors.BLACK
 
+# Sub-pixel layouts of a Surface as (columns, rows) per cell
+BRAILLE = (2, 4)
+HALFBLOCK = (1, 2)
+
+def _terminal_size():
+    # shutil imports bz2 and lzma, which only console programs need to pay for
+    import shutil
+    return shutil.get_terminal_size((80, 20))
+
 def ansi_escape(code, *args):
     return "\x1b[" + reduce(lambda i, v: i + str(v) + ";", args[:-1], "") + str(args[-1]) + code
 
 class Canvas:
 
+    __slots__ = ("x", "y", "width", "height", "root", "originx", "originy")
+
     def __init__(self, width, height, x = 0, y = 0):
         self.x = x
         self.y = y
         self.width = width
         self.height = height
+        # Canvas at the top of the SubCanvas chain and our offset in it
+        self.root = self
+        self.originx = 0
+        self.originy = 0
 
     def contains(self, x, y):
         return x >= 0 and y >= 0 and x < self.width and y < self.height
 
+    def claim(self, owner):
+        """ Make owner the topmost user of all cells of this canvas. """
+        self.root._claim(owner, self.originx, self.originy, self.width, self.height)
+
+    def owner_at(self, x, y):
+        """ Return the last object to .claim() the cell or None. """
+        if not self.contains(x, y):
+            return None
+        return self.root._owner_at(self.originx + x, self.originy + y)
+
+    def _claim(self, owner, x, y, width, height):
+        pass
+
+    def _owner_at(self, x, y):
+        return None
+
     def clear(self, blank = False):
-        for y in range(self.height):
-            for x in range(self.width):
-                self.set(x, y, " ", fg = CLEAR_FG, bg = CLEAR_BG)
+        self.square(0, 0, self.width, self.height, CLEAR_BG, fg = CLEAR_FG)
 
     def set(self, x, y, c, fg = colors.WHITE, bg = colors.BLACK, flags = 0):
         pass
@@ -132,29 +161,39 @@ class Canvas:
                         self.width, self.height)
 
 
-class ConsoleCanvas(Canvas):
+class AnsiCanvas(Canvas):
 
-    def __init__(self):
-        w, h = shutil.get_terminal_size((80, 20))
-        super(ConsoleCanvas, self).__init__(w, h)
+    """ Canvas drawing on a terminal by passing escape sequences to ._write() """
+
+    __slots__ = ("cursor_x", "cursor_y", "_fg_color", "_bg_color", "_flags")
+
+    def __init__(self, width, height):
+        super(AnsiCanvas, self).__init__(width, height)
+        self.forget()
+
+    def forget(self):
+        """ Forget the cursor and attributes, so the next output sets all it uses """
         self.cursor_x = None
         self.cursor_y = None
         self._fg_color = None
         self._bg_color = None
         self._flags = None
-        self._oldattrs = termios.tcgetattr(sys.stdin.fileno())
-        tty.setraw(sys.stdin.fileno())
+
+    def _start(self, mouse = True):
+        """ Switch the terminal to the alternate screen and clear it """
         # TODO: Write a proper terminfo parser
         self._send_ansi("h", "?1049");
-        #tty.setcbreak(sys.stdin.fileno())
         self._send_ansi("l", "?25") # Hide cursor
-        self._send_ansi("h", "?1002") # Enable mouse reporting
+        if mouse:
+            self._send_ansi("h", "?1002") # Enable mouse reporting
         self._set_cursor(0, 0)
         self.clear(blank = True)
 
+    def _write(self, s):
+        raise NotImplementedError()
+
     def _send_ansi(self, code, *args):
-        sys.stdout.write(ansi_escape(code, *args))
-        sys.stdout.flush()
+        self._write(ansi_escape(code, *args))
 
     def _send_sgr(self, code, *args):
         self._send_ansi("m", code, *args)
@@ -180,6 +219,11 @@ class ConsoleCanvas(Canvas):
         self._bg_color = color
         self._send_sgr(48, 5, color.to_256())
 
+    # For the callers below, which always pass Colors, the checks are just
+    # overhead on every cell
+    _set_fg_unchecked = misc.unchecked(_set_fg_color)
+    _set_bg_unchecked = misc.unchecked(_set_bg_color)
+
     def _set_flags(self, flags):
         if self._flags == flags:
             return
@@ -201,46 +245,151 @@ class ConsoleCanvas(Canvas):
             self._send_sgr(SGR_CODES[NEGATIVE])
 
     def update_size(self):
-        self.width, self.height = shutil.get_terminal_size((80, 20))
         self._set_cursor(0, 0)
         self.clear(blank = True)
 
     def clear(self, blank = False):
         if not blank:
-            return super(ConsoleCanvas, self).clear(blank = blank)
-        self._set_fg_color(colors.WHITE)
-        self._set_bg_color(colors.BLACK)
+            return super(AnsiCanvas, self).clear(blank = blank)
+        self._set_fg_unchecked(colors.WHITE)
+        self._set_bg_unchecked(colors.BLACK)
         self._set_flags(0)
         self._send_ansi("J", 2)
 
     def set(self, x, y, c, fg = colors.WHITE, bg = colors.BLACK, flags = 0):
-        super(ConsoleCanvas, self).set(x, y, c, fg = fg, bg = bg, flags = flags)
+        super(AnsiCanvas, self).set(x, y, c, fg = fg, bg = bg, flags = flags)
         self._set_cursor(x + 1, y + 1) # Terminal rows/columns are indexed from 0
         self._set_flags(flags)
-        self._set_fg_color(fg)
-        self._set_bg_color(bg)
-        sys.stdout.write(c)
-        sys.stdout.flush()
+        self._set_fg_unchecked(fg)
+        self._set_bg_unchecked(bg)
+        self._write(c)
         self.cursor_x += 1
         self.cursor_y += int(self.cursor_x / self.width)
         self.cursor_x %= self.width
 
     def destroy(self):
         self._set_flags(0)
-        self._set_fg_color(CLEAR_FG)
-        self._set_bg_color(CLEAR_BG)
+        self._set_fg_unchecked(CLEAR_FG)
+        self._set_bg_unchecked(CLEAR_BG)
         self.clear(blank = True)
         self._set_cursor(0, 0)
         self._send_ansi("h", "?25") # Show cursor
         self._send_ansi("l", "?1002") # Disable mouse
         self._send_ansi("l", "?1049");
+
+
+class ConsoleCanvas(AnsiCanvas):
+
+    __slots__ = ("_oldattrs",)
+
+    def __init__(self):
+        w, h = _terminal_size()
+        super(ConsoleCanvas, self).__init__(w, h)
+        self._oldattrs = termios.tcgetattr(sys.stdin.fileno())
+        tty.setraw(sys.stdin.fileno())
+        #tty.setcbreak(sys.stdin.fileno())
+        self._start()
+
+    def _write(self, s):
+        sys.stdout.write(s)
+        sys.stdout.flush()
+
+    def update_size(self):
+        self.width, self.height = _terminal_size()
+        super(ConsoleCanvas, self).update_size()
+
+    def destroy(self):
+        super(ConsoleCanvas, self).destroy()
         termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self._oldattrs)
 
 
+class StreamCanvas(AnsiCanvas):
+
+    """
+    Terminal at the other end of a stream, such as a network connection.
+    The output is collected until .take() instead of being written per cell.
+    mouse - whether to ask the terminal to report mouse events
+    """
+
+    __slots__ = ("_size", "_out")
+
+    def __init__(self, width = 80, height = 24, mouse = True):
+        super(StreamCanvas, self).__init__(width, height)
+        self._size = (width, height)
+        self._out = []
+        self._start(mouse = mouse)
+
+    def resize(self, width, height):
+        """ Change the size used on the next .update_size() """
+        self._size = (width, height)
+
+    def update_size(self):
+        self.width, self.height = self._size
+        super(StreamCanvas, self).update_size()
+
+    def _write(self, s):
+        self._out.append(s)
+
+    def take(self):
+        """ Return the output since the last call encoded as bytes """
+        out = "".join(self._out).encode("utf-8")
+        self._out = []
+        return out
+
+
+class MemoryCanvas(Canvas):
+
+    """ Terminal replacement keeping the screen contents in memory. """
+
+    __slots__ = ("_size", "writes", "_cells")
+
+    def __init__(self, width = 80, height = 24):
+        super(MemoryCanvas, self).__init__(width, height)
+        self._size = (width, height)
+        self.writes = 0
+        self.clear(blank = True)
+
+    def resize(self, width, height):
+        """ Change the size reported on the next .update_size() """
+        self._size = (width, height)
+
+    def update_size(self):
+        self.width, self.height = self._size
+        self.clear(blank = True)
+
+    def clear(self, blank = False):
+        if not blank:
+            return super(MemoryCanvas, self).clear(blank = blank)
+        self._cells = [[(" ", CLEAR_FG, CLEAR_BG, 0)] * self.width
+                        for _ in range(self.height)]
+
+    def set(self, x, y, c, fg = colors.WHITE, bg = colors.BLACK, flags = 0):
+        super(MemoryCanvas, self).set(x, y, c, fg = fg, bg = bg, flags = flags)
+        if self.contains(x, y):
+            self._cells[y][x] = (c, fg, bg, flags)
+            self.writes += 1
+
+    def get(self, x, y):
+        """ Return a (c, fg, bg, flags) tuple of the cell at x, y """
+        return self._cells[y][x]
+
+    def lines(self):
+        """ Return the characters on the screen as a list of strings """
+        return ["".join(c for c, _, _, _ in row) for row in self._cells]
+
+    def destroy(self):
+        pass
+
+
 class BufferCanvas(Canvas):
 
+    __slots__ = ("_grid", "_cgrid", "parent", "debug", "_clear", "_blank",
+                 "_owners", "_ownerids", "_ownerobjs", "_nextid", "_fills", "tee")
+
     class Entry:
 
+        __slots__ = ("c", "fg", "bg", "flags")
+
         def __init__(self, c, fg, bg, flags):
             self.c = c
             self.fg = fg
@@ -262,6 +411,14 @@ class BufferCanvas(Canvas):
         self.debug = debug
         self._clear = False
         self._blank = False
+        self._owners = array.array("I")
+        self._ownerids = weakref.WeakKeyDictionary()
+        self._ownerobjs = weakref.WeakValueDictionary()
+        self._nextid = 1
+        self._fills = {}
+        # Gets .set() for every cell flushed to the parent, .clear() when it
+        # gets cleared to blank and .commit() after each flush
+        self.tee = None
 
     def update_size(self):
         self.width = self.parent.width
@@ -271,9 +428,30 @@ class BufferCanvas(Canvas):
     def clear(self, blank = False):
         self._grid = [[None] * self.width for _ in range(self.height)]
         self._cgrid = [[BufferCanvas.Entry(" ", CLEAR_FG, CLEAR_BG, 0)] * self.width for _ in range(self.height)]
+        self._owners = array.array("I", [0]) * (self.width * self.height)
         self._clear = True
         self._blank = blank
 
+    def _claim(self, owner, x, y, width, height):
+        try:
+            oid = self._ownerids[owner]
+        except KeyError:
+            oid = self._ownerids[owner] = self._nextid
+            self._ownerobjs[oid] = owner
+            self._nextid += 1
+        x0 = max(x, 0)
+        x1 = min(x + width, self.width)
+        if x1 <= x0 or len(self._owners) != self.width * self.height:
+            return
+        row = array.array("I", [oid]) * (x1 - x0)
+        for yi in range(max(y, 0), min(y + height, self.height)):
+            self._owners[yi * self.width + x0:yi * self.width + x1] = row
+
+    def _owner_at(self, x, y):
+        if len(self._owners) != self.width * self.height:
+            return None
+        return self._ownerobjs.get(self._owners[y * self.width + x], None)
+
     def set(self, x, y, c, fg = colors.WHITE, bg = colors.BLACK, flags = 0):
         super(BufferCanvas, self).set(x, y, c, fg = fg, bg = bg)
         try:
@@ -282,30 +460,63 @@ class BufferCanvas(Canvas):
             # Ignore out of bounds writes
             pass
 
+    def square(self, x, y, width, height, bg, c = " ", fg = colors.WHITE):
+        x0 = max(x, 0)
+        x1 = min(x + width, self.width)
+        if x1 <= x0:
+            return
+        # Entries are never modified, so all cells can share one. Reusing it
+        # between frames lets .flush() skip the cells that stayed the same.
+        key = (c, fg, bg)
+        e = self._fills.get(key, None)
+        if e is None:
+            if len(self._fills) >= 64:
+                self._fills.clear()
+            e = self._fills[key] = BufferCanvas.Entry(c, fg, bg, 0)
+        row = [e] * (x1 - x0)
+        for yi in range(max(y, 0), min(y + height, self.height)):
+            self._grid[yi][x0:x1] = row
+
     def flush(self):
+        tee = self.tee
         if self._clear:
             self._clear = False
             self.parent.clear(blank = self._blank)
+            if tee is not None:
+                tee.clear(self.width, self.height)
         if self.debug:
+            import random
             bg = random.choice(colors.c256)
             fg = bg.invert()
         for y, (row, crow) in enumerate(zip(self._grid, self._cgrid)):
             for x, (v, cv) in enumerate(zip(row, crow)):
-                if v and (not cv or v != cv):
+                if v is None or v is cv:
+                    continue
+                if cv is None or v != cv:
                     if not self.debug:
                         bg = v.bg
                         fg = v.fg
                     self.parent.set(x, y, v.c, fg = fg, bg = bg, flags = v.flags)
-                    self._cgrid[y][x] = v
+                    if tee is not None:
+                        tee.set(x, y, v.c, fg, bg, v.flags)
+                # Keep the same object, so the next flush can skip the cell early
+                crow[x] = v
+        if tee is not None:
+            tee.commit(self.width, self.height)
 
 
 class SubCanvas(Canvas):
 
+    __slots__ = ("parent",)
+
     def __init__(self, parent, x, y, width, height):
         super(SubCanvas, self).__init__(width, height, x = x, y = y)
         self.parent = parent
         self.x = x
         self.y = y
+        self.root = parent.root
+        self.originx = parent.originx + x
+        self.originy = parent.originy + y
 
     def set(self, x, y, c, fg = colors.WHITE, bg = colors.BLACK, flags = 0):
         super(SubCanvas, self).set(x, y, c, fg = fg, bg = bg, flags = flags)
@@ -314,7 +525,251 @@ class SubCanvas(Canvas):
         self.parent.set(self.x + x, self.y + y, c,
               fg = fg, bg = bg, flags = flags)
 
+    def square(self, x, y, width, height, bg, c = " ", fg = colors.WHITE):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + width, self.width)
+        y1 = min(y + height, self.height)
+        if x1 > x0 and y1 > y0:
+            self.parent.square(self.x + x0, self.y + y0, x1 - x0, y1 - y0, bg,
+                               c = c, fg = fg)
+
     def __str__(self):
         return "<%s.%s width = %d height = %d x = %d y = %d>" % \
                 (self.__class__.__module__, self.__class__.__name__,
                         self.width, self.height, self.x, self.y)
+
+
+class Surface:
+
+    """
+    Bitmap of width x height cells of sub-pixels, 2x4 per cell drawn as
+    braille dots (one color per cell) or 1x2 drawn as half blocks. The
+    primitives take sub-pixel coordinates and batches of points, rasterize
+    into the bitmap (vectorized with numpy when installed) and .draw()
+    writes every cell to a canvas once.
+    """
+
+    # Braille dot bits of [column][row] in a cell
+    DOTS = ((0x01, 0x02, 0x04, 0x40), (0x08, 0x10, 0x20, 0x80))
+
+    def __init__(self, width, height, mode = BRAILLE, bg = colors.BLACK,
+                 numpy = None):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.bg = bg
+        self.pwidth = width * mode[0]
+        self.pheight = height * mode[1]
+        self._np = misc._numpy() if numpy is not False else None
+        self._palette = [None] # Color of each pixel value, 0 is empty
+        self._colorids = {}
+        self.clear()
+
+    def clear(self):
+        if self._np:
+            self._pix = self._np.zeros((self.pheight, self.pwidth),
+                                       dtype = self._np.uint16)
+        else:
+            self._pix = array.array("H", bytes(2 * self.pwidth * self.pheight))
+
+    def _colorid(self, color):
+        try:
+            return self._colorids[color]
+        except KeyError:
+            cid = self._colorids[color] = len(self._palette)
+            self._palette.append(color)
+            return cid
+
+    def get(self, x, y):
+        """ Return the color of a sub-pixel or None """
+        if self._np:
+            return self._palette[int(self._pix[y, x])]
+        return self._palette[self._pix[y * self.pwidth + x]]
+
+    def _plot(self, xs, ys, cid):
+        """ Set the points of the (numpy arrays or lists) xs and ys """
+        if self._np:
+            np = self._np
+            xs = np.rint(xs).astype(np.intp)
+            ys = np.rint(ys).astype(np.intp)
+            m = (xs >= 0) & (xs < self.pwidth) & (ys >= 0) & (ys < self.pheight)
+            self._pix[ys[m], xs[m]] = cid
+            return
+        pix = self._pix
+        pw = self.pwidth
+        ph = self.pheight
+        for x, y in zip(xs, ys):
+            x = int(round(x))
+            y = int(round(y))
+            if 0 <= x < pw and 0 <= y < ph:
+                pix[y * pw + x] = cid
+
+    def _span(self, y, x0, x1, cid):
+        """ Set the pixels from x0 to x1 (inclusive) on row y """
+        x0 = max(x0, 0)
+        x1 = min(x1, self.pwidth - 1)
+        if not 0 <= y < self.pheight or x1 < x0:
+            return
+        if self._np:
+            self._pix[y, x0:x1 + 1] = cid
+        else:
+            start = y * self.pwidth
+            self._pix[start + x0:start + x1 + 1] = \
+                    array.array("H", [cid]) * (x1 - x0 + 1)
+
+    def points(self, points, color = colors.WHITE):
+        """ Set every (x, y) of points """
+        points = list(points)
+        if not points:
+            return
+        if self._np:
+            pts = self._np.asarray(points, dtype = float)
+            self._plot(pts[:, 0], pts[:, 1], self._colorid(color))
+        else:
+            self._plot([p[0] for p in points], [p[1] for p in points],
+                       self._colorid(color))
+
+    def segments(self, segments, color = colors.WHITE):
+        """ Draw every line segment (x0, y0, x1, y1) of segments """
+        segments = list(segments)
+        if not segments:
+            return
+        cid = self._colorid(color)
+        if self._np:
+            # Sample all segments at once, one point per sub-pixel step
+            np = self._np
+            s = np.rint(np.asarray(segments, dtype = float))
+            x0, y0 = s[:, 0], s[:, 1]
+            dx, dy = s[:, 2] - x0, s[:, 3] - y0
+            steps = np.maximum(np.abs(dx), np.abs(dy)).astype(np.intp)
+            counts = steps + 1
+            seg = np.repeat(np.arange(len(s)), counts)
+            first = np.cumsum(counts) - counts
+            t = (np.arange(counts.sum()) - first[seg]) / \
+                    np.maximum(steps, 1)[seg]
+            self._plot(x0[seg] + dx[seg] * t, y0[seg] + dy[seg] * t, cid)
+            return
+        pix = self._pix
+        pw = self.pwidth
+        ph = self.pheight
+        for x0, y0, x1, y1 in segments:
+            # Integer Bresenham writing straight into the bitmap
+            x0, y0, x1, y1 = (int(round(v)) for v in (x0, y0, x1, y1))
+            dx = abs(x1 - x0)
+            dy = -abs(y1 - y0)
+            sx = 1 if x0 < x1 else -1
+            sy = 1 if y0 < y1 else -1
+            err = dx + dy
+            while True:
+                if 0 <= x0 < pw and 0 <= y0 < ph:
+                    pix[y0 * pw + x0] = cid
+                if x0 == x1 and y0 == y1:
+                    break
+                e2 = 2 * err
+                if e2 >= dy:
+                    err += dy
+                    x0 += sx
+                if e2 <= dx:
+                    err += dx
+                    y0 += sy
+
+    def polyline(self, points, color = colors.WHITE, closed = False):
+        """ Draw segments connecting the (x, y) of points """
+        points = list(points)
+        if closed and points:
+            points.append(points[0])
+        if len(points) == 1:
+            self.points(points, color = color)
+        self.segments([(a[0], a[1], b[0], b[1])
+                       for a, b in zip(points, points[1:])], color = color)
+
+    def fill_polygon(self, points, color = colors.WHITE):
+        """ Fill the polygon of the (x, y) of points by the even-odd rule """
+        points = list(points)
+        if len(points) < 3:
+            self.polyline(points, color = color)
+            return
+        cid = self._colorid(color)
+        ymin = max(int(floor(min(p[1] for p in points))), 0)
+        ymax = min(int(ceil(max(p[1] for p in points))), self.pheight - 1)
+        edges = list(zip(points, points[1:] + points[:1]))
+        if self._np:
+            np = self._np
+            e = np.asarray([(a[0], a[1], b[0], b[1]) for a, b in edges],
+                           dtype = float)
+            x0, y0, x1, y1 = e[:, 0], e[:, 1], e[:, 2], e[:, 3]
+            for y in range(ymin, ymax + 1):
+                m = (y0 <= y) != (y1 <= y)
+                xs = np.sort(x0[m] + (y - y0[m]) * (x1[m] - x0[m]) /
+                             (y1[m] - y0[m]))
+                for a, b in zip(xs[::2], xs[1::2]):
+                    self._span(y, int(ceil(a)), int(floor(b)), cid)
+            return
+        for y in range(ymin, ymax + 1):
+            xs = sorted(a[0] + (y - a[1]) * (b[0] - a[0]) / (b[1] - a[1])
+                        for a, b in edges if (a[1] <= y) != (b[1] <= y))
+            for a, b in zip(xs[::2], xs[1::2]):
+                self._span(y, int(ceil(a)), int(floor(b)), cid)
+
+    def circle(self, x, y, r, color = colors.WHITE, fill = False):
+        n = max(8, int(2 * pi * r))
+        points = [(x + r * cos(2 * pi * i / n), y + r * sin(2 * pi * i / n))
+                  for i in range(n)]
+        if fill:
+            self.fill_polygon(points, color = color)
+        self.polyline(points, color = color, closed = True)
+
+    def _cells(self):
+        """ Yield (x, y, character, fg, bg) of every cell """
+        w = self.width
+        pal = self._palette
+        if self.mode == HALFBLOCK:
+            rows = self._pix.tolist() if self._np else \
+                    [self._pix[i:i + self.pwidth]
+                     for i in range(0, len(self._pix), self.pwidth)]
+            for y in range(self.height):
+                for x, (t, b) in enumerate(zip(rows[2 * y], rows[2 * y + 1])):
+                    if t:
+                        yield x, y, "▀", pal[t], pal[b] or self.bg
+                    elif b:
+                        yield x, y, "▄", pal[b], self.bg
+                    else:
+                        yield x, y, " ", self.bg, self.bg
+            return
+        if self._np:
+            # Dot bits and the highest color id of each cell
+            p = self._pix.reshape(self.height, 4, w, 2)
+            bits = sum((p[:, r, :, c] != 0) * self.DOTS[c][r]
+                       for c in range(2) for r in range(4)).tolist()
+            cids = p.max(axis = (1, 3)).tolist()
+            for y in range(self.height):
+                for x in range(w):
+                    yield x, y, chr(0x2800 + bits[y][x]), \
+                            pal[cids[y][x]] or self.bg, self.bg
+            return
+        pix = self._pix
+        pw = self.pwidth
+        for y in range(self.height):
+            for x in range(w):
+                b = 0
+                cid = 0
+                for r in range(4):
+                    i = (4 * y + r) * pw + 2 * x
+                    if pix[i]:
+                        b |= self.DOTS[0][r]
+                        cid = max(cid, pix[i])
+                    if pix[i + 1]:
+                        b |= self.DOTS[1][r]
+                        cid = max(cid, pix[i + 1])
+                yield x, y, chr(0x2800 + b), pal[cid] or self.bg, self.bg
+
+    def draw(self, canvas, x = 0, y = 0):
+        """ Write all the cells to canvas with the top left corner at x, y """
+        x0 = max(-x, 0)
+        x1 = min(canvas.width - x, self.width)
+        y0 = max(-y, 0)
+        y1 = min(canvas.height - y, self.height)
+        for cx, cy, c, fg, bg in self._cells():
+            if x0 <= cx < x1 and y0 <= cy < y1:
+                canvas.set(x + cx, y + cy, c, fg = fg, bg = bg)
@@ -20,17 +20,33 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import asyncio
+import concurrent.futures
+import copy
 import inspect
 import collections
-from functools import wraps
+import weakref
+from functools import partial, wraps
 
-_unbound_handlers = {}
+# What EventSource does with an offloaded handler while it is saturated
+DROP = 0 # Forget the event
+QUEUE = 1 # Run it later, unless max_queued events are waiting already
+LATEST = 2 # Run it later instead of all the events waiting
 
-def _fullname(o):
-    if hasattr(o, "__module__") and o.__module__:
-        return o.__module__ + "." + o.__qualname__
-    return o.__qualname__
+# Size of the pool running handlers bound with thread = True
+THREAD_WORKERS = 4
 
+_executor = None
+
+# Offloaded handlers which have not finished yet, so headless runs can wait
+# for them
+_offloaded = set()
+
+def _thread_executor():
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(max_workers = THREAD_WORKERS)
+    return _executor
 
 def handler(evname, **kwargs):
     """
@@ -46,17 +62,23 @@ def handler(evname, **kwargs):
           @handler("key", invert = True, key = "\r"):
           def onkey(self, event):
               pass
+
+          @handler("key", key = "\r")
+          @asyncio.coroutine
+          def onenter(self, event):
+              yield from self.lookup(event) # Runs without blocking input
+
+          @handler("key", key = "s", thread = True)
+          def onsave(self, event):
+              self.save() # Runs in a worker thread
     """
     def decor(fn):
-        # As there is no way to get the class object at this point, put the
-        # event handler into a global map and then .class_bind it properly when
+        # As there is no way to get the class object at this point, note the
+        # event handler on the function and then .class_bind it properly when
         # the constructor first gets called.
-        # Also note that we are using string name instead of the actual function
-        # reference. This is because @wraps does not fix the == operator.
-        nm = _fullname(fn)
-        if nm not in _unbound_handlers:
-            _unbound_handlers[nm] = []
-        _unbound_handlers[nm].append((evname, kwargs))
+        # Also note that this survives other decorators using @wraps, as it
+        # copies the __dict__ of the function.
+        fn.__dict__.setdefault("_event_handlers", []).append((evname, kwargs))
         return fn
     return decor
 
@@ -66,18 +88,86 @@ class EventSource:
 
     """
     Base class for all classes that want to fire events.
+
+    Coroutine handlers and handlers bound with thread = True do not run
+    inside .fire. At most max_running of them run at once for a source, the
+    others are handled according to overflow (DROP, QUEUE or LATEST).
+
+    Sources use __slots__, subclasses declaring none get a __dict__ as usual.
     """
 
+    __slots__ = ("_handlers", "_dispatch", "_running", "_backlog", "_limits",
+                 "__weakref__")
+
+    max_running = 1
+    max_queued = 16
+    overflow = QUEUE
+
     class Handler:
 
+        __slots__ = ("evname", "fn", "mkws", "canreject", "thread",
+                     "coroutine", "match", "keys")
+
         def __init__(self, evname, fn, mkws = {}):
             self.evname = evname
             self.fn = fn
             self.mkws = mkws
+            self.canreject = mkws.get("canreject", False)
+            self.thread = mkws.get("thread", False)
+            self.coroutine = asyncio.iscoroutinefunction(fn)
+            self.match, self.keys = EventSource.Handler._compile(mkws)
+
+        def bound(self, fn):
+            """ Return a copy of this handler calling fn, skipping the compilation """
+            h = EventSource.Handler.__new__(EventSource.Handler)
+            h.evname = self.evname
+            h.fn = fn
+            h.mkws = self.mkws
+            h.canreject = self.canreject
+            h.thread = self.thread
+            h.coroutine = self.coroutine
+            h.match = self.match
+            h.keys = self.keys
+            return h
+
+        @staticmethod
+        def _compile(mkws):
+            """
+            Translate the matcher options into a predicate taking the event
+            (None when it matches everything) and, for handlers matching
+            only on key/keys, a tuple of the values to index them by.
+            """
+            kws = {k: v for k, v in mkws.items()
+                        if k not in {"matcher", "invert", "canreject", "thread", "weak"}}
+            matcher = mkws.get("matcher", None)
+            invert = mkws.get("invert", False)
+            if matcher:
+                match = lambda ev: matcher(ev, **kws)
+            elif kws:
+                match = lambda ev: ev.matches(**kws)
+            else:
+                match = None
+            if invert:
+                if match:
+                    inner = match
+                    match = lambda ev: not inner(ev)
+                else:
+                    match = lambda ev: False
+            keys = None
+            if not matcher and not invert and set(kws) in ({"key"}, {"keys"}):
+                if kws.get("key", None) is not None:
+                    keys = (kws["key"],)
+                elif isinstance(kws.get("keys", None), (list, tuple, set, frozenset)):
+                    keys = tuple(kws["keys"])
+            return match, keys
 
     def __init__(self):
         self._bind_handlers()
         self._handlers = {}
+        self._dispatch = {}
+        self._running = 0
+        self._backlog = None
+        self._limits = None
         self._inherit_handlers()
 
     @classmethod
@@ -106,71 +196,186 @@ class EventSource:
         for x in cls.__dict__.values():
             if not callable(x):
                 continue
-            nm = _fullname(x)
-            if nm in _unbound_handlers:
-                for evname, mkws in _unbound_handlers[nm]:
-                    cls._class_bind(evname, x, **mkws)
+            for evname, mkws in getattr(x, "_event_handlers", []):
+                cls._class_bind(evname, x, **mkws)
 
-    def _inherit_handlers(self):
-        """ .bind class handlers from all parent classes. """
-        for parent in [p for p in inspect.getmro(self.__class__) \
+    @classmethod
+    def _handler_table(cls):
+        """
+        Return a list of (method name, EventSource.Handler) for all class
+        handlers of this class and its parents. Computed once per class.
+        """
+        if "_class_handler_table" in cls.__dict__:
+            return cls._class_handler_table
+        cls._bind_handlers()
+        # Notice that we cannot just getattr on an instance as that could
+        # attempt to dereference properties depending on uninitialized variables
+        names = {}
+        for metname in dir(cls):
+            clfn = getattr(cls, metname, None)
+            if callable(clfn):
+                try:
+                    names.setdefault(clfn, []).append(metname)
+                except TypeError: # Unhashable
+                    pass
+        table = []
+        for parent in [p for p in inspect.getmro(cls) \
                         if hasattr(p, "_class_handlers")]:
             for ev, hdls in parent._class_handlers.items():
                 for h in hdls:
-                    # Find the appropriate bound method of self
-                    for metname in self.__dir__():
-                        # Notice that we cannot just getattr on self as that could
-                        # attempt to dereference properties depending on uninitialized variables
-                        clfn = getattr(self.__class__, metname, None)
-                        if clfn and clfn == h.fn:
-                            self.bind(ev, getattr(self, metname), **h.mkws)
+                    for metname in names.get(h.fn, []):
+                        table.append((metname, h))
+        cls._class_handler_table = table
+        return table
+
+    def _inherit_handlers(self):
+        """ .bind class handlers from all parent classes. """
+        for metname, h in self._handler_table():
+            self._add_handler(h.bound(getattr(self, metname)))
+
+    def _add_handler(self, h):
+        if h.evname not in self._handlers:
+            self._handlers[h.evname] = []
+        self._handlers[h.evname].append(h)
+        self._dispatch.pop(h.evname, None)
+        return h
 
     def bind(self, evname, fn, **kwargs):
         """
-        Bind an handler for an event with the provided name.
+        Bind an handler for an event with the provided name. With weak = True,
+        only a weak reference to fn is kept and the handler unbinds itself
+        when fn (or the object of a bound method) gets collected.
 
         Returns a reference to an instance of EventSource.Handler which can be then passed
         to .unbind
         """
-        if evname not in self._handlers:
-            self._handlers[evname] = []
         h = EventSource.Handler(evname, fn, kwargs)
-        self._handlers[evname].append(h)
-        return h
+        if kwargs.get("weak", False):
+            self._weaken(h)
+        return self._add_handler(h)
+
+    @staticmethod
+    def _collected(source, h, _):
+        """ Unbind h from the weakly referenced source once its function is gone """
+        s = source()
+        if s is not None and h in s._handlers.get(h.evname, []):
+            s.unbind(h)
+
+    def _weaken(self, h):
+        collected = partial(EventSource._collected, weakref.ref(self), h)
+        if inspect.ismethod(h.fn):
+            ref = weakref.WeakMethod(h.fn, collected)
+        else:
+            ref = weakref.ref(h.fn, collected)
+        def call(event):
+            fn = ref()
+            if fn is not None:
+                return fn(event)
+        h.fn = call
 
     def unbind(self, handler):
         """ Unbind a handler registered with the .bind method. """
         self._handlers[handler.evname].remove(handler)
+        self._dispatch.pop(handler.evname, None)
+
+    def limit_handlers(self, running = None, queued = None, overflow = None):
+        """ Override the class limits of offloaded handlers for this source """
+        limits = self._limits or (self.max_running, self.max_queued, self.overflow)
+        self._limits = (limits[0] if running is None else running,
+                        limits[1] if queued is None else queued,
+                        limits[2] if overflow is None else overflow)
+
+    def _offload(self, h, event):
+        """ Start h outside of .fire or hold it back if the source is saturated """
+        running, queued, overflow = \
+                self._limits or (self.max_running, self.max_queued, self.overflow)
+        if self._running < running:
+            self._start(h, event)
+            return
+        if overflow == DROP:
+            return
+        if self._backlog is None:
+            self._backlog = collections.deque()
+        if overflow == LATEST:
+            self._backlog.clear()
+        if len(self._backlog) < queued:
+            self._backlog.append((h, event))
+
+    def _start(self, h, event):
+        loop = asyncio.get_event_loop()
+        if h.coroutine:
+            fut = asyncio.ensure_future(h.fn(event), loop = loop)
+        else:
+            fut = loop.run_in_executor(_thread_executor(), h.fn, event)
+        self._running += 1
+        _offloaded.add(fut)
+        fut.add_done_callback(self._offload_done)
+
+    def _offload_done(self, fut):
+        self._running -= 1
+        _offloaded.discard(fut)
+        if not fut.cancelled() and fut.exception() is not None:
+            asyncio.get_event_loop().call_exception_handler({
+                "message": "Exception in an offloaded event handler",
+                "exception": fut.exception(),
+                "future": fut,
+            })
+        if self._backlog:
+            self._start(*self._backlog.popleft())
+
+    def _entry(self, h, match):
+        if h.coroutine or h.thread:
+            # The result is not known yet, so these cannot reject
+            return (match, partial(self._offload, h), False)
+        return (match, h.fn, h.canreject)
+
+    def _compile_dispatch(self, evname):
+        """
+        Build the (all, unkeyed, bykey) handler lists for an event name.
+        Each list holds (match, fn, canreject) tuples in the order of binding.
+        bykey maps a key value to the unkeyed handlers merged with the ones
+        bound to that key, which then do not need to be matched again.
+        """
+        every = []
+        unkeyed = []
+        bykey = {}
+        for h in self._handlers.get(evname, []):
+            entry = self._entry(h, h.match)
+            every.append(entry)
+            if h.keys is None:
+                unkeyed.append(entry)
+                for hs in bykey.values():
+                    hs.append(entry)
+            else:
+                for k in collections.OrderedDict.fromkeys(h.keys):
+                    if k not in bykey:
+                        bykey[k] = list(unkeyed)
+                    bykey[k].append(self._entry(h, None))
+        return every, unkeyed, bykey
 
     def fire(self, event):
         """
         Fire an event from this object and return True when at least one
-        handler was found and executed.
+        handler was found and executed (or offloaded).
         """
-        if self._handlers.get(event.name, []):
-            ret = False
-            for h in self._handlers[event.name]:
-                kws = h.mkws.copy()
-                matcher = event.matches
-                flip = False
-                canreject = False
-                if "matcher" in kws:
-                    kws.pop("matcher")
-                    matcher = lambda **kwargs: h.mkws["matcher"](event, **kwargs)
-                if "invert" in kws:
-                    flip = kws["invert"]
-                    kws.pop("invert")
-                if "canreject" in kws:
-                    canreject = kws["canreject"]
-                    kws.pop("canreject")
-                if flip ^ matcher(**kws):
-                    hrt = h.fn(event)
-                    if canreject:
-                        ret = hrt or ret
-                    else:
-                        ret = True
-            return ret
-        return False
+        try:
+            every, unkeyed, bykey = self._dispatch[event.name]
+        except KeyError:
+            every, unkeyed, bykey = self._dispatch[event.name] = \
+                    self._compile_dispatch(event.name)
+        if event.keyattr is None:
+            hs = every
+        else:
+            hs = bykey.get(getattr(event, event.keyattr), unkeyed)
+        ret = False
+        for match, fn, canreject in hs:
+            if match is None or match(event):
+                if canreject:
+                    ret = fn(event) or ret
+                else:
+                    fn(event)
+                    ret = True
+        return ret
 
 
 class Event:
@@ -179,9 +384,18 @@ class Event:
     Base class for events.
     """
 
+    __slots__ = ("name", "source", "routed")
+
+    # Attribute compared by the key/keys matcher options, handlers binding
+    # only those are then looked up by its value instead of being matched
+    keyattr = None
+
     def __init__(self, name, source = None):
         self.name = name
         self.source = source
+        # Set when the event is already travelling along the path to its
+        # target, so containers should not forward it to their children again
+        self.routed = False
 
     def matches(self):
         """
@@ -193,6 +407,12 @@ class Event:
 
 class KeyEvent(Event):
 
+    __slots__ = ("raw", "val", "shift", "alt", "ctrl", "isescape")
+
+    keyattr = "val"
+
+    Key = collections.namedtuple("Key", ["val", "shift", "alt", "ctrl"])
+
     _CSI_CURSOR = {
         "A": "<up>",
         "B": "<down>",
@@ -221,13 +441,27 @@ class KeyEvent(Event):
         24: "<f12>",
     }
 
+    # Raw sequence -> KeyEvent.Key, see _build_table, built on first use
+    _TABLE = None
+
     def __init__(self, s):
         super(KeyEvent, self).__init__("key")
         self.raw = s
-        self.shift = False
-        self.alt = False
-        self.ctrl = False
         self.isescape = False
+        table = KeyEvent._TABLE
+        if table is None:
+            table = KeyEvent._TABLE = KeyEvent._build_table()
+        try:
+            self.val, self.shift, self.alt, self.ctrl = table[s]
+        except KeyError:
+            self.val, self.shift, self.alt, self.ctrl = KeyEvent._parse(s)
+
+    @staticmethod
+    def _parse(s):
+        """ Decode a raw input sequence into a KeyEvent.Key """
+        shift = False
+        alt = False
+        ctrl = False
         if s[0] == "\x1b": # Escape sequence
             if s[1] in ["[", "O"]:
                 csinum = 1
@@ -236,39 +470,63 @@ class KeyEvent(Event):
                     csinum = int(spl[0])
                     mod = int(spl[1]) - 1
                     if mod & 0x1:
-                        self.shift = True
+                        shift = True
                     if mod & 0x2:
-                        self.alt = True
+                        alt = True
                     if mod & 0x4:
-                        self.ctrl = True
+                        ctrl = True
                 elif s[-1] == "~":
                     csinum = int(s[2:-1])
                 if csinum != 1 and csinum in KeyEvent._CSINUM.keys():
-                    self.val = KeyEvent._CSINUM[csinum]
+                    val = KeyEvent._CSINUM[csinum]
                 elif s[-1] in KeyEvent._CSI_CURSOR.keys():
-                    self.val = KeyEvent._CSI_CURSOR[s[-1]]
+                    val = KeyEvent._CSI_CURSOR[s[-1]]
                 elif s[-1] == "Z":
-                    self.val = "\t"
-                    self.shift = True
+                    val = "\t"
+                    shift = True
                 else:
                     raise ValueError("Invalid CSI value")
             else:
-                self.val = s[1]
-                self.alt = True
+                val = s[1]
+                alt = True
         else:
-            self.val = s
-
-        if len(self.val) == 1 and ord(self.val) in range(0x01, 0x1a) \
-                and self.val not in "\r\t\n":
-            self.val = chr(ord(self.val) + 0x60)
-            self.ctrl = True
-
-        if self.shift:
-            self.val = self.val.upper()
-        if self.alt:
-            self.val = "!" + self.val
-        if self.ctrl:
-            self.val = "^" + self.val
+            val = s
+
+        if len(val) == 1 and ord(val) in range(0x01, 0x1a) \
+                and val not in "\r\t\n":
+            val = chr(ord(val) + 0x60)
+            ctrl = True
+
+        if shift:
+            val = val.upper()
+        if alt:
+            val = "!" + val
+        if ctrl:
+            val = "^" + val
+        return KeyEvent.Key(val, shift, alt, ctrl)
+
+    @staticmethod
+    def _build_table():
+        """
+        Precompute KeyEvent.Key for every sequence a terminal commonly sends,
+        that is all ASCII characters (plain and with alt) and all cursor and
+        function keys with every modifier combination.
+        """
+        seqs = [chr(c) for c in range(0x01, 0x80) if c != 0x1b]
+        seqs += ["\x1b" + chr(c) for c in range(0x20, 0x7f)
+                    if chr(c) not in "[O"]
+        seqs.append("\x1b[Z")
+        for mod in range(2, 9):
+            for c in KeyEvent._CSI_CURSOR.keys():
+                seqs.append("\x1b[1;%d%s" % (mod, c))
+            for n in KeyEvent._CSINUM.keys():
+                seqs.append("\x1b[%d;%d~" % (n, mod))
+        for c in KeyEvent._CSI_CURSOR.keys():
+            seqs.append("\x1b[" + c)
+            seqs.append("\x1bO" + c)
+        for n in KeyEvent._CSINUM.keys():
+            seqs.append("\x1b[%d~" % n)
+        return {s: KeyEvent._parse(s) for s in seqs}
 
     def matches(self, key = None, keys = None):
         return (key is None or self.val == key) and \
@@ -281,6 +539,8 @@ class KeyEvent(Event):
 
 class MouseEvent(Event):
 
+    __slots__ = ("raw", "button", "drag", "released", "pressed", "x", "y")
+
     LEFT = 0
     MIDDLE = 1
     RIGHT = 2
@@ -306,10 +566,11 @@ class MouseEvent(Event):
         if self.y < 0:
             self.y += 255
 
-    def shifted(self, x, y):
-        ret = MouseEvent(self.raw)
+    def shifted(self, x, y, routed = False):
+        ret = copy.copy(self)
         ret.x = self.x - x
         ret.y = self.y - y
+        ret.routed = routed
         return ret
 
     def matches(self, pressed = None, released = None, drag = None, button = None):
@@ -327,6 +588,8 @@ class ClickEvent(Event):
 
     """ Event fired on itself by the Widget class when it decides it has been clicked on. """
 
+    __slots__ = ()
+
     def __init__(self, source = None):
         super(ClickEvent, self).__init__("click", source = source)
 
@@ -335,6 +598,8 @@ class ValueEvent(Event):
 
     """ Event fired by ValueWidget when its value changes. """
 
+    __slots__ = ("new", "old")
+
     def __init__(self, new, old = None, source = None):
         super(ValueEvent, self).__init__("value", source = source)
         self.new = new
@@ -349,5 +614,7 @@ class PressEvent(Event):
 
     """ Event fired on itself by button when pressed. """
 
+    __slots__ = ()
+
     def __init__(self, source = None):
         super(PressEvent, self).__init__("press", source = source)
@@ -140,3 +140,65 @@ class MouseEvent:
     def __str__(self):
         return "<input.MouseEvent x = %d y = %d button = %d pressed = %r drag = %r released = %r>" % \
                 (self.x, self.y, self.button, self.pressed, self.drag, self.released)
+
+
+class InputParser:
+
+    """
+    Incrementally splits raw terminal input into key and mouse sequences.
+    """
+
+    def __init__(self):
+        self._buf = b""
+
+    def feed(self, data):
+        """
+        Add a chunk of raw input and return a list of (sequence, ismouse)
+        tuples for every sequence that is complete. Incomplete sequences are
+        kept until more data arrives.
+        """
+        self._buf += data
+        ret = []
+        while self._buf:
+            n, mouse = InputParser._split(self._buf)
+            if not n:
+                break
+            ret.append((self._buf[:n], mouse))
+            self._buf = self._buf[n:]
+        return ret
+
+    @staticmethod
+    def _split(b):
+        """ Return the length of the first sequence in b or 0 when incomplete """
+        if b[0] == 0x1b:
+            # TODO: Do some testing on a bunch of different terminals
+            if len(b) < 2:
+                return 0, False
+            if chr(b[1]) not in {"[", "O"}:
+                return 2, False
+            if len(b) < 3:
+                return 0, False
+            if chr(b[2]) == "M":
+                return (6, True) if len(b) >= 6 else (0, False)
+            i = 2
+            while b[i] in range(ord("0"), ord("9") + 1):
+                i += 1
+                if i == len(b):
+                    return 0, False
+            while chr(b[i]) == ";":
+                i += 1
+                if i == len(b):
+                    return 0, False
+                while b[i] in range(ord("0"), ord("9") + 1):
+                    i += 1
+                    if i == len(b):
+                        return 0, False
+            return i + 1, False
+        # Decode unicode, the number of leading ones is the total length
+        c = 0
+        k = b[0]
+        while k & 0x80:
+            k = (k << 1) & 0xff
+            c += 1
+        n = max(c, 1)
+        return (n, False) if len(b) >= n else (0, False)
@@ -20,20 +20,301 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import os
+from array import array
 from functools import wraps
 
+_np = None
+
+def _numpy():
+    """ Import numpy on first use, returns None if it is not installed """
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np or None
+
+# Set by python -O or the WYTCH_OPTIMIZE environment variable, @typed then
+# leaves the functions it decorates unchanged and coerces nothing
+OPTIMIZED = not __debug__ or bool(os.environ.get("WYTCH_OPTIMIZE"))
+
+# Code object flags, from the inspect module
+CO_VARARGS = 0x04
+CO_VARKEYWORDS = 0x08
+
+# Default of the parameters the generated @typed wrappers check
+_UNSET = object()
+
 def typed(*types, **kwtypes):
+    """
+    Decorator converting the arguments of a function to the given types when
+    they are not instances of them already. types apply to the positional
+    parameters in order (None to skip one), kwtypes to parameters by name.
+    A wrapper specialized to the signature of the function is generated
+    once, so calls pay only for the isinstance checks.
+    """
     def decorator(fn):
-        @wraps(fn)
-        def ret(*args, **kwargs):
-            kws = {}
-            for k, v in kwargs.items():
-                t = kwtypes.get(k, None)
-                if not t or isinstance(v, t):
-                    kws[k] = v
-                else:
-                    kws[k] = t(v)
-            return fn(*[t(a) if t and not isinstance(a, t) else a
-                for a, t in zip(args, types)], **kws)
+        if OPTIMIZED:
+            return fn
+        ret = _typed_specialized(fn, types, kwtypes) or \
+                _typed_generic(fn, types, kwtypes)
+        ret._unchecked = fn
         return ret
     return decorator
+
+def unchecked(fn):
+    """ Return the function (or bound method) decorated by @typed without the checks """
+    inner = getattr(getattr(fn, "__func__", fn), "_unchecked", None)
+    if inner is None:
+        return fn
+    if hasattr(fn, "__self__"):
+        return inner.__get__(fn.__self__)
+    return inner
+
+def _typed_specialized(fn, types, kwtypes):
+    """ Generate a wrapper with the signature of fn, None if it cannot """
+    # Read the signature off the code object, inspect is slow to import
+    code = getattr(fn, "__code__", None)
+    if code is None or getattr(code, "co_posonlyargcount", 0) or \
+            len(types) > code.co_argcount:
+        return None
+    names = code.co_varnames
+    positional = names[:code.co_argcount]
+    kwonly = names[code.co_argcount:code.co_argcount + code.co_kwonlyargcount]
+    i = len(positional) + len(kwonly)
+    varargs = varkw = None
+    if code.co_flags & CO_VARARGS:
+        varargs = names[i]
+        i += 1
+    if code.co_flags & CO_VARKEYWORDS:
+        varkw = names[i]
+    defaults = fn.__defaults__ or ()
+    defaults = dict(zip(positional[len(positional) - len(defaults):], defaults))
+    defaults.update(fn.__kwdefaults__ or {})
+    checks = dict(kwtypes)
+    checks.update((n, t) for n, t in zip(positional, types) if t)
+    ns = {"_typed_fn": fn, "_typed_unset": _UNSET}
+    sig = []
+    body = []
+    for name in positional + kwonly:
+        t = checks.pop(name, None)
+        if t:
+            ns["_typed_t_" + name] = t
+        if name in defaults:
+            ns["_typed_d_" + name] = defaults[name]
+        if t and name in defaults:
+            # Like the arguments passed, only the defaults get no conversion
+            sig.append("%s = _typed_unset" % name)
+            body.append("    if %s is _typed_unset:\n"
+                        "        %s = _typed_d_%s\n"
+                        "    elif not isinstance(%s, _typed_t_%s):\n"
+                        "        %s = _typed_t_%s(%s)\n" % ((name,) * 8))
+        elif t:
+            sig.append(name)
+            body.append("    if not isinstance(%s, _typed_t_%s):\n"
+                        "        %s = _typed_t_%s(%s)\n" % ((name,) * 5))
+        elif name in defaults:
+            sig.append("%s = _typed_d_%s" % (name, name))
+        else:
+            sig.append(name)
+    call = list(positional)
+    if varargs:
+        sig.insert(len(positional), "*" + varargs)
+        call.append("*" + varargs)
+    elif kwonly:
+        sig.insert(len(positional), "*")
+    call += ["%s = %s" % (name, name) for name in kwonly]
+    if varkw:
+        sig.append("**" + varkw)
+        call.append("**" + varkw)
+        for k, t in checks.items():
+            ns["_typed_t_" + k] = t
+            body.append("    if %r in %s and not isinstance(%s[%r], _typed_t_%s):\n"
+                        "        %s[%r] = _typed_t_%s(%s[%r])\n" %
+                        (k, varkw, varkw, k, k, varkw, k, k, varkw, k))
+    src = "def typed_wrapper(%s):\n%s    return _typed_fn(%s)\n" % \
+            (", ".join(sig), "".join(body), ", ".join(call))
+    exec(src, ns)
+    return wraps(fn)(ns["typed_wrapper"])
+
+def _typed_generic(fn, types, kwtypes):
+    """ Wrapper checking the arguments of any callable on every call """
+    @wraps(fn)
+    def ret(*args, **kwargs):
+        kws = {}
+        for k, v in kwargs.items():
+            t = kwtypes.get(k, None)
+            if not t or isinstance(v, t):
+                kws[k] = v
+            else:
+                kws[k] = t(v)
+        return fn(*[t(a) if t and not isinstance(a, t) else a
+            for a, t in zip(args, types)], **kws)
+    return ret
+
+
+class GapBuffer:
+
+    """
+    List keeping a gap of free slots at the position of the last edit, so
+    that a series of inserts and deletes around one place costs O(1) each
+    (plus moving the gap by the distance from the previous edit).
+    """
+
+    def __init__(self, items = (), gap = 64):
+        self._buf = list(items)
+        self._start = len(self._buf)
+        self._buf.extend([None] * gap)
+        self._end = len(self._buf)
+
+    def __len__(self):
+        return len(self._buf) - (self._end - self._start)
+
+    def _index(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError("GapBuffer index out of range")
+        return i if i < self._start else i + self._end - self._start
+
+    def _move(self, i):
+        """ Move the gap to start at i """
+        buf = self._buf
+        start = self._start
+        end = self._end
+        # Slots the items moved out of and which are in the new gap get
+        # cleared, so that it does not keep references to them
+        if i < start:
+            n = start - i
+            buf[end - n:end] = buf[i:start]
+            self._start = i
+            self._end = end - n
+            clear = min(start, self._end)
+            buf[i:clear] = [None] * (clear - i)
+        elif i > start:
+            n = i - start
+            buf[start:i] = buf[end:end + n]
+            self._start = i
+            self._end = end + n
+            clear = max(end, i)
+            buf[clear:self._end] = [None] * (self._end - clear)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._buf[self._index(i)]
+
+    def __setitem__(self, i, v):
+        self._buf[self._index(i)] = v
+
+    def __delitem__(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError("GapBuffer index out of range")
+        self._move(i)
+        self._buf[self._end] = None
+        self._end += 1
+
+    def insert(self, i, v):
+        i = max(0, min(i if i >= 0 else i + len(self), len(self)))
+        self._move(i)
+        if self._start == self._end:
+            grow = max(len(self._buf) // 2, 64)
+            self._buf[self._end:self._end] = [None] * grow
+            self._end += grow
+        self._buf[self._start] = v
+        self._start += 1
+
+    def append(self, v):
+        self.insert(len(self), v)
+
+    def __iter__(self):
+        buf = self._buf
+        for i in range(self._start):
+            yield buf[i]
+        for i in range(self._end, len(buf)):
+            yield buf[i]
+
+
+class RingBuffer:
+
+    """
+    Fixed-size buffer of floats overwriting the oldest samples. Uses a numpy
+    array when numpy is installed (unless numpy = False), array.array
+    otherwise.
+    """
+
+    def __init__(self, capacity, numpy = None):
+        self.capacity = capacity
+        self._np = _numpy() if numpy is not False else None
+        if self._np:
+            self._buf = self._np.zeros(capacity)
+        else:
+            self._buf = array("d", bytes(8 * capacity))
+        self._head = 0 # Index of the next write
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def append(self, v):
+        self._buf[self._head] = v
+        self._head = (self._head + 1) % self.capacity
+        if self._len < self.capacity:
+            self._len += 1
+
+    def extend(self, vs):
+        if self._np:
+            vs = self._np.asarray(vs, dtype = float)[-self.capacity:]
+        else:
+            vs = array("d", vs)[-self.capacity:]
+        n = len(vs)
+        first = min(n, self.capacity - self._head)
+        self._buf[self._head:self._head + first] = vs[:first]
+        self._buf[:n - first] = vs[first:]
+        self._head = (self._head + n) % self.capacity
+        self._len = min(self._len + n, self.capacity)
+
+    def clear(self):
+        self._head = 0
+        self._len = 0
+
+    def values(self, last = None):
+        """ Return the last (default all) samples, oldest first """
+        n = self._len if last is None else min(last, self._len)
+        start = (self._head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self._buf[start:start + n]
+        if self._np:
+            return self._np.concatenate((self._buf[start:],
+                                         self._buf[:self._head]))
+        return self._buf[start:] + self._buf[:self._head]
+
+    def minmax(self, buckets, last = None):
+        """
+        Split the last (default all) samples into at most buckets equally
+        sized buckets and return a tuple of lists of their minimums and
+        maximums.
+        """
+        vals = self.values(last)
+        n = len(vals)
+        buckets = min(buckets, n)
+        if not buckets:
+            return [], []
+        if self._np:
+            idx = self._np.arange(buckets) * n // buckets
+            return (self._np.minimum.reduceat(vals, idx).tolist(),
+                    self._np.maximum.reduceat(vals, idx).tolist())
+        mins = []
+        maxs = []
+        for i in range(buckets):
+            b = vals[i * n // buckets:(i + 1) * n // buckets]
+            mins.append(min(b))
+            maxs.append(max(b))
+        return mins, maxs
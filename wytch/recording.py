@@ -0,0 +1,204 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import asyncio
+import struct
+import time
+
+from wytch import event
+from wytch.input import InputParser
+
+MAGIC = b"WYTCHIN1"
+
+INPUT = 0
+RESIZE = 1
+
+_SIZE = struct.Struct("<HH")
+_RECORD = struct.Struct("<dBI")
+
+class Clock:
+
+    """ Source of time for the render loop. """
+
+    def time(self):
+        return time.time()
+
+    @asyncio.coroutine
+    def sleep(self, delay):
+        yield from asyncio.sleep(delay)
+
+
+class VirtualClock(Clock):
+
+    """ Clock that only moves when advanced, used for headless replays. """
+
+    def __init__(self, now = 0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def advance(self, t):
+        self.now = max(self.now, t)
+
+    @asyncio.coroutine
+    def sleep(self, delay):
+        self.advance(self.now + max(delay, 0))
+        yield from asyncio.sleep(0)
+
+
+class InputRecorder:
+
+    """
+    Writes raw terminal input with timestamps relative to the start of the
+    recording. The file starts with MAGIC and the terminal size, followed by
+    records of (time, kind, length) and the payload.
+    """
+
+    def __init__(self, f, width, height, clock = None):
+        self.clock = clock if clock else Clock()
+        self._owned = isinstance(f, str)
+        self._f = open(f, "wb") if self._owned else f
+        self._start = self.clock.time()
+        self._f.write(MAGIC + _SIZE.pack(width, height))
+
+    def _write(self, kind, payload):
+        # Single write so that a signal handler can not interleave records
+        self._f.write(_RECORD.pack(self.clock.time() - self._start,
+                                   kind, len(payload)) + payload)
+        self._f.flush()
+
+    def input(self, data):
+        self._write(INPUT, data)
+
+    def resize(self, width, height):
+        self._write(RESIZE, _SIZE.pack(width, height))
+
+    def close(self):
+        if self._owned:
+            self._f.close()
+        else:
+            self._f.flush()
+
+
+class Recording:
+
+    """ Contents of a file written by InputRecorder. """
+
+    def __init__(self, width, height, records):
+        self.width = width
+        self.height = height
+        self.records = records
+
+    @property
+    def duration(self):
+        return self.records[-1][0] if self.records else 0
+
+    @staticmethod
+    def load(f):
+        if isinstance(f, str):
+            with open(f, "rb") as fo:
+                return Recording.load(fo)
+        data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a wytch input recording")
+        at = len(MAGIC)
+        width, height = _SIZE.unpack_from(data, at)
+        at += _SIZE.size
+        records = []
+        while at + _RECORD.size <= len(data):
+            t, kind, n = _RECORD.unpack_from(data, at)
+            at += _RECORD.size
+            if at + n > len(data):
+                break # Truncated by a crash, ignore the last record
+            records.append((t, kind, data[at:at + n]))
+            at += n
+        return Recording(width, height, records)
+
+
+class Player:
+
+    """
+    Drives a Wytch instance from a Recording without an event loop. Time only
+    moves in the VirtualClock of the Wytch, so a replay runs as fast as
+    rendering allows and its statistics are the same on every run.
+    Offloaded event handlers are run to completion after every input, handlers
+    waiting through the clock of the Wytch wait in virtual time as well.
+    """
+
+    def __init__(self, wytch, recording):
+        self.wytch = wytch
+        self.recording = recording
+        self.frames = 0
+        self.events = 0
+        self.frametimes = []
+        self.latencies = []
+        self._requested = None
+        self._next = 0
+
+    def _onupdate(self):
+        if self._requested is None:
+            self._requested = self.wytch.clock.time()
+
+    def _render_until(self, t):
+        """ Render all frames the render loop would have rendered before t """
+        w = self.wytch
+        while self._requested is not None:
+            ft = max(self._next, self._requested)
+            if ft > t:
+                break
+            w.clock.advance(ft)
+            self.latencies.append(ft - self._requested)
+            self._requested = None
+            w._render_frame()
+            w.rootcanvas.flush()
+            self.frames += 1
+            self.frametimes.append(ft)
+            self._next = ft + 1 / w.maxfps
+
+    def _drain(self):
+        """ Run the handlers offloaded by the last input until they finish """
+        while event._offloaded:
+            self.wytch.event_loop.run_until_complete(
+                    asyncio.wait(list(event._offloaded)))
+
+    def run(self):
+        w = self.wytch
+        w.realroot.onupdate = self._onupdate
+        if w.root.focusable:
+            w.root.focused = True
+        self._onupdate()
+        parser = InputParser()
+        for t, kind, payload in self.recording.records:
+            self._render_until(t)
+            w.clock.advance(t)
+            if kind == RESIZE:
+                w.consolecanvas.resize(*_SIZE.unpack(payload))
+                w._sigwinch = True
+                self._onupdate()
+            else:
+                for seq, mouse in parser.feed(payload):
+                    self.events += 1
+                    w._dispatch_input(seq, mouse)
+                    self._drain()
+        # Handlers may have moved the clock past the end of the recording
+        self._render_until(max(self.recording.duration, w.clock.time()) + 1 / w.maxfps)
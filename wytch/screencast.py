@@ -0,0 +1,373 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import bisect
+import struct
+import zlib
+from array import array
+
+from wytch import canvas, colors
+
+MAGIC = b"WYTCHSC1"
+
+KEYFRAME = 0
+DIFF = 1
+INDEX = 2
+# Set in the kind of records with a zlib compressed payload
+COMPRESSED = 0x80
+
+# Seconds between keyframes
+INTERVAL = 10
+# Styles after which the next frame is a keyframe, which starts a new table
+MAXSTYLES = 4096
+# Payloads of fewer bytes are not worth compressing
+COMPRESS = 64
+
+_RECORD = struct.Struct("<dBI")
+_SIZE = struct.Struct("<HH")
+_STYLE = struct.Struct("<7B")
+_ENTRY = struct.Struct("<dQ")
+_TRAILER = struct.Struct("<Q")
+
+def _varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(data, at):
+    n = 0
+    shift = 0
+    while True:
+        b = data[at]
+        at += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, at
+        shift += 7
+
+
+class Recorder:
+
+    """
+    Records what gets shown on a canvas as cell level diffs. Set as the .tee
+    of a BufferCanvas, it gets every cell the flush writes and a .commit()
+    after each frame. The file starts with MAGIC, followed by records of
+    (time, kind, length) and the payload, zlib compressed when that makes it
+    smaller: keyframes with the whole screen every interval seconds and
+    diffs with the cells changed by a frame in between. Both list the new
+    styles (fg, bg, flags) they use, the table starts over at every
+    keyframe so that playback can start there. On .close() the times and
+    offsets of the keyframes are appended as an index, followed by its
+    offset and MAGIC.
+    """
+
+    def __init__(self, f, interval = INTERVAL, clock = None):
+        from wytch import recording
+        self.clock = clock if clock else recording.Clock()
+        self.interval = interval
+        self._owned = isinstance(f, str)
+        self._f = open(f, "wb") if self._owned else f
+        self._f.write(MAGIC)
+        self._offset = len(MAGIC)
+        self._start = self.clock.time()
+        self._keytimes = array("d")
+        self._keyoffsets = array("Q")
+        self._nextkey = None # Time of the next keyframe, None for right away
+        self._styles = {}
+        self._byid = {}
+        self._alive = []
+        self._width = 0
+        self._height = 0
+        self._screen = []
+        self._changed = []
+        self.frames = 0
+
+    def clear(self, width, height):
+        """ The canvas got cleared to blank, the next frame is a keyframe """
+        self._width = width
+        self._height = height
+        self._screen = [(" ", canvas.CLEAR_FG, canvas.CLEAR_BG, 0)] * (width * height)
+        self._changed = []
+        self._nextkey = None
+
+    def set(self, x, y, c, fg, bg, flags):
+        i = y * self._width + x
+        self._screen[i] = (c, fg, bg, flags)
+        self._changed.append(i)
+
+    def commit(self, width, height):
+        """ End a frame of a width x height canvas """
+        if (width, height) != (self._width, self._height):
+            # Started recording after the first frame, the rest is unknown
+            self.clear(width, height)
+        t = self.clock.time() - self._start
+        if self._nextkey is None or t >= self._nextkey:
+            self._keyframe(t)
+        elif self._changed:
+            self._diff(t)
+        self._changed = []
+
+    def _keyframe(self, t):
+        self._styles = {}
+        self._byid = {}
+        self._alive = []
+        out = bytearray(_SIZE.pack(self._width, self._height))
+        self._cells(out, range(len(self._screen)))
+        self._keytimes.append(t)
+        self._keyoffsets.append(self._offset)
+        self._write(t, KEYFRAME, out)
+        self._nextkey = t + self.interval
+        # Keyframes are where playback can resume after a crash
+        self._f.flush()
+
+    def _diff(self, t):
+        self._write(t, DIFF, self._cells(bytearray(), self._changed))
+        if len(self._byid) > MAXSTYLES:
+            self._nextkey = None
+
+    def _cells(self, out, indexes):
+        """
+        Append the new styles followed by the runs of consecutive cells in
+        indexes as (cells skipped, length) and (style, character + 1) for
+        every cell, or 0 and the length and UTF-8 of longer strings.
+        """
+        screen = self._screen
+        styles = self._styles
+        byid = self._byid
+        new = bytearray()
+        body = bytearray()
+        first = len(styles)
+        runs = []
+        last = 0
+        for i in indexes:
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+        for start, end in runs:
+            _varint(body, start - last)
+            _varint(body, end - start)
+            last = end
+            for c, fg, bg, flags in screen[start:end]:
+                # Hashing ids is much cheaper than hashing Colors
+                key = (id(fg), id(bg), flags)
+                s = byid.get(key, None)
+                if s is None:
+                    s = self._style(fg, bg, flags, new)
+                    # Keep the colors so that their ids can not get reused
+                    byid[key] = s
+                    self._alive.append((fg, bg))
+                if s < 0x80:
+                    body.append(s)
+                else:
+                    _varint(body, s)
+                if len(c) == 1:
+                    o = ord(c) + 1
+                    if o < 0x80:
+                        body.append(o)
+                    else:
+                        _varint(body, o)
+                else:
+                    b = c.encode("utf-8")
+                    body.append(0)
+                    _varint(body, len(b))
+                    body += b
+        _varint(out, len(styles) - first)
+        out += new
+        out += body
+        return out
+
+    def _style(self, fg, bg, flags, new):
+        """ Return the id of a style, appending its definition to new if it is new """
+        key = (fg, bg, flags)
+        s = self._styles.get(key, None)
+        if s is None:
+            s = self._styles[key] = len(self._styles)
+            new += _STYLE.pack(fg.r, fg.g, fg.b, bg.r, bg.g, bg.b, flags)
+        return s
+
+    def _write(self, t, kind, payload):
+        if len(payload) >= COMPRESS:
+            z = zlib.compress(payload, 1)
+            if len(z) < len(payload):
+                payload = z
+                kind |= COMPRESSED
+        self._f.write(_RECORD.pack(t, kind, len(payload)))
+        self._f.write(payload)
+        self._offset += _RECORD.size + len(payload)
+        self.frames += 1
+
+    def close(self):
+        index = b"".join(_ENTRY.pack(t, o) for t, o in
+                         zip(self._keytimes, self._keyoffsets))
+        at = self._offset
+        t = self.clock.time() - self._start
+        self._f.write(_RECORD.pack(t, INDEX, len(index)) + index +
+                      _TRAILER.pack(at) + MAGIC)
+        if self._owned:
+            self._f.close()
+        else:
+            self._f.flush()
+
+
+class Player:
+
+    """
+    Reconstructs the screen at any time of a file written by Recorder,
+    reading from the last keyframe before it. Files that were not closed,
+    e.g. after a crash, have no index and get scanned for keyframes
+    instead, a truncated last record is ignored.
+    """
+
+    def __init__(self, f):
+        self._owned = isinstance(f, str)
+        self._f = open(f, "rb") if self._owned else f
+        self._f.seek(0)
+        if self._f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a wytch screencast")
+        self.screen = canvas.MemoryCanvas(0, 0)
+        self.keyframes = []
+        self.duration = 0
+        self._end = self._load_index()
+        if self._end is None:
+            self._end = self._scan()
+        self._keytimes = [t for t, _ in self.keyframes]
+        self._styles = []
+        self._at = None # Offset of the next record, None before any keyframe
+        self._time = None # Time of the frame on .screen
+
+    def _load_index(self):
+        """ Load the index of a closed file, returns where the frames end """
+        f = self._f
+        size = f.seek(0, 2)
+        tail = _RECORD.size + _TRAILER.size + len(MAGIC)
+        if size < len(MAGIC) + tail:
+            return None
+        f.seek(size - _TRAILER.size - len(MAGIC))
+        data = f.read()
+        if data[_TRAILER.size:] != MAGIC:
+            return None
+        at, = _TRAILER.unpack_from(data)
+        f.seek(at)
+        self.duration, kind, n = _RECORD.unpack(f.read(_RECORD.size))
+        if kind != INDEX:
+            return None
+        index = f.read(n)
+        self.keyframes = [_ENTRY.unpack_from(index, i)
+                          for i in range(0, n, _ENTRY.size)]
+        return at
+
+    def _scan(self):
+        """ Find the keyframes by reading the record headers """
+        f = self._f
+        at = len(MAGIC)
+        size = f.seek(0, 2)
+        while at + _RECORD.size <= size:
+            f.seek(at)
+            t, kind, n = _RECORD.unpack(f.read(_RECORD.size))
+            kind &= ~COMPRESSED
+            if at + _RECORD.size + n > size or kind == INDEX:
+                break
+            if kind == KEYFRAME:
+                self.keyframes.append((t, at))
+            self.duration = t
+            at += _RECORD.size + n
+        return at
+
+    def _records(self, t):
+        """ Apply the records from ._at up to time t """
+        f = self._f
+        f.seek(self._at)
+        while self._at + _RECORD.size <= self._end:
+            rt, kind, n = _RECORD.unpack(f.read(_RECORD.size))
+            if rt > t:
+                break
+            payload = f.read(n)
+            if kind & COMPRESSED:
+                payload = zlib.decompress(payload)
+                kind &= ~COMPRESSED
+            if kind == KEYFRAME:
+                self._styles = []
+                self.screen.resize(*_SIZE.unpack_from(payload))
+                self.screen.update_size()
+                self._apply(payload, _SIZE.size)
+            else:
+                self._apply(payload, 0)
+            self._at += _RECORD.size + n
+            self._time = rt
+
+    def _apply(self, data, at):
+        styles = self._styles
+        n, at = _read_varint(data, at)
+        for _ in range(n):
+            fr, fg, fb, br, bg, bb, flags = _STYLE.unpack_from(data, at)
+            styles.append((colors.Color((fr, fg, fb)),
+                           colors.Color((br, bg, bb)), flags))
+            at += _STYLE.size
+        screen = self.screen
+        width = screen.width
+        i = 0
+        end = len(data)
+        while at < end:
+            skip, at = _read_varint(data, at)
+            count, at = _read_varint(data, at)
+            i += skip
+            for j in range(i, i + count):
+                s, at = _read_varint(data, at)
+                o, at = _read_varint(data, at)
+                if o:
+                    c = chr(o - 1)
+                else:
+                    n, at = _read_varint(data, at)
+                    c = data[at:at + n].decode("utf-8")
+                    at += n
+                fg, bg, flags = styles[s]
+                screen.set(j % width, j // width, c, fg = fg, bg = bg, flags = flags)
+            i += count
+
+    def seek(self, t):
+        """ Reconstruct the screen at t seconds into .screen and return it """
+        k = bisect.bisect_right(self._keytimes, t) - 1
+        if k < 0:
+            raise ValueError("No frame at %f" % t)
+        keytime, offset = self.keyframes[k]
+        # Keep reading forward when no keyframe is in between
+        if self._time is None or self._time > t or self._time < keytime:
+            self._at = offset
+        self._records(t)
+        return self.screen
+
+    def frames(self):
+        """ Yield the time of every frame with .screen showing it """
+        self._at = len(MAGIC)
+        self._time = None
+        f = self._f
+        while self._at + _RECORD.size <= self._end:
+            f.seek(self._at)
+            t, _, _ = _RECORD.unpack(f.read(_RECORD.size))
+            self._records(t)
+            yield t
+
+    def close(self):
+        if self._owned:
+            self._f.close()
@@ -0,0 +1,416 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Josef Gajdusek
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import asyncio
+import re
+import threading
+from array import array
+
+from wytch import app, canvas, colors
+from wytch.input import InputParser
+
+# Asks the terminal for its size, it answers with ESC [ 8 ; rows ; columns t
+REPORT_SIZE = b"\x1b[18t"
+
+_SIZE_REPORT = re.compile(rb"\x1b\[8;(\d+);(\d+)t$")
+
+class Session(app.Wytch, asyncio.Protocol):
+
+    """
+    One connection to a Server, with its own terminal, input parser, views
+    and render loop, all running on the event loop of the server. The
+    terminal is assumed to have the default size of the server until it
+    answers REPORT_SIZE. Clients can send the same answer when resized.
+    """
+
+    def __init__(self, server):
+        super(Session, self).__init__(ctrlc = server.ctrlc, maxfps = server.maxfps,
+                                      budget = server.budget,
+                                      terminal = canvas.StreamCanvas(server.width,
+                                                                     server.height))
+        self.server = server
+        self.transport = None
+        self.frames = 0
+        self._closed = None
+        self._writable = None
+        self._task = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._closed = self.event_loop.create_future()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.__enter__()
+        self.server.sessions.add(self)
+        transport.write(REPORT_SIZE)
+        # Starts after setup, so the views are complete for the first frame
+        self._task = asyncio.ensure_future(self._main())
+        try:
+            self.server.setup(self)
+        except Exception as e:
+            self._fail(e)
+
+    def data_received(self, data):
+        try:
+            self.feed(data)
+        except app.WytchExitError:
+            self.close()
+        except Exception as e:
+            self._fail(e)
+
+    def connection_lost(self, exc):
+        self.close()
+
+    def pause_writing(self):
+        self._writable.clear()
+
+    def resume_writing(self):
+        self._writable.set()
+
+    def close(self):
+        """ End the session, restoring the terminal and disconnecting it """
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    def resize(self, width, height):
+        """ Change the size of the terminal before the next frame """
+        self.consolecanvas.resize(width, height)
+        self._sigwinch = True
+        self.request_redraw()
+
+    def _fail(self, e):
+        """ Report an exception of this session and end it, leaving the others running """
+        self.event_loop.call_exception_handler({
+            "message": "Exception in wytch session",
+            "exception": e,
+            "protocol": self,
+        })
+        self.close()
+
+    def _dispatch_input(self, b, mouse):
+        m = None if mouse else _SIZE_REPORT.match(b)
+        if m:
+            self.resize(int(m.group(2)), int(m.group(1)))
+            return
+        super(Session, self)._dispatch_input(b, mouse)
+
+    @asyncio.coroutine
+    def _flush(self, executor):
+        # Frames are diffs against what the client has, so one that does not
+        # keep up simply gets the changes of the frames it missed at once
+        yield from self._writable.wait()
+        self.rootcanvas.flush()
+        self.transport.write(self.consolecanvas.take())
+        self.frames += 1
+
+    @asyncio.coroutine
+    def _main(self):
+        self._loop_thread = threading.get_ident()
+        if self.root.focusable:
+            self.root.focused = True
+        render = asyncio.ensure_future(self._render_loop())
+        try:
+            yield from asyncio.wait([render, self._closed],
+                                    return_when = asyncio.FIRST_COMPLETED)
+            if render.done() and not isinstance(render.exception(), app.WytchExitError):
+                self._fail(render.exception())
+        finally:
+            render.cancel()
+            self._cleanup()
+            if not self.transport.is_closing():
+                self.transport.write(self.consolecanvas.take())
+                self.transport.close()
+            self.server.sessions.discard(self)
+
+
+class Listener:
+
+    """ Accepts connections over TCP or Unix sockets for the protocol of ._protocol() """
+
+    def __init__(self):
+        self._servers = []
+
+    def _protocol(self):
+        raise NotImplementedError()
+
+    def _started(self):
+        """ Called when starting to listen """
+        pass
+
+    def _close_connections(self):
+        """ Start closing all connections, returns the futures to wait for """
+        return []
+
+    @asyncio.coroutine
+    def start_tcp(self, host = None, port = 0, **kwargs):
+        """
+        Start listening on a TCP port, returns the asyncio server. kwargs are
+        passed on to loop.create_server (ssl, backlog, ...).
+        """
+        loop = asyncio.get_event_loop()
+        srv = yield from loop.create_server(self._protocol, host, port, **kwargs)
+        self._servers.append(srv)
+        self._started()
+        return srv
+
+    @asyncio.coroutine
+    def start_unix(self, path, **kwargs):
+        """
+        Start listening on a Unix socket, returns the asyncio server. kwargs
+        are passed on to loop.create_unix_server.
+        """
+        loop = asyncio.get_event_loop()
+        srv = yield from loop.create_unix_server(self._protocol, path, **kwargs)
+        self._servers.append(srv)
+        self._started()
+        return srv
+
+    @asyncio.coroutine
+    def close(self):
+        """ Stop listening and end all connections """
+        for srv in self._servers:
+            srv.close()
+        pending = self._close_connections()
+        if pending:
+            yield from asyncio.wait(pending)
+        for srv in self._servers:
+            yield from srv.wait_closed()
+        self._servers = []
+
+    def serve_forever(self, host = None, port = None, path = None):
+        """ Listen on a TCP port and/or a Unix socket until interrupted """
+        loop = asyncio.get_event_loop()
+        if port is not None:
+            loop.run_until_complete(self.start_tcp(host, port))
+        if path is not None:
+            loop.run_until_complete(self.start_unix(path))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            loop.run_until_complete(self.close())
+
+
+class Server(Listener):
+
+    """
+    Serves every client connecting over TCP or a Unix socket a separate
+    Session, all of them on one event loop. setup(session) is called for
+    every new session to build its views under session.root.
+    """
+
+    def __init__(self, setup, maxfps = 20, width = 80, height = 24, ctrlc = True,
+                 budget = 0):
+        super(Server, self).__init__()
+        self.setup = setup
+        self.maxfps = maxfps
+        self.width = width
+        self.height = height
+        self.ctrlc = ctrlc
+        self.budget = budget
+        self.sessions = set()
+
+    def _protocol(self):
+        return Session(self)
+
+    def _close_connections(self):
+        tasks = [s._task for s in self.sessions]
+        for s in list(self.sessions):
+            s.close()
+        return tasks
+
+
+class Broadcast(Listener):
+
+    """
+    Shows one view tree to every client connecting over TCP or a Unix
+    socket, as on a wallboard. The views under .root get rendered once per
+    frame, no matter the number of viewers, and each viewer is sent the
+    cells that changed since the frame it got last. Viewers that are not
+    keeping up skip straight to the latest frame. Viewers cannot interact,
+    Ctrl-C or q disconnects them.
+    """
+
+    class Screen(canvas.MemoryCanvas):
+
+        """ MemoryCanvas noting the frame in which every cell changed last """
+
+        __slots__ = ("frame", "versions", "changed")
+
+        def __init__(self, width, height):
+            self.frame = 0
+            self.versions = array("L", [0]) * (width * height)
+            self.changed = None
+            super(Broadcast.Screen, self).__init__(width, height)
+
+        def clear(self, blank = False):
+            super(Broadcast.Screen, self).clear(blank = blank)
+            if blank:
+                self.versions = array("L", [self.frame]) * (self.width * self.height)
+                # Everything changed
+                self.changed = None
+
+        def set(self, x, y, c, fg = colors.WHITE, bg = colors.BLACK, flags = 0):
+            super(Broadcast.Screen, self).set(x, y, c, fg = fg, bg = bg, flags = flags)
+            if self.contains(x, y):
+                i = y * self.width + x
+                self.versions[i] = self.frame
+                if self.changed is not None:
+                    self.changed.append(i)
+
+        def commit(self):
+            """ End the current frame, returns the indexes of the cells it changed (None for all) """
+            changed = self.changed
+            self.changed = []
+            self.frame += 1
+            return changed
+
+    class App(app.Wytch):
+
+        def __init__(self, board, screen, **kwargs):
+            super(Broadcast.App, self).__init__(terminal = screen, **kwargs)
+            self.board = board
+
+        @asyncio.coroutine
+        def _flush(self, executor):
+            self.rootcanvas.flush()
+            self.board._broadcast()
+            # Let the viewers read before the next frame
+            yield from asyncio.sleep(0)
+
+    class Viewer(asyncio.Protocol):
+
+        def __init__(self, board):
+            self.board = board
+            self.transport = None
+            # Last frame sent, -1 for none
+            self.frame = -1
+            self.paused = False
+            self._parser = InputParser()
+
+        def connection_made(self, transport):
+            self.transport = transport
+            self.board.viewers.add(self)
+            transport.write(self.board._start)
+            self.board._send(self)
+
+        def data_received(self, data):
+            for seq, mouse in self._parser.feed(data):
+                if not mouse and seq in (b"\x03", b"q"):
+                    self.close()
+                    return
+
+        def connection_lost(self, exc):
+            self.board.viewers.discard(self)
+
+        def pause_writing(self):
+            self.paused = True
+
+        def resume_writing(self):
+            self.paused = False
+            self.board._send(self)
+
+        def close(self):
+            if not self.transport.is_closing():
+                self.transport.write(self.board._end)
+                self.transport.close()
+            self.board.viewers.discard(self)
+
+    def __init__(self, width = 80, height = 24, maxfps = 20, budget = 0):
+        super(Broadcast, self).__init__()
+        self.screen = Broadcast.Screen(width, height)
+        self.app = Broadcast.App(self, self.screen, maxfps = maxfps, ctrlc = False,
+                                 budget = budget)
+        self.app.__enter__()
+        self.root = self.app.root
+        self.viewers = set()
+        self.frames = 0
+        self._task = None
+        # Encodes the cells sent to viewers, forgetting its state every time
+        # so that one encoding works for all viewers
+        # Viewers cannot interact, so their terminals report no mouse events
+        self._encoder = canvas.StreamCanvas(width, height, mouse = False)
+        self._start = self._encoder.take()
+        end = canvas.StreamCanvas(1, 1)
+        end.take()
+        end.destroy()
+        self._end = end.take()
+        # Cells changed by the latest frame and its encodings by the frame
+        # the viewers had before
+        self._changed = None
+        self._encoded = {}
+
+    def _protocol(self):
+        return Broadcast.Viewer(self)
+
+    def _started(self):
+        if self._task is None:
+            self.app._loop_thread = threading.get_ident()
+            self._task = asyncio.ensure_future(self.app._render_loop())
+
+    def _close_connections(self):
+        pending = []
+        if self._task:
+            self._task.cancel()
+            pending.append(self._task)
+            self._task = None
+        for v in list(self.viewers):
+            v.close()
+        return pending
+
+    def _broadcast(self):
+        """ Send the frame just rendered to all viewers that are keeping up """
+        self._changed = self.screen.commit()
+        self._encoded = {}
+        self.frames += 1
+        for v in list(self.viewers):
+            if not v.paused:
+                self._send(v)
+
+    def _send(self, viewer):
+        """ Send viewer all cells changed since the last frame it got """
+        latest = self.screen.frame - 1
+        if viewer.frame >= latest:
+            return
+        # Viewers that got the same frame last get the same bytes
+        data = self._encoded.get(viewer.frame, None)
+        if data is None:
+            if viewer.frame == latest - 1 and self._changed is not None:
+                cells = self._changed
+            else:
+                cells = [i for i, v in enumerate(self.screen.versions)
+                         if v > viewer.frame]
+            data = self._encoded[viewer.frame] = self._encode(cells)
+        viewer.frame = latest
+        viewer.transport.write(data)
+
+    def _encode(self, cells):
+        enc = self._encoder
+        enc.forget()
+        w = self.screen.width
+        for i in cells:
+            x = i % w
+            y = i // w
+            c, fg, bg, flags = self.screen.get(x, y)
+            enc.set(x, y, c, fg = fg, bg = bg, flags = flags)
+        return enc.take()
@@ -20,11 +20,21 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import asyncio
+import bisect
 import collections
-import random
+import collections.abc
+import heapq
+import mmap
+import os
 import string
+import threading
+import weakref
+import zlib
+from array import array
+from functools import partial
 from math import ceil, floor
-from wytch import colors, canvas, event
+from wytch import colors, canvas, event, misc
 
 HOR_LEFT = 1
 HOR_MID = 2
@@ -34,12 +44,37 @@ VER_TOP = 1
 VER_MID = 2
 VER_BOT = 3
 
+class Frame:
+
+    """
+    Time budget of the frame being rendered, set on the root view by the
+    render loop. Views deferred to stay within it (or their maxfps) are
+    collected in .deferred so that another frame can be requested.
+    """
+
+    def __init__(self, clock, budget = None):
+        self.clock = clock
+        self.deadline = clock.time() + budget if budget else None
+        self.deferred = []
+
+    def remaining(self):
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - self.clock.time()
+
+
 class View(event.EventSource):
 
+    __slots__ = ("onupdate", "zindex", "display", "parent", "_focused",
+                 "_canvas", "_focusable", "_vstretch", "_hstretch", "_dirty",
+                 "_rendered", "_rendercost", "_focus_path", "_frame", "_pacing")
+
     def __init__(self):
         super(View, self).__init__()
         self.onupdate = None
         self.zindex = 0
+        # (maxfps, priority) set on this instance, None for the class defaults
+        self._pacing = None
         self._focused = False
         self._canvas = None
         self.parent = None
@@ -48,9 +83,37 @@ class View(event.EventSource):
         self._hstretch = True
         self.display = True
         self._dirty = True
+        self._rendered = None # Time of the last render
+        self._rendercost = 0
+        # Only used while this is the root
+        self._focus_path = None
+        self._frame = None
+
+    @property
+    def maxfps(self):
+        """
+        Maximum rate at which the view gets rendered, None for every frame.
+        Subclasses can override it with a class attribute.
+        """
+        return self._pacing[0] if self._pacing else None
+
+    @maxfps.setter
+    def maxfps(self, maxfps):
+        self._pacing = (maxfps, self.priority)
+
+    @property
+    def priority(self):
+        """ Views with higher priority get rendered first when out of frame time """
+        return self._pacing[1] if self._pacing else 0
+
+    @priority.setter
+    def priority(self, priority):
+        self._pacing = (self.maxfps, priority)
 
     def bubble(self, event):
         """ Bubble an event from this to the root or until .fire() succeeds """
+        # The containers on the way up should not pass the event back down
+        event.routed = True
         if not self.fire(event) and self.parent:
             self.parent.bubble(event)
 
@@ -63,6 +126,13 @@ class View(event.EventSource):
     def onchildfocused(self, c):
         pass
 
+    def onchildunfocused(self, c):
+        pass
+
+    def onremoved(self):
+        """ Called after the view got removed from its parent """
+        pass
+
     @property
     def root(self):
         if self.parent:
@@ -70,6 +140,17 @@ class View(event.EventSource):
         else:
             return self
 
+    @property
+    def focus_path(self):
+        """ Tuple of views from the root down to the focused leaf """
+        root = self.root
+        if root._focus_path is None:
+            path = [root]
+            while path[-1].focused_child:
+                path.append(path[-1].focused_child)
+            root._focus_path = tuple(path)
+        return root._focus_path
+
     @property
     def focused_child(self):
         return None
@@ -91,6 +172,7 @@ class View(event.EventSource):
         if f and not self.focusable:
             raise NotImplementedError("This view is not focusable")
         self._focused = f
+        self.root._focus_path = None
         # Bubble up until the root
         if f:
             self.onfocus()
@@ -99,6 +181,8 @@ class View(event.EventSource):
                 self.parent.onchildfocused(self)
         else:
             self.onunfocus()
+            if self.parent:
+                self.parent.onchildunfocused(self)
 
     @property
     def canvas(self):
@@ -127,6 +211,18 @@ class View(event.EventSource):
     def render(self):
         pass
 
+    def _draw(self, frame):
+        """ Render, keeping track of when and for how long """
+        if frame is None:
+            self.render()
+            return
+        start = frame.clock.time()
+        self.render()
+        self._rendered = frame.clock.time()
+        cost = self._rendered - start
+        self._rendercost = cost if not self._rendercost else \
+                0.75 * self._rendercost + 0.25 * cost
+
     @property
     def hstretch(self):
         return self._hstretch
@@ -154,6 +250,8 @@ class View(event.EventSource):
     @focusable.setter
     def focusable(self, f):
         self._focusable = f
+        if self.parent:
+            self.parent._invalidate_focus_order()
 
     @property
     def dirty(self):
@@ -173,48 +271,70 @@ class View(event.EventSource):
 
 class ContainerView(View):
 
+    __slots__ = ("children", "_shouldclear", "_focused_child", "_focus_order",
+                 "_focus_pos")
+
+    # Set when render() clears the whole canvas, so no child can be deferred
+    clears = False
+
     def __init__(self, canvas = None):
         super(ContainerView, self).__init__()
         self.children = []
         self._shouldclear = True
+        self._focused_child = None
+        self._focus_order = None
+        self._focus_pos = None
 
     def onfocus(self):
         super(ContainerView, self).onfocus()
         # Focus first focusable child
-        if len(self.children) > 0:
-            for c in self.children:
-                if c.focusable and c.display:
-                    c.focused = True
+        for c in self._focusables():
+            if c.display:
+                c.focused = True
+                break
 
     def onunfocus(self):
         super(ContainerView, self).onunfocus()
-        for c in self.children:
-            c.focused = False
+        if self._focused_child:
+            self._focused_child.focused = False
 
     def onchildfocused(self, cf):
         super(ContainerView, self).onchildfocused(cf)
-        for c in self.children:
-            if c.focused and c != cf:
-                c.focused = False
+        prev = self._focused_child
+        self._focused_child = cf
+        if prev is not None and prev is not cf:
+            prev.focused = False
         self._focused = True
         if self.parent:
             self.parent.onchildfocused(self)
 
-    def _focused_child_index(self):
-        for i, c in enumerate(self.children):
-            if c.focused:
-                return i, c
-        return None, None
+    def onchildunfocused(self, c):
+        super(ContainerView, self).onchildunfocused(c)
+        if self._focused_child is c:
+            self._focused_child = None
+
+    def _focusables(self):
+        """ Return the focusable children in the order of focus traversal """
+        if self._focus_order is None:
+            self._focus_order = [c for c in self.children if c.focusable]
+            self._focus_pos = {c: i for i, c in enumerate(self._focus_order)}
+        return self._focus_order
+
+    def _invalidate_focus_order(self):
+        v = self
+        while v is not None and v._focus_order is not None:
+            v._focus_order = None
+            v._focus_pos = None
+            v = v.parent
 
     @property
     def focused_child(self):
-        _, c = self._focused_child_index()
-        return c
+        return self._focused_child
 
     @event.handler("key", canreject = True, keys = ["<up>", "<down>", "\t"])
     def _onkey(self, kc):
-        # See if child can handle the event
-        if self.focused_child and self.focused_child.fire(kc):
+        # See if child can handle the event, unless it is bubbling up from it
+        if not kc.routed and self._focused_child and self._focused_child.fire(kc):
             return True
         # Can we handle it?
         if kc.val == "<up>" or kc.val == "\t" and kc.shift:
@@ -223,9 +343,34 @@ class ContainerView(View):
             return self.focus_next()
         return False
 
+    def _mouse_path(self, target):
+        """
+        Return the list of views from a child of this view down to target or
+        None when target is not reachable only through the top zindex.
+        """
+        path = []
+        while target is not self:
+            p = target.parent
+            if p is None or target.zindex != p.children[-1].zindex:
+                return None
+            path.append(target)
+            target = p
+        path.reverse()
+        return path
+
     @event.handler("mouse")
     def _onmouse(self, me):
-        if not self.children:
+        if not self.children or me.routed:
+            return
+        # Look up the view drawn at the cell by the last render and deliver the
+        # event to everything on the way to it
+        target = self.canvas.owner_at(me.x, me.y)
+        path = self._mouse_path(target) if target is not None else None
+        if path is not None:
+            for c in path:
+                c.fire(me.shifted(c.canvas.originx - self.canvas.originx,
+                                  c.canvas.originy - self.canvas.originy,
+                                  routed = True))
             return
         z = self.children[-1].zindex
         # Pass the event only to children on the top zindex
@@ -238,17 +383,20 @@ class ContainerView(View):
                 c.fire(sme)
 
     def focus_next(self, step = 1):
-        if len(self.children) == 0:
+        order = self._focusables()
+        if not order:
             return
-        i, c = self._focused_child_index()
-        if not i:
-            i = 0
+        c = self._focused_child
+        if c in self._focus_pos:
+            i = self._focus_pos[c]
+        else:
+            c = None
+            i = -1 if step > 0 else len(order)
 
         i += step
-        while i in range(0, len(self.children)):
-            if self.children[i].focusable and self.children[i].display and \
-                    (not c or self.children[i].zindex == c.zindex):
-                self.children[i].focused = True
+        while 0 <= i < len(order):
+            if order[i].display and (not c or order[i].zindex == c.zindex):
+                order[i].focused = True
                 return True
             i += step
         return False
@@ -258,17 +406,26 @@ class ContainerView(View):
 
     def add_child(self, c):
         c.parent = self
+        c._focus_path = None
         self.children.append(c)
+        self._invalidate_focus_order()
         self.dirty = True
 
     def remove_child(self, c):
         f = c.focused
-        c.parent = None
         c.focused = False
+        c.parent = None
         self.children.remove(c)
+        self._invalidate_focus_order()
         if f:
             self.onfocus()
         self.dirty = True
+        c.onremoved()
+
+    def onremoved(self):
+        super(ContainerView, self).onremoved()
+        for c in self.children:
+            c.onremoved()
 
     def precalc(self):
         if self.dirty:
@@ -279,22 +436,59 @@ class ContainerView(View):
         """Called on canvas change an addition/removal of a child"""
         if self.dirty:
             self.children.sort(key = lambda x: x.zindex)
+            self._invalidate_focus_order()
             for c in self.children:
                 c.canvas = self.canvas
             self._shouldclear = True
             self.dirty = False
 
     def render(self):
+        force = self._shouldclear or self.clears
         if self._shouldclear:
             self._shouldclear = False
             self.canvas.clear(blank = True)
+        frame = self.root._frame
+        shown = self._plan(frame, force) if frame else None
         for c in self.children:
-            if c.display:
-                c.render()
+            if c.display and (shown is None or c in shown):
+                c.canvas.claim(c)
+                c._draw(frame)
+
+    def _plan(self, frame, force):
+        """
+        Return the set of children to render this frame. Children over
+        their maxfps get deferred, as do the ones with the lowest priority
+        when their estimated render time would not fit the frame budget.
+        Focused and focusable children are never deferred for the budget.
+        """
+        now = frame.clock.time()
+        due = []
+        for c in self.children:
+            if not c.display:
+                continue
+            if force or c._rendered is None or \
+                    getattr(c, "_shouldclear", False):
+                due.append((True, c))
+            elif c.maxfps and now - c._rendered < 1 / c.maxfps:
+                frame.deferred.append(c)
+            else:
+                due.append((bool(c.focused or c.focusable), c))
+        if frame.deadline is None:
+            return set(c for _, c in due)
+        due.sort(key = lambda e: (not e[0], -e[1].priority))
+        left = frame.remaining()
+        shown = set()
+        for essential, c in due:
+            if essential or c._rendercost <= left:
+                shown.add(c)
+                left -= c._rendercost
+            else:
+                frame.deferred.append(c)
+        return shown
 
     @property
     def focusable(self):
-        return any([c.focusable for c in self.children])
+        return bool(self._focusables())
 
     @property
     def size(self):
@@ -324,6 +518,8 @@ class ContainerView(View):
 
 class Align(ContainerView):
 
+    __slots__ = ("halign", "valign")
+
     def __init__(self, halign = HOR_MID, valign = VER_MID):
         super(Align, self).__init__()
         self.halign = halign
@@ -368,6 +564,10 @@ class Align(ContainerView):
 
 class Box(ContainerView):
 
+    __slots__ = ("title", "bg")
+
+    clears = True
+
     def __init__(self, title = None, bg = colors.BLACK):
         super(Box, self).__init__()
         self.title = title
@@ -406,6 +606,8 @@ class Box(ContainerView):
 
 class Vertical(ContainerView):
 
+    __slots__ = ("_width", "_height")
+
     def __init__(self, width = 0):
         super(Vertical, self).__init__()
         self._width = width
@@ -440,6 +642,8 @@ class Vertical(ContainerView):
 
 class Horizontal(ContainerView):
 
+    __slots__ = ("_height",)
+
     def __init__(self, height = 0):
         super(Horizontal, self).__init__()
         self._height = height
@@ -473,8 +677,12 @@ class Horizontal(ContainerView):
 
 class Grid(ContainerView):
 
+    __slots__ = ("width", "height", "grid", "_size", "_cws", "_rhs")
+
     class Cell:
 
+        __slots__ = ("child", "colspan", "rowspan")
+
         def __init__(self, child, colspan, rowspan):
             self.child = child
             self.colspan = colspan
@@ -488,7 +696,7 @@ class Grid(ContainerView):
         self._size = (0, 0)
 
     def onfocus(self):
-        if any([c.focused for c in self.children]):
+        if self._focused_child:
             return # The focus came from child
         # Focus first focusable child starting from top left and walking by columns first
         for y in range(self.height):
@@ -589,6 +797,8 @@ class Grid(ContainerView):
 
 class HLine(View):
 
+    __slots__ = ("title",)
+
     def __init__(self, title = None):
         super(HLine, self).__init__()
         self.title = title
@@ -613,6 +823,8 @@ class HLine(View):
 
 class Spacer(View):
 
+    __slots__ = ("width", "height")
+
     def __init__(self, width = 1, height = 1, hstretch = False, vstretch = False):
         super(Spacer, self).__init__()
         self.focusable = False
@@ -628,6 +840,8 @@ class Spacer(View):
 
 class Widget(View):
 
+    __slots__ = ()
+
     @event.handler("mouse", pressed = True, button = event.MouseEvent.LEFT)
     def _onmouse(self, me):
         if self.focusable:
@@ -647,6 +861,8 @@ class Widget(View):
 
 class ValueWidget(Widget):
 
+    __slots__ = ("_value",)
+
     def __init__(self, value = None, onvalue = None):
         super(ValueWidget, self).__init__()
         self._value = value
@@ -669,6 +885,8 @@ class ValueWidget(Widget):
 
 class Label(Widget):
 
+    __slots__ = ("fg", "bg", "text")
+
     def __init__(self, text = "Label", fg = colors.WHITE, bg = colors.BLACK):
         super(Label, self).__init__()
         self.fg = fg
@@ -694,6 +912,8 @@ class Label(Widget):
 
 class Button(Widget):
 
+    __slots__ = ("label",)
+
     def __init__(self, label = "Button", onpress = None):
         super(Widget, self).__init__()
         self.label = label
@@ -729,6 +949,8 @@ class Button(Widget):
 
 class TextInput(ValueWidget):
 
+    __slots__ = ("length", "password", "_cursor", "_offset")
+
     def __init__(self, default = "", length = 12, onvalue = None,
             password = False):
         super(TextInput, self).__init__(value = default, onvalue = onvalue)
@@ -834,8 +1056,183 @@ class TextInput(ValueWidget):
                         self.value)
 
 
+class TextArea(ValueWidget):
+
+    """
+    Multi-line text editor. Lines are kept as strings in a GapBuffer:
+    inserting or deleting lines costs O(1) plus moving the gap from the
+    previous edit, an edit within a line rebuilds the line, so it costs
+    O(length of that line) rather than of the whole text. Only the visible
+    part gets rendered. Every edit fires a ValueEvent, whose .new joins the
+    value only when accessed (and .old is always None).
+    """
+
+    __slots__ = ("width", "height", "lines", "row", "col", "top", "left")
+
+    class ValueEvent(event.ValueEvent):
+
+        __slots__ = ()
+
+        def __init__(self, source):
+            event.Event.__init__(self, "value", source = source)
+            self.old = None
+
+        @property
+        def new(self):
+            return self.source.value
+
+    def __init__(self, value = "", width = 40, height = 8, onvalue = None):
+        super(TextArea, self).__init__(onvalue = onvalue)
+        self.width = width
+        self.height = height
+        self._reset(value)
+
+    @property
+    def value(self):
+        if self._value is None:
+            self._value = "\n".join(self.lines)
+        return self._value
+
+    @value.setter
+    def value(self, v):
+        self._reset(v)
+        self._changed()
+
+    def _reset(self, v):
+        self.lines = misc.GapBuffer(v.split("\n"))
+        self.row = 0
+        self.col = 0
+        self.top = 0
+        self.left = 0
+        self._value = None
+
+    def _changed(self):
+        self._value = None
+        self.fire(TextArea.ValueEvent(self))
+        self.update()
+
+    def _move(self, row, col):
+        self.row = max(0, min(row, len(self.lines) - 1))
+        self.col = max(0, min(col, len(self.lines[self.row])))
+        self.update()
+
+    def insert(self, text):
+        """ Insert text at the cursor """
+        parts = text.split("\n")
+        line = self.lines[self.row]
+        head, tail = line[:self.col], line[self.col:]
+        self.lines[self.row] = head + parts[0]
+        for i, p in enumerate(parts[1:], start = 1):
+            self.lines.insert(self.row + i, p)
+        self.row += len(parts) - 1
+        self.col = len(self.lines[self.row])
+        self.lines[self.row] += tail
+        self._changed()
+
+    @event.handler("key", matcher = lambda ke: len(ke.val) == 1 and ke.val.isprintable())
+    def _onkey(self, kc):
+        self.insert(kc.val)
+
+    @event.handler("key", key = "\r")
+    def _onenter(self, kc):
+        self.insert("\n")
+
+    @event.handler("key", key = "\x7f")
+    def _onbackspace(self, kc):
+        if self.col > 0:
+            line = self.lines[self.row]
+            self.lines[self.row] = line[:self.col - 1] + line[self.col:]
+            self.col -= 1
+        elif self.row > 0:
+            self.col = len(self.lines[self.row - 1])
+            self.lines[self.row - 1] += self.lines[self.row]
+            del self.lines[self.row]
+            self.row -= 1
+        else:
+            return
+        self._changed()
+
+    @event.handler("key", key = "<delete>")
+    def _ondelete(self, kc):
+        line = self.lines[self.row]
+        if self.col < len(line):
+            self.lines[self.row] = line[:self.col] + line[self.col + 1:]
+        elif self.row < len(self.lines) - 1:
+            self.lines[self.row] = line + self.lines[self.row + 1]
+            del self.lines[self.row + 1]
+        else:
+            return
+        self._changed()
+
+    @event.handler("key", key = "<up>", canreject = True)
+    def _onup(self, kc):
+        if self.row == 0:
+            return False
+        self._move(self.row - 1, self.col)
+        return True
+
+    @event.handler("key", key = "<down>", canreject = True)
+    def _ondown(self, kc):
+        if self.row >= len(self.lines) - 1:
+            return False
+        self._move(self.row + 1, self.col)
+        return True
+
+    @event.handler("key", key = "<left>")
+    def _onleft(self, kc):
+        if self.col == 0 and self.row > 0:
+            self._move(self.row - 1, len(self.lines[self.row - 1]))
+        else:
+            self._move(self.row, self.col - 1)
+
+    @event.handler("key", key = "<right>")
+    def _onright(self, kc):
+        if self.col == len(self.lines[self.row]) and self.row < len(self.lines) - 1:
+            self._move(self.row + 1, 0)
+        else:
+            self._move(self.row, self.col + 1)
+
+    @event.handler("key", key = "<home>")
+    def _onhome(self, kc):
+        self._move(self.row, 0)
+
+    @event.handler("key", key = "<end>")
+    def _onend(self, kc):
+        self._move(self.row, len(self.lines[self.row]))
+
+    @event.handler("key", key = "<pageup>")
+    def _onpageup(self, kc):
+        self._move(self.row - self.canvas.height, self.col)
+
+    @event.handler("key", key = "<pagedown>")
+    def _onpagedown(self, kc):
+        self._move(self.row + self.canvas.height, self.col)
+
+    def render(self):
+        w = self.canvas.width
+        h = self.canvas.height
+        # Scroll the cursor into view
+        self.top = min(max(self.top, self.row - h + 1), self.row)
+        self.left = min(max(self.left, self.col - w + 1), self.col)
+        for y in range(h):
+            r = self.top + y
+            line = self.lines[r][self.left:self.left + w] if r < len(self.lines) else ""
+            self.canvas.text(0, y, line + " " * (w - len(line)))
+        if self.focused:
+            line = self.lines[self.row]
+            c = line[self.col] if self.col < len(line) else " "
+            self.canvas.set(self.col - self.left, self.row - self.top, c,
+                            flags = canvas.NEGATIVE)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
 class Decade(ValueWidget):
 
+    __slots__ = ("digits", "decimals", "max", "min", "_cannegative", "_cursor")
+
     def __init__(self, digits, decimals = 0, value = 0, cursor = 0, max = None,
             min = None, onvalue = None):
         super(Decade, self).__init__(onvalue = onvalue)
@@ -912,43 +1309,530 @@ class Decade(ValueWidget):
 
 class Console(Widget):
 
-    def __init__(self, minheight = 8, history = 200):
+    __slots__ = ("minheight", "history", "lines", "_rows", "_width")
+
+    class History:
+
+        """
+        Lines of a Console, newest last. Full blocks of lines get compressed
+        and the oldest blocks are dropped to stay within maxlines and
+        maxbytes (of compressed blocks), either of which can be None.
+        """
+
+        BLOCK = 512
+
+        def __init__(self, maxlines = 200, maxbytes = None):
+            self.maxlines = maxlines
+            self.maxbytes = maxbytes
+            self.blocksize = min(self.BLOCK, maxlines or self.BLOCK)
+            self._blocks = collections.deque() # (line count, compressed lines)
+            self._tail = []
+            self._inblocks = 0
+            self._bytes = 0
+            self._cached = (None, None)
+
+        def append(self, line):
+            self._tail.append(line)
+            if len(self._tail) < self.blocksize:
+                return
+            data = zlib.compress("\n".join(self._tail).encode("utf-8"))
+            self._blocks.append((len(self._tail), data))
+            self._inblocks += len(self._tail)
+            self._bytes += len(data)
+            self._tail = []
+            while self._blocks:
+                count, data = self._blocks[0]
+                rest = self._inblocks + len(self._tail) - count
+                if (self.maxlines is None or rest < self.maxlines) and \
+                        (self.maxbytes is None or self._bytes <= self.maxbytes):
+                    break
+                self._blocks.popleft()
+                self._inblocks -= count
+                self._bytes -= len(data)
+
+        def _lines(self, data):
+            if self._cached[0] is not data:
+                self._cached = (data, zlib.decompress(data).decode("utf-8").split("\n"))
+            return self._cached[1]
+
+        def newest(self):
+            """ Iterate over the lines from the newest one """
+            n = len(self)
+            for line in reversed(self._tail):
+                if n == 0:
+                    return
+                n -= 1
+                yield line
+            for _, data in reversed(self._blocks):
+                for line in reversed(self._lines(data)):
+                    if n == 0:
+                        return
+                    n -= 1
+                    yield line
+
+        def __len__(self):
+            n = self._inblocks + len(self._tail)
+            return n if self.maxlines is None else min(n, self.maxlines)
+
+    def __init__(self, minheight = 8, history = 200, maxbytes = None):
         super(Console, self).__init__()
         # TODO: Should this have input support?
         self.minheight = minheight
         self.history = history
-        self._lines = collections.deque(maxlen = self.history)
-        self._splitlines = collections.deque(maxlen = self.minheight)
+        self.lines = Console.History(maxlines = history, maxbytes = maxbytes)
+        # Bottom rows of the lines wrapped to _width
+        self._rows = collections.deque(maxlen = 0)
+        self._width = None
         self.focusable = False
 
     def push(self, line):
-        self._lines.appendleft(line)
-        self._update_splitlines()
+        for l in line.split("\n"):
+            self.lines.append(l)
+            if self._width:
+                self._rows.extend(self._wrap(l, self._width))
         self.update()
 
-    def recalc(self):
-        self._update_splitlines()
-
-    def _update_splitlines(self):
-        self._splitlines = []
-        for line in self._lines:
-            rem = len(line) % self.canvas.width
-            self._splitlines.append(line[-rem:])
-            for x in range(len(line) - rem, 0, -self.canvas.width):
-                self._splitlines.append(line[x - self.canvas.width:x])
+    @staticmethod
+    def _wrap(line, width):
+        return [line[x:x + width] for x in range(0, len(line), width)] or [""]
 
+    def _rewrap(self, width, height):
+        """ Wrap only as many of the newest lines as fit the canvas """
+        self._width = width
+        self._rows = collections.deque(maxlen = height)
+        wrapped = []
+        count = 0
+        for line in self.lines.newest():
+            if count >= height:
+                break
+            wrapped.append(self._wrap(line, width))
+            count += len(wrapped[-1])
+        for rows in reversed(wrapped):
+            self._rows.extend(rows)
 
     def render(self):
-        for y, l in zip(range(self.canvas.height - 1, -1, -1), self._splitlines):
-            self.canvas.text(0, y, l + " " * (self.canvas.width - len(l)))
+        w = self.canvas.width
+        h = self.canvas.height
+        if self._width != w or self._rows.maxlen != h:
+            self._rewrap(w, h)
+        offs = h - len(self._rows)
+        for y in range(offs):
+            self.canvas.text(0, y, " " * w)
+        for y, l in enumerate(self._rows, start = offs):
+            self.canvas.text(0, y, l + " " * (w - len(l)))
 
     @property
     def size(self):
         return (1, self.minheight)
 
 
+class Pager(Widget):
+
+    """
+    Read-only view of a (possibly huge) file. The file gets memory mapped and
+    only the visible lines are read. Line numbers are resolved through an
+    index of newline counts per CHUNK bytes, built by a background thread.
+    With follow = True, the file is watched for growth and the view sticks to
+    its end once scrolled there. The file is closed when the view gets
+    removed from its parent or collected.
+    """
+
+    __slots__ = ("path", "width", "height", "follow", "poll", "top", "_f",
+                 "_mm", "_lock", "_counts", "_partial", "_indexed", "_pending",
+                 "_attail", "_stop", "_indexer", "_finalizer")
+
+    CHUNK = 1 << 16
+
+    def __init__(self, path, width = 40, height = 10, follow = False, poll = 0.5):
+        super(Pager, self).__init__()
+        self.path = path
+        self.width = width
+        self.height = height
+        self.follow = follow
+        self.poll = poll
+        self.top = 0
+        self._f = open(path, "rb")
+        self._mm = None
+        # Guards the map, which gets replaced (and closed) when the file grows
+        self._lock = threading.RLock()
+        self._counts = array("Q") # Newlines up to the end of each full chunk
+        self._partial = 0 # Newlines in the incomplete last chunk
+        self._indexed = 0
+        self._pending = None
+        self._attail = follow
+        self._stop = threading.Event()
+        self._remap()
+        # The thread only holds the view weakly, so it can still get collected
+        self._indexer = threading.Thread(target = Pager._run,
+                                         args = (weakref.ref(self), self._stop),
+                                         daemon = True)
+        self._finalizer = weakref.finalize(self, Pager._release, self._stop, self._f)
+        self._indexer.start()
+
+    @staticmethod
+    def _release(stop, f):
+        stop.set()
+        f.close()
+
+    def close(self):
+        """ Stop watching the file and release it """
+        self._stop.set()
+        if self._indexer is not threading.current_thread():
+            self._indexer.join()
+        with self._lock:
+            if self._mm:
+                self._mm.close()
+                self._mm = None
+        self._finalizer()
+
+    def onremoved(self):
+        super(Pager, self).onremoved()
+        self.close()
+
+    def _remap(self):
+        """ Map the file again if its size changed, return True if it did """
+        size = os.fstat(self._f.fileno()).st_size
+        with self._lock:
+            old = self._mm
+            if size == (len(old) if old else 0):
+                return False
+            if size < self._indexed:
+                # Truncated, start over
+                self._counts = array("Q")
+                self._partial = 0
+                self._indexed = 0
+                self.top = 0
+            self._mm = mmap.mmap(self._f.fileno(), 0, access = mmap.ACCESS_READ) \
+                    if size else None
+            if old:
+                old.close()
+        return True
+
+    @staticmethod
+    def _run(ref, stop):
+        while not stop.is_set():
+            p = ref()
+            if p is None:
+                return
+            p._index()
+            if not p.follow:
+                return
+            poll = p.poll
+            del p
+            while not stop.wait(poll):
+                p = ref()
+                if p is None:
+                    return
+                grown = p._remap()
+                del p
+                if grown:
+                    break
+
+    def _index(self):
+        """ Index what is mapped and not indexed yet """
+        while not self._stop.is_set():
+            with self._lock:
+                size = len(self._mm) if self._mm else 0
+                if self._indexed >= size:
+                    break
+                start = len(self._counts) * self.CHUNK
+                end = min(start + self.CHUNK, size)
+                n = self._mm[start:end].count(b"\n")
+                if end - start == self.CHUNK:
+                    self._counts.append(n + (self._counts[-1] if self._counts else 0))
+                    self._partial = 0
+                else:
+                    self._partial = n
+                self._indexed = end
+        pending = self._pending is not None
+        if pending:
+            with self._lock:
+                self._jump(self._pending)
+        if pending or self.follow:
+            self.update()
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    @property
+    def indexed(self):
+        """ True once the whole file has been indexed """
+        with self._lock:
+            return self._indexed == (len(self._mm) if self._mm else 0)
+
+    def line_of(self, offset):
+        """ Return the line number at the offset or None if not indexed yet """
+        with self._lock:
+            if offset > self._indexed:
+                return None
+            if offset <= 0:
+                return 0
+            k = offset // self.CHUNK
+            base = self._counts[k - 1] if k else 0
+            return base + self._mm[k * self.CHUNK:offset].count(b"\n")
+
+    def offset_of(self, line):
+        """ Return the offset of the line or None if not indexed (or past the end) """
+        if line <= 0:
+            return 0
+        with self._lock:
+            mm = self._mm
+            k = bisect.bisect_left(self._counts, line)
+            base = self._counts[k - 1] if k else 0
+            if k == len(self._counts) and base + self._partial < line:
+                return None
+            off = k * self.CHUNK
+            for _ in range(line - base):
+                off = mm.find(b"\n", off) + 1
+            return off if off < len(mm) else None
+
+    def _linestart(self, offset):
+        if offset <= 0:
+            return 0
+        return self._mm.rfind(b"\n", 0, offset) + 1
+
+    def _lastpage(self):
+        """ Return the offset of the top line showing the end of the file """
+        mm = self._mm
+        if not mm:
+            return 0
+        off = len(mm)
+        if mm[off - 1:off] == b"\n":
+            off -= 1
+        for _ in range(self._viewheight()):
+            if off <= 0:
+                return 0
+            off = self._linestart(off) - 1
+        return off + 1
+
+    def _viewheight(self):
+        return self.canvas.height if self.canvas else self.height
+
+    def _jump(self, line):
+        off = self.offset_of(line)
+        if off is None:
+            # Keep waiting unless the file is all indexed and will not grow
+            self._pending = line if self.follow or not self.indexed else None
+            return False
+        self._pending = None
+        self._attail = False
+        self.top = off
+        return True
+
+    def goto_line(self, line):
+        """
+        Scroll to the line, later if that part of the file is not indexed yet
+        (or, when following, not written yet)
+        """
+        if not self._jump(line):
+            return False
+        self.update()
+        return True
+
+    def goto_percent(self, percent):
+        with self._lock:
+            mm = self._mm
+            if not mm:
+                return
+            off = int(len(mm) * min(max(percent, 0), 100) / 100)
+            self.top = min(self._linestart(min(off, len(mm) - 1)), self._lastpage())
+            self._attail = False
+        self.update()
+
+    def scroll(self, lines):
+        """ Scroll by lines, return False when already at the start or end """
+        with self._lock:
+            mm = self._mm
+            if not mm:
+                return False
+            off = self.top
+            last = self._lastpage() if lines > 0 else 0
+            for _ in range(abs(lines)):
+                if lines > 0:
+                    if off >= last:
+                        break
+                    nxt = mm.find(b"\n", off) + 1
+                else:
+                    if off <= 0:
+                        break
+                    nxt = self._linestart(off - 1)
+                off = nxt
+            if off == self.top:
+                return False
+            self.top = off
+            self._attail = False
+        self.update()
+        return True
+
+    @event.handler("key", key = "<up>", canreject = True)
+    def _onup(self, kc):
+        return self.scroll(-1)
+
+    @event.handler("key", key = "<down>", canreject = True)
+    def _ondown(self, kc):
+        return self.scroll(1)
+
+    @event.handler("key", key = "<pageup>")
+    def _onpageup(self, kc):
+        self.scroll(-max(self._viewheight() - 1, 1))
+
+    @event.handler("key", key = "<pagedown>")
+    def _onpagedown(self, kc):
+        self.scroll(max(self._viewheight() - 1, 1))
+
+    @event.handler("key", key = "<home>")
+    def _onhome(self, kc):
+        self.top = 0
+        self._attail = False
+        self.update()
+
+    @event.handler("key", key = "<end>")
+    def _onend(self, kc):
+        with self._lock:
+            self.top = self._lastpage()
+        self._attail = True
+        self.update()
+
+    def render(self):
+        with self._lock:
+            if self._pending is not None:
+                self._jump(self._pending)
+            if self._attail:
+                self.top = self._lastpage()
+            mm = self._mm
+            size = len(mm) if mm else 0
+            w = self.canvas.width
+            off = self.top
+            for y in range(self.canvas.height):
+                if off < size:
+                    end = mm.find(b"\n", off)
+                    if end < 0:
+                        end = size
+                    # Long lines get cut, so do not read much more than fits
+                    text = mm[off:min(end, off + 4 * w)].decode("utf-8", "replace")
+                    text = text.rstrip("\r").replace("\t", "    ")
+                    text = "".join(c if c.isprintable() else "?" for c in text[:w])
+                    off = end + 1
+                else:
+                    text = ""
+                self.canvas.text(0, y, text + " " * (w - len(text)))
+
+
+class Chart(Widget):
+
+    """
+    Line chart of the last samples appended, drawn with braille dots. Samples
+    are kept in a misc.RingBuffer and each frame downsampled to the dot
+    columns by min/max bucketing, so a render costs the same no matter how
+    many samples arrive between frames.
+    """
+
+    __slots__ = ("samples", "width", "height", "low", "high", "fg")
+
+    # Braille dot bits of [column][row] in a 2x4 cell
+    DOTS = ((0x01, 0x02, 0x04, 0x40), (0x08, 0x10, 0x20, 0x80))
+
+    def __init__(self, capacity = 4096, width = 32, height = 8, low = None,
+                 high = None, fg = colors.WHITE):
+        super(Chart, self).__init__()
+        self.samples = misc.RingBuffer(capacity)
+        self.width = width
+        self.height = height
+        self.low = low
+        self.high = high
+        self.fg = fg
+        self.focusable = False
+
+    def append(self, v):
+        self.samples.append(v)
+        self.update()
+
+    def extend(self, vs):
+        self.samples.extend(vs)
+        self.update()
+
+    def clear(self):
+        self.samples.clear()
+        self.update()
+
+    def _range(self, mins, maxs):
+        low = min(mins) if self.low is None else self.low
+        high = max(maxs) if self.high is None else self.high
+        return low, (high - low) or 1
+
+    def render(self):
+        w = self.canvas.width
+        h = self.canvas.height
+        cols = 2 * w
+        rows = 4 * h
+        mins, maxs = self.samples.minmax(cols)
+        cells = [0] * (w * h)
+        if mins:
+            low, span = self._range(mins, maxs)
+            scale = (rows - 1) / span
+            prev = None
+            # Align the newest samples to the right edge
+            for x, mn, mx in zip(range(cols - len(mins), cols), mins, maxs):
+                top = max(0, min(rows - 1, rows - 1 - round((mx - low) * scale)))
+                bottom = max(0, min(rows - 1, rows - 1 - round((mn - low) * scale)))
+                if prev:
+                    # Connect to the previous column
+                    top = min(top, prev[1])
+                    bottom = max(bottom, prev[0])
+                prev = (top, bottom)
+                dots = self.DOTS[x & 1]
+                for y in range(top, bottom + 1):
+                    cells[(y >> 2) * w + (x >> 1)] |= dots[y & 3]
+        for y in range(h):
+            self.canvas.text(0, y, "".join(chr(0x2800 + c)
+                                           for c in cells[y * w:(y + 1) * w]),
+                             fg = self.fg)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
+class Sparkline(Chart):
+
+    """ Bar chart of the bucket maximums drawn with block characters """
+
+    __slots__ = ()
+
+    BLOCKS = " ▁▂▃▄▅▆▇█"
+
+    def __init__(self, capacity = 1024, width = 16, height = 1, low = None,
+                 high = None, fg = colors.WHITE):
+        super(Sparkline, self).__init__(capacity = capacity, width = width,
+                                        height = height, low = low,
+                                        high = high, fg = fg)
+
+    def render(self):
+        w = self.canvas.width
+        h = self.canvas.height
+        mins, maxs = self.samples.minmax(w)
+        levels = [0] * (w - len(maxs))
+        if maxs:
+            low, span = self._range(mins, maxs)
+            if self.low is None:
+                # The minimum should still show as a bar
+                low -= span / (8 * h)
+                span += span / (8 * h)
+            scale = 8 * h / span
+            levels += [max(0, min(8 * h, round((mx - low) * scale)))
+                       for mx in maxs]
+        for y in range(h):
+            base = 8 * (h - 1 - y)
+            self.canvas.text(0, y, "".join(self.BLOCKS[max(0, min(8, l - base))]
+                                           for l in levels),
+                             fg = self.fg)
+
+
 class Checkbox(ValueWidget):
 
+    __slots__ = ("label",)
+
     def __init__(self, label = None, checked = False, onvalue = None):
         super(Checkbox, self).__init__(value = checked, onvalue = onvalue)
         self.label = label
@@ -974,13 +1858,35 @@ class Checkbox(ValueWidget):
 
 class Radio(ValueWidget):
 
-    class Group(event.EventSource, list):
+    __slots__ = ("label", "_group")
+
+    class Group(event.EventSource, collections.abc.MutableSequence):
+
+        """ List of the Radios of which only one can be checked at a time """
+
+        __slots__ = ("_members",)
 
         def __init__(self, onvalue = None):
             super(Radio.Group, self).__init__()
+            self._members = []
             if onvalue:
                 self.bind("value", onvalue)
 
+        def __getitem__(self, i):
+            return self._members[i]
+
+        def __setitem__(self, i, radio):
+            self._members[i] = radio
+
+        def __delitem__(self, i):
+            del self._members[i]
+
+        def __len__(self):
+            return len(self._members)
+
+        def insert(self, i, radio):
+            self._members.insert(i, radio)
+
         @property
         def selected(self):
             for m in self:
@@ -1042,3 +1948,902 @@ class Radio(ValueWidget):
     @property
     def size(self):
         return (len(self._tick()) + (len(self.label) + 1) if self.label else 0, 1)
+
+
+class ListSource:
+
+    """
+    Rows shown by a ListView. Only the rows in the visible window get
+    requested, so this can be backed by a database cursor or a generator
+    of rows as well.
+    """
+
+    def __len__(self):
+        return 0
+
+    def row(self, i):
+        """ Return the item of the i-th row """
+        raise NotImplementedError()
+
+    def height(self, i):
+        """ Return the number of lines the i-th row takes """
+        return 1
+
+
+class SequenceSource(ListSource):
+
+    def __init__(self, seq):
+        self.seq = seq
+
+    def __len__(self):
+        return len(self.seq)
+
+    def row(self, i):
+        return self.seq[i]
+
+
+class ListView(ValueWidget):
+
+    """
+    Scrollable list showing the rows of a ListSource with the value being the
+    index of the selected row. Only one renderer per visible row is created
+    and they get reused when scrolling. Call .refresh() after changing the
+    rows of the source in place.
+    """
+
+    __slots__ = ("renderer", "width", "height", "top", "_pool", "_source")
+
+    class Row(View):
+
+        """ Default row renderer, override .show() and .render() to customize """
+
+        __slots__ = ("item", "selected")
+
+        def __init__(self):
+            super(ListView.Row, self).__init__()
+            self.item = None
+            self.selected = False
+
+        def show(self, item, index, selected):
+            self.item = item
+            self.selected = selected
+
+        def render(self):
+            if self.selected:
+                flags = canvas.NEGATIVE if self.parent.focused else canvas.BOLD
+            else:
+                flags = 0
+            s = str(self.item)[:self.canvas.width]
+            self.canvas.text(0, 0, s + " " * (self.canvas.width - len(s)),
+                             flags = flags)
+            for y in range(1, self.canvas.height):
+                self.canvas.text(0, y, " " * self.canvas.width, flags = flags)
+
+    def __init__(self, source = (), renderer = None, width = 16, height = 8,
+                 onvalue = None, onpress = None):
+        super(ListView, self).__init__(value = 0, onvalue = onvalue)
+        self.renderer = renderer or ListView.Row
+        self.width = width
+        self.height = height
+        self.top = 0
+        self._pool = []
+        self.source = source
+        if onpress:
+            self.bind("press", onpress)
+
+    @property
+    def source(self):
+        return self._source
+
+    @source.setter
+    def source(self, s):
+        self._source = s if isinstance(s, ListSource) else SequenceSource(s)
+        self.refresh()
+
+    def refresh(self):
+        """ Keep the selection within the rows of the source after they changed """
+        self._clamp()
+        self.update()
+
+    def _clamp(self):
+        n = len(self.source)
+        if self.top >= n:
+            # Scrolled past the end, .select() scrolls back to the last page
+            self.top = 0
+        if n and self.value >= n:
+            self.select(n - 1)
+
+    def recalc(self):
+        super(ListView, self).recalc()
+        self._clamp()
+
+    def _viewheight(self):
+        return self.canvas.height if self.canvas else self.height
+
+    def _window(self):
+        """ Return (index, y, height) of the rows from .top that fit the view """
+        rows = []
+        h = self._viewheight()
+        n = len(self.source)
+        i = self.top
+        y = 0
+        while i < n and y < h:
+            rh = self.source.height(i)
+            rows.append((i, y, rh))
+            y += rh
+            i += 1
+        return rows
+
+    def select(self, i):
+        """ Select the i-th row and scroll it into view """
+        i = max(0, min(i, len(self.source) - 1))
+        if i < self.top:
+            self.top = i
+        else:
+            # Find the highest top which still shows the whole row
+            h = self._viewheight() - self.source.height(i)
+            top = i
+            while top > self.top and h - self.source.height(top - 1) >= 0:
+                top -= 1
+                h -= self.source.height(top)
+            self.top = top
+        self.value = i
+        self.update()
+
+    def _page(self):
+        return max(len(self._window()) - 1, 1)
+
+    @event.handler("key", key = "<up>", canreject = True)
+    def _onup(self, kc):
+        if self.value <= 0:
+            return False
+        self.select(self.value - 1)
+        return True
+
+    @event.handler("key", key = "<down>", canreject = True)
+    def _ondown(self, kc):
+        if self.value >= len(self.source) - 1:
+            return False
+        self.select(self.value + 1)
+        return True
+
+    @event.handler("key", key = "<pageup>")
+    def _onpageup(self, kc):
+        self.select(self.value - self._page())
+
+    @event.handler("key", key = "<pagedown>")
+    def _onpagedown(self, kc):
+        self.select(self.value + self._page())
+
+    @event.handler("key", key = "<home>")
+    def _onhome(self, kc):
+        self.select(0)
+
+    @event.handler("key", key = "<end>")
+    def _onend(self, kc):
+        self.select(len(self.source) - 1)
+
+    @event.handler("mouse", pressed = True, button = event.MouseEvent.LEFT)
+    def _onmouse(self, me):
+        # Clicking the selected row presses it, other rows only get selected
+        for i, y, h in self._window():
+            if y <= me.y < y + h:
+                if i == self.value and self.focused:
+                    self.fire(event.ClickEvent())
+                self.select(i)
+                break
+        if not self.focused:
+            self.focused = True
+
+    @event.handler("click")
+    @event.handler("key", key = "\r")
+    def _onpress(self, _):
+        if len(self.source):
+            self.fire(event.PressEvent(self))
+
+    def render(self):
+        rows = self._window()
+        while len(self._pool) < len(rows):
+            r = self.renderer()
+            r.parent = self
+            self._pool.append(r)
+        w = self.canvas.width
+        end = 0
+        for r, (i, y, h) in zip(self._pool, rows):
+            h = min(h, self.canvas.height - y)
+            c = r.canvas
+            if c is None or c.parent is not self.canvas or \
+                    (c.y, c.width, c.height) != (y, w, h):
+                r.canvas = canvas.SubCanvas(self.canvas, 0, y, w, h)
+            r.show(self.source.row(i), i, i == self.value)
+            r.render()
+            end = y + h
+        for y in range(end, self.canvas.height):
+            self.canvas.text(0, y, " " * w)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
+class Table(ValueWidget):
+
+    """
+    Table of rows (tuples) under column headers with the value being the
+    position of the selected row in the shown order. Only the visible rows
+    and columns get rendered.
+
+    Sorting and filtering use per-column indexes which are built on first use
+    (in a worker thread for tables longer than threaded_rows) and then kept
+    up to date by insert() and update().
+    """
+
+    __slots__ = ("columns", "widths", "width", "height", "top", "left", "_lock",
+                 "_rows", "_indexes", "_changed", "_sort", "_filter",
+                 "_filtered", "_generation")
+
+    threaded_rows = 10000
+
+    class Index:
+
+        """
+        Sorted list of (key, row id) of the rows accepted by accept, where key
+        is key(row id, row)
+        """
+
+        def __init__(self, key, accept = None):
+            self.key = key
+            self.accept = accept
+            self.entries = []
+
+        def build(self, rows, rids = None, chunk = None):
+            """
+            Build from rows, only from those with ids in rids if given. With
+            chunk the rows get sorted in chunks of that size and then merged,
+            as a single sort holds the GIL until done.
+            """
+            key = self.key
+            accept = self.accept
+            if rids is None:
+                rids = range(len(rows))
+            entries = [(key(rid, rows[rid]), rid) for rid in rids
+                       if accept is None or accept(rows[rid])]
+            if not chunk or len(entries) <= chunk:
+                entries.sort()
+                self.entries = entries
+                return
+            chunks = [sorted(entries[i:i + chunk])
+                      for i in range(0, len(entries), chunk)]
+            self.entries = list(heapq.merge(*chunks))
+
+        def add(self, rid, row):
+            if self.accept is None or self.accept(row):
+                bisect.insort(self.entries, (self.key(rid, row), rid))
+
+        def remove(self, rid, row):
+            if self.accept is None or self.accept(row):
+                e = (self.key(rid, row), rid)
+                i = bisect.bisect_left(self.entries, e)
+                if i < len(self.entries) and self.entries[i] == e:
+                    del self.entries[i]
+
+        def range(self, low = None, high = None):
+            """ Return the (start, end) of the entries with low <= key <= high """
+            start = 0 if low is None else bisect.bisect_left(self.entries, (low,))
+            end = len(self.entries) if high is None else \
+                    bisect.bisect_right(self.entries, (high, float("inf")))
+            return start, max(start, end)
+
+    def __init__(self, columns, rows = (), widths = None, width = 40,
+                 height = 10, onvalue = None, onpress = None):
+        super(Table, self).__init__(value = 0, onvalue = onvalue)
+        self.columns = list(columns)
+        self.widths = list(widths) if widths else \
+                [max(len(c), 8) for c in self.columns]
+        self.width = width
+        self.height = height
+        self.top = 0
+        self.left = 0 # First visible column
+        self._lock = threading.RLock()
+        self._rows = list(rows)
+        self._indexes = {} # Column -> Index
+        self._changed = [] # Sets of row ids changed during index builds
+        self._sort = (None, False) # (column, reverse)
+        self._filter = None # (column, low, high)
+        self._filtered = None # Index of the sort key of the filtered rows
+        self._generation = 0
+        if onpress:
+            self.bind("press", onpress)
+
+    def _colkey(self, column):
+        return lambda rid, row: row[column]
+
+    def insert(self, row):
+        """ Append a row and return its id """
+        with self._lock:
+            rid = len(self._rows)
+            self._rows.append(row)
+            for idx in self._active():
+                idx.add(rid, row)
+            for ch in self._changed:
+                ch.add(rid)
+        self.update()
+        return rid
+
+    def update_row(self, rid, row):
+        with self._lock:
+            old = self._rows[rid]
+            self._rows[rid] = row
+            for idx in self._active():
+                idx.remove(rid, old)
+                idx.add(rid, row)
+            for ch in self._changed:
+                ch.add(rid)
+        self.update()
+
+    def row(self, rid):
+        return self._rows[rid]
+
+    def _active(self):
+        yield from self._indexes.values()
+        if self._filtered:
+            yield self._filtered
+
+    def _build(self, idx, install, thread, candidates = None):
+        """
+        Build idx from the rows with ids returned by candidates() (all if
+        None) and call install(idx) under the lock, with thread in a worker
+        on a snapshot of the rows. Returns a concurrent.futures.Future when
+        threaded.
+        """
+        if not thread:
+            with self._lock:
+                idx.build(self._rows, candidates and candidates())
+                install(idx)
+            return None
+        with self._lock:
+            snapshot = list(self._rows)
+            rids = candidates and candidates()
+            changed = set()
+            self._changed.append(changed)
+
+        def work():
+            idx.build(snapshot, rids, chunk = self.threaded_rows)
+            with self._lock:
+                self._changed.remove(changed)
+                # Replay the rows changed since the snapshot
+                for rid in changed:
+                    if rid < len(snapshot):
+                        idx.remove(rid, snapshot[rid])
+                    idx.add(rid, self._rows[rid])
+                install(idx)
+            self.update()
+        return event._thread_executor().submit(work)
+
+    def sort(self, column = None, reverse = False, thread = None):
+        """
+        Show the rows sorted by column (None for insertion order). With
+        thread (by default for long tables) the index is built in a worker,
+        the current order is shown until done and a Future is returned.
+        """
+        return self._configure((column, reverse), self._filter, thread)
+
+    def filter(self, column = None, low = None, high = None, thread = None):
+        """ Show only rows with low <= row[column] <= high, None to disable """
+        filt = None if column is None else (column, low, high)
+        return self._configure(self._sort, filt, thread)
+
+    def _configure(self, sort, filt, thread):
+        if thread is None:
+            thread = len(self._rows) > self.threaded_rows
+        with self._lock:
+            self._generation += 1
+            gen = self._generation
+
+        def apply(filtered):
+            if gen != self._generation:
+                return
+            self._sort = sort
+            self._filter = filt
+            self._filtered = filtered
+            self.top = 0
+            self._value = 0
+            self.update()
+
+        def install_column(idx):
+            self._indexes.setdefault(column, idx)
+            apply(None)
+
+        def install_filtered(idx):
+            apply(idx)
+
+        column = sort[0]
+        if filt and filt[0] != column:
+            # Materialize the filtered rows ordered by the sort key
+            fcol, low, high = filt
+            key = (lambda rid, row: rid) if column is None else \
+                    self._colkey(column)
+            accept = lambda row: (low is None or row[fcol] >= low) and \
+                    (high is None or row[fcol] <= high)
+            candidates = None
+            if fcol in self._indexes:
+                def candidates():
+                    idx = self._indexes[fcol]
+                    start, end = idx.range(low, high)
+                    return [rid for _, rid in idx.entries[start:end]]
+            return self._build(Table.Index(key, accept), install_filtered,
+                               thread, candidates)
+        if filt:
+            column = filt[0]
+        if column is None or column in self._indexes:
+            with self._lock:
+                apply(None)
+            return None
+        return self._build(Table.Index(self._colkey(column)), install_column,
+                           thread)
+
+    def _shown(self):
+        """ Return (entries, start, end, reverse) of the shown rows """
+        column, reverse = self._sort
+        if self._filtered is not None:
+            return self._filtered.entries, 0, len(self._filtered.entries), \
+                    reverse
+        if self._filter:
+            fcol, low, high = self._filter
+            idx = self._indexes[fcol]
+            return (idx.entries,) + idx.range(low, high) + (reverse,)
+        if column is None:
+            return None, 0, len(self._rows), reverse
+        return self._indexes[column].entries, 0, len(self._rows), reverse
+
+    def __len__(self):
+        """ Number of rows shown """
+        with self._lock:
+            _, start, end, _ = self._shown()
+            return end - start
+
+    def shown_rows(self, start = 0, end = None):
+        """ Return the list of (row id, row) shown at positions start to end """
+        with self._lock:
+            entries, s, e, reverse = self._shown()
+            end = e - s if end is None else min(end, e - s)
+            ret = []
+            for p in range(max(start, 0), end):
+                i = e - 1 - p if reverse else s + p
+                rid = entries[i][1] if entries is not None else i
+                ret.append((rid, self._rows[rid]))
+            return ret
+
+    @property
+    def selected(self):
+        """ Tuple (row id, row) of the selected row or None """
+        rows = self.shown_rows(self.value, self.value + 1)
+        return rows[0] if rows else None
+
+    def _viewheight(self):
+        return (self.canvas.height if self.canvas else self.height) - 1
+
+    def select(self, i):
+        """ Select the row shown at position i and scroll it into view """
+        i = max(0, min(i, len(self) - 1))
+        h = max(self._viewheight(), 1)
+        if i < self.top:
+            self.top = i
+        elif i >= self.top + h:
+            self.top = i - h + 1
+        self.value = i
+        self.update()
+
+    def _columns(self):
+        """ Return the list of (column, x, width) of the visible columns """
+        ret = []
+        x = 0
+        w = self.canvas.width
+        for c in range(self.left, len(self.columns)):
+            if x >= w:
+                break
+            ret.append((c, x, min(self.widths[c], w - x)))
+            x += self.widths[c] + 1
+        return ret
+
+    @event.handler("key", key = "<up>", canreject = True)
+    def _onup(self, kc):
+        if self.value <= 0:
+            return False
+        self.select(self.value - 1)
+        return True
+
+    @event.handler("key", key = "<down>", canreject = True)
+    def _ondown(self, kc):
+        if self.value >= len(self) - 1:
+            return False
+        self.select(self.value + 1)
+        return True
+
+    @event.handler("key", key = "<left>", canreject = True)
+    def _onleft(self, kc):
+        if self.left <= 0:
+            return False
+        self.left -= 1
+        self.update()
+        return True
+
+    @event.handler("key", key = "<right>", canreject = True)
+    def _onright(self, kc):
+        if self.left >= len(self.columns) - 1:
+            return False
+        self.left += 1
+        self.update()
+        return True
+
+    @event.handler("key", key = "<pageup>")
+    def _onpageup(self, kc):
+        self.select(self.value - max(self._viewheight() - 1, 1))
+
+    @event.handler("key", key = "<pagedown>")
+    def _onpagedown(self, kc):
+        self.select(self.value + max(self._viewheight() - 1, 1))
+
+    @event.handler("key", key = "<home>")
+    def _onhome(self, kc):
+        self.select(0)
+
+    @event.handler("key", key = "<end>")
+    def _onend(self, kc):
+        self.select(len(self) - 1)
+
+    @event.handler("mouse", pressed = True, button = event.MouseEvent.LEFT)
+    def _onmouse(self, me):
+        if me.y == 0:
+            # Clicking a header sorts by it, again reverses the order
+            for c, x, w in self._columns():
+                if x <= me.x < x + w:
+                    col, rev = self._sort
+                    self.sort(c, reverse = not rev if col == c else False)
+                    break
+        else:
+            i = self.top + me.y - 1
+            if i < len(self):
+                if i == self.value and self.focused:
+                    self.fire(event.ClickEvent())
+                self.select(i)
+        if not self.focused:
+            self.focused = True
+
+    @event.handler("click")
+    @event.handler("key", key = "\r")
+    def _onpress(self, _):
+        if len(self):
+            self.fire(event.PressEvent(self))
+
+    def render(self):
+        w = self.canvas.width
+        h = self.canvas.height - 1
+        cols = self._columns()
+
+        def line(cells):
+            s = " ".join(str(v)[:cw].ljust(cw) for v, cw in cells)
+            return s[:w].ljust(w)
+
+        self.canvas.text(0, 0, line((self.columns[c], cw) for c, _, cw in cols),
+                         flags = canvas.BOLD | canvas.UNDERLINE)
+        n = len(self)
+        if n and self.value >= n:
+            self.select(n - 1)
+        rows = self.shown_rows(self.top, self.top + h)
+        for y in range(h):
+            if y < len(rows):
+                _, row = rows[y]
+                flags = 0
+                if self.top + y == self.value:
+                    flags = canvas.NEGATIVE if self.focused else canvas.BOLD
+                self.canvas.text(0, y + 1,
+                                 line((row[c], cw) for c, _, cw in cols),
+                                 flags = flags)
+            else:
+                self.canvas.text(0, y + 1, " " * w)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
+class TreeView(ListView):
+
+    """
+    ListView of a tree whose children are requested from children(item) only
+    when a node gets expanded. children can return an iterable or a
+    coroutine, in which case the node is shown as loading until it finishes.
+    The shown nodes are kept in a flat list of rows, so expanding and
+    collapsing only touch the rows of the affected subtree.
+    """
+
+    __slots__ = ("provider", "leaf", "rows")
+
+    class Node:
+
+        __slots__ = ("item", "depth", "parent", "children", "expanded",
+                     "loading")
+
+        def __init__(self, item, depth = 0, parent = None):
+            self.item = item
+            self.depth = depth
+            self.parent = parent
+            self.children = None # Until loaded
+            self.expanded = False
+            self.loading = False
+
+        @property
+        def marker(self):
+            if self.loading:
+                return "…"
+            if self.children == []:
+                return " "
+            return "-" if self.expanded else "+"
+
+    class Row(ListView.Row):
+
+        __slots__ = ()
+
+        def show(self, node, index, selected):
+            super(TreeView.Row, self).show(
+                "%s%s %s" % ("  " * node.depth, node.marker, node.item),
+                index, selected)
+
+    def __init__(self, roots, children, leaf = None, renderer = None,
+                 width = 24, height = 8, onvalue = None, onpress = None):
+        self.provider = children
+        self.leaf = leaf
+        self.rows = []
+        super(TreeView, self).__init__(source = self.rows,
+                                       renderer = renderer or TreeView.Row,
+                                       width = width, height = height,
+                                       onvalue = onvalue, onpress = onpress)
+        self.rows.extend(self._node(r, None) for r in roots)
+
+    def _node(self, item, parent):
+        node = TreeView.Node(item, parent.depth + 1 if parent else 0, parent)
+        if self.leaf and self.leaf(item):
+            node.children = []
+        return node
+
+    @property
+    def selected(self):
+        return self.rows[self.value] if self.value < len(self.rows) else None
+
+    def _index(self, node, hint = None):
+        """ Return the row of node or None if it is not shown """
+        p = node.parent
+        while p:
+            if not p.expanded:
+                return None
+            p = p.parent
+        if hint is not None and hint < len(self.rows) and \
+                self.rows[hint] is node:
+            return hint
+        return self.rows.index(node)
+
+    def _shown(self, node):
+        """ Yield the shown descendants of an expanded node """
+        for c in node.children:
+            yield c
+            if c.expanded:
+                yield from self._shown(c)
+
+    def expand(self, i):
+        node = self.rows[i]
+        if node.expanded or node.loading:
+            return
+        if node.children is None:
+            ret = self.provider(node.item)
+            if asyncio.iscoroutine(ret) or isinstance(ret, asyncio.Future):
+                node.loading = True
+                fut = asyncio.ensure_future(ret)
+                event._offloaded.add(fut)
+                fut.add_done_callback(partial(self._loaded, node, i))
+                self.update()
+                return
+            node.children = [self._node(c, node) for c in ret]
+        self._expand(node, i)
+
+    def _loaded(self, node, hint, fut):
+        event._offloaded.discard(fut)
+        node.loading = False
+        if fut.cancelled() or fut.exception() is not None:
+            if not fut.cancelled():
+                asyncio.get_event_loop().call_exception_handler({
+                    "message": "Exception while loading TreeView children",
+                    "exception": fut.exception(),
+                    "future": fut,
+                })
+            self.update()
+            return
+        node.children = [self._node(c, node) for c in fut.result()]
+        i = self._index(node, hint)
+        if i is None:
+            # Shows up expanded together with its parent
+            node.expanded = True
+        else:
+            self._expand(node, i)
+
+    def _expand(self, node, i):
+        node.expanded = True
+        shown = list(self._shown(node))
+        self.rows[i + 1:i + 1] = shown
+        if self.value > i:
+            # Keep the selection on the same node
+            self._value += len(shown)
+        self.update()
+
+    def collapse(self, i):
+        node = self.rows[i]
+        if not node.expanded:
+            return
+        node.expanded = False
+        end = i + 1
+        while end < len(self.rows) and self.rows[end].depth > node.depth:
+            end += 1
+        del self.rows[i + 1:end]
+        if i < self.value < end:
+            self.select(i)
+        elif self.value >= end:
+            self._value -= end - i - 1
+        self.update()
+
+    def toggle(self, i):
+        if self.rows[i].expanded:
+            self.collapse(i)
+        else:
+            self.expand(i)
+
+    @event.handler("key", key = "<right>", canreject = True)
+    def _onright(self, kc):
+        node = self.selected
+        if not node or node.children == [] or node.loading:
+            return False
+        if node.expanded:
+            self.select(self.value + 1)
+        else:
+            self.expand(self.value)
+        return True
+
+    @event.handler("key", key = "<left>", canreject = True)
+    def _onleft(self, kc):
+        node = self.selected
+        if not node:
+            return False
+        if node.expanded:
+            self.collapse(self.value)
+        elif node.parent:
+            i = self.value
+            while self.rows[i] is not node.parent:
+                i -= 1
+            self.select(i)
+        else:
+            return False
+        return True
+
+    @event.handler("key", key = " ")
+    def _onspace(self, kc):
+        if self.selected:
+            self.toggle(self.value)
+
+
+class Image(Widget):
+
+    """
+    RGB image drawn with upper half blocks, two pixels per cell. The data
+    is a numpy array of shape (height, width, 3) or a raw RGB buffer with
+    the width and height given. It gets scaled to the canvas and mapped to
+    the 256 colors through colors.table_256() (vectorized with numpy when
+    installed) and only the cell rows showing pixel rows changed by
+    .patch() get encoded again.
+    """
+
+    __slots__ = ("_np", "_data", "_cells", "_scale", "_changed", "width",
+                 "height")
+
+    def __init__(self, data = None, width = None, height = None):
+        super(Image, self).__init__()
+        self.focusable = False
+        self._np = misc._numpy()
+        self._data = None
+        self._cells = [] # Rows of (fg, bg) of each cell
+        self._scale = None # (canvas size, row map, column map)
+        self._changed = None # Source rows changed, None for all
+        if data is not None:
+            self.set_image(data, width = width, height = height)
+
+    def set_image(self, data, width = None, height = None):
+        if self._np:
+            data = self._asarray(data).copy()
+            if width is not None:
+                data = data.reshape(height, width, 3)
+            self.height, self.width = data.shape[:2]
+        else:
+            data = bytearray(data)
+            self.width = width
+            self.height = height
+        self._data = data
+        self._changed = None
+        self.update()
+
+    def patch(self, y, data):
+        """ Replace the pixel rows starting at y with data of the same width """
+        if self._np:
+            data = self._asarray(data).reshape(-1, self.width, 3)
+            n = len(data)
+            self._data[y:y + n] = data
+        else:
+            n = len(data) // (3 * self.width)
+            self._data[3 * self.width * y:3 * self.width * (y + n)] = data
+        if self._changed is not None:
+            self._changed.update(range(y, y + n))
+        self.update()
+
+    def _asarray(self, data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return self._np.frombuffer(data, dtype = self._np.uint8)
+        return self._np.asarray(data, dtype = self._np.uint8)
+
+    def _quantize(self, rows, cols):
+        """ Return lists of c256 indexes of source pixels at rows x cols """
+        table = colors.table_256()
+        if self._np:
+            np = self._np
+            px = self._data[np.asarray(rows)[:, None], np.asarray(cols)[None, :]] \
+                    .astype(np.intp) >> 3
+            lut = np.frombuffer(table, dtype = np.uint8)
+            return lut[px[..., 0] << 10 | px[..., 1] << 5 | px[..., 2]].tolist()
+        data = self._data
+        stride = 3 * self.width
+        ret = []
+        for r in rows:
+            base = r * stride
+            row = []
+            for c in cols:
+                i = base + 3 * c
+                row.append(table[(data[i] >> 3) << 10 |
+                                 (data[i + 1] >> 3) << 5 | data[i + 2] >> 3])
+            ret.append(row)
+        return ret
+
+    def _encode(self):
+        w = self.canvas.width
+        h = self.canvas.height
+        if self._scale is None or self._scale[0] != (w, h):
+            rowmap = [r * self.height // (2 * h) for r in range(2 * h)]
+            colmap = [c * self.width // w for c in range(w)]
+            self._scale = ((w, h), rowmap, colmap)
+            self._cells = [None] * h
+            self._changed = None
+        _, rowmap, colmap = self._scale
+        if self._changed is None:
+            todo = list(range(h))
+        else:
+            todo = [y for y in range(h) if rowmap[2 * y] in self._changed or
+                    rowmap[2 * y + 1] in self._changed]
+        self._changed = set()
+        if not todo:
+            return
+        q = self._quantize([rowmap[2 * y + i] for y in todo for i in (0, 1)],
+                           colmap)
+        c256 = colors.c256
+        for n, y in enumerate(todo):
+            self._cells[y] = [(c256[t], c256[b])
+                              for t, b in zip(q[2 * n], q[2 * n + 1])]
+
+    def render(self):
+        if self._data is None or not self.canvas.width or \
+                not self.canvas.height:
+            return
+        self._encode()
+        for y, row in enumerate(self._cells):
+            for x, (fg, bg) in enumerate(row):
+                self.canvas.set(x, y, "▀", fg = fg, bg = bg)
+
+    @property
+    def size(self):
+        if self._data is None:
+            return (0, 0)
+        return (self.width, (self.height + 1) // 2)